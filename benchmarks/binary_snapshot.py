@@ -0,0 +1,124 @@
+"""
+Compares file size, save time and load time of the binary snapshots in storage/binary_snapshot.py with the json files,
+for each compression. Saving includes writing the file, loading includes reading it. Checks that every format loads
+back the same data, also when the snapshot is read from a stream in small pieces.
+
+python benchmarks/binary_snapshot.py [players amount ...]
+"""
+import io
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic import synthetic_players
+from models.channels import Channels
+from models.players import Players
+from models.user import User
+from models.users import Users
+from storage.binary_snapshot import (
+    COMPRESSIONS,
+    decode_channels_snapshot,
+    decode_users_snapshot,
+    encode_channels_snapshot,
+    encode_players_snapshot,
+    encode_users_snapshot,
+    read_players_snapshot,
+)
+from storage.codec import decode_players, encode_players, players_to_dict
+from storage.write_behind import write_file_atomic
+
+
+class TrickleStream(io.RawIOBase):
+    """ Returns at most a few bytes per read, like a slow pipe. """
+
+    def __init__(self, data: bytes, piece_size: int = 1000):
+        self.stream = io.BytesIO(data)
+        self.piece_size = piece_size
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        piece = self.stream.read(min(len(target), self.piece_size))
+        target[: len(piece)] = piece
+        return len(piece)
+
+
+def check_small_models():
+    users = Users({"burny": User("superadmin"), "harstem": User("admin"), "chatter": User("user")})
+    channels = Channels({"burnysc2", "thelist", "esl_sc2"})
+    for compression in COMPRESSIONS.values():
+        assert decode_users_snapshot(encode_users_snapshot(users, compression)) == users
+        assert decode_channels_snapshot(encode_channels_snapshot(channels, compression)) == channels
+
+
+def save_json(players: Players, file_path: Path):
+    write_file_atomic(file_path, encode_players(players))
+
+
+def load_json(file_path: Path) -> Players:
+    with file_path.open() as f:
+        return decode_players(f.read())
+
+
+def save_binary(players: Players, file_path: Path, compression: int):
+    write_file_atomic(file_path, encode_players_snapshot(players, compression))
+
+
+def load_binary(file_path: Path) -> Players:
+    with file_path.open("rb") as f:
+        return read_players_snapshot(f)
+
+
+def timed(function, *args):
+    t0 = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - t0
+
+
+def benchmark(players_amount: int):
+    players = synthetic_players(players_amount)
+    # Names and texts that are not ascii, edited entries and aliases
+    for index, player in enumerate(list(players.players.values())[::10]):
+        player.information[0].info += " über"
+        player.information[0].modified_by = "burny"
+        player.information[0].modified_timestamp = 1_650_000_000 + index
+    players.players["sérral"] = players.players.pop("player1")
+    players.aliases = {"serral": "sérral", "rogue2": "player2"}
+    expected_dict = players_to_dict(players)
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_file_path = Path(directory) / "players.json"
+        _, json_save = timed(save_json, players, json_file_path)
+        json_players, json_load = timed(load_json, json_file_path)
+        assert players_to_dict(json_players) == expected_dict
+        json_size = json_file_path.stat().st_size
+        print(
+            f"{players_amount:>7} players | {'json':>5} | {json_size / 2 ** 20:7.2f} MiB"
+            f" | save {json_save * 1000:7.1f} ms | load {json_load * 1000:7.1f} ms"
+        )
+
+        for compression_name, compression in COMPRESSIONS.items():
+            file_path = Path(directory) / f"players.{compression_name}.bin"
+            _, save = timed(save_binary, players, file_path, compression)
+            loaded_players, load = timed(load_binary, file_path)
+            assert players_to_dict(loaded_players) == expected_dict, compression_name
+            streamed_players = read_players_snapshot(io.BufferedReader(TrickleStream(file_path.read_bytes())))
+            assert players_to_dict(streamed_players) == expected_dict, compression_name
+            size = file_path.stat().st_size
+            print(
+                f"{players_amount:>7} players | {compression_name:>5} | {size / 2 ** 20:7.2f} MiB"
+                f" ({json_size / size:5.1f}x smaller) | save {save * 1000:7.1f} ms ({json_save / save:4.1f}x)"
+                f" | load {load * 1000:7.1f} ms ({json_load / load:4.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    check_small_models()
+    amounts = [int(amount) for amount in sys.argv[1:]] or [10_000, 100_000]
+    for amount in amounts:
+        benchmark(amount)
@@ -0,0 +1,131 @@
+"""
+Imports 100k rows into a database of 10k players with bulk_data.py, for both storage backends and file formats,
+and compares it with adding the same rows one by one like !add does. Also measures the export.
+
+python benchmarks/bulk_import.py [rows amount]
+"""
+import random
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Dict, Iterator
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic import ADMIN_NAMES, WORDS, synthetic_players
+from bulk_data import export_from_storage, import_into_storage
+from models.bot_config import BotConfig
+from models.bulk import file_format, write_rows
+from storage.base import Storage
+from storage.json_storage import JsonStorage
+from storage.sqlite_storage import SqliteStorage
+
+PLAYERS_AMOUNT = 10_000
+# Adding rows one by one to sqlite commits every row, only this many are measured
+SQLITE_SINGLE_ROWS = 2_000
+
+
+def synthetic_rows(rows_amount: int, seed: int = 1) -> Iterator[Dict[str, str]]:
+    """ Rows for new and existing players, about 1% are invalid and 1% repeat an earlier row. """
+    rng = random.Random(seed)
+    previous_row = {"player": "serral", "info": "plays zerg", "author": "burny", "timestamp": "1600000000"}
+    for i in range(rows_amount):
+        roll = rng.random()
+        if roll < 0.01:
+            row = {"player": "", "info": "no player", "author": "burny", "timestamp": ""}
+        elif roll < 0.02:
+            row = previous_row
+        else:
+            row = {
+                "player": f"player{rng.randrange(PLAYERS_AMOUNT * 4)}",
+                "info": f"{' '.join(rng.choices(WORDS, k=rng.randint(2, 8)))} {i}",
+                "author": rng.choice(ADMIN_NAMES),
+                "timestamp": str(1_600_000_000 + i),
+            }
+        previous_row = row
+        yield row
+
+
+def create_backend(backend: str, data_folder: Path) -> Storage:
+    if backend == "json":
+        return JsonStorage(data_folder, BotConfig())
+    return SqliteStorage(data_folder / "thelist.sqlite3")
+
+
+def seed(backend: str, data_folder: Path):
+    storage = create_backend(backend, data_folder)
+    players = synthetic_players(PLAYERS_AMOUNT)
+    if isinstance(storage, SqliteStorage):
+        storage.import_players(players)
+    else:
+        storage.players = players
+        storage.persister.mark_dirty("players")
+    storage.close()
+
+
+def information_amount(storage: Storage) -> int:
+    return sum(len(player.information) for player in storage.load_players().players.values())
+
+
+def benchmark_import(backend: str, rows_file_path: Path):
+    with tempfile.TemporaryDirectory() as directory:
+        data_folder = Path(directory)
+        seed(backend, data_folder)
+
+        t0 = time.perf_counter()
+        storage = create_backend(backend, data_folder)
+        report = import_into_storage(storage, rows_file_path, "import")
+        storage.close()
+        import_time = time.perf_counter() - t0
+
+        reloaded_storage = create_backend(backend, data_folder)
+        export_file_path = data_folder / f"export{rows_file_path.suffix}"
+        t0 = time.perf_counter()
+        exported_amount = export_from_storage(reloaded_storage, export_file_path)
+        export_time = time.perf_counter() - t0
+        assert exported_amount == information_amount(reloaded_storage)
+        reloaded_storage.close()
+
+    print(
+        f"{backend:>6} {file_format(rows_file_path):>5} | bulk import: {import_time:6.2f} s"
+        f" ({report.rows / import_time:9.0f} rows/s) | export: {export_time:5.2f} s | {report.summary()}"
+    )
+
+
+def benchmark_single_rows(backend: str, rows_amount: int):
+    """ Like !add: every row goes through Players.add_information and is saved on its own. """
+    rows = [row for row in synthetic_rows(rows_amount) if row["player"]]
+    if backend == "sqlite":
+        rows = rows[:SQLITE_SINGLE_ROWS]
+    with tempfile.TemporaryDirectory() as directory:
+        data_folder = Path(directory)
+        seed(backend, data_folder)
+
+        t0 = time.perf_counter()
+        storage = create_backend(backend, data_folder)
+        players = storage.load_players()
+        for row in rows:
+            players.add_information(row["author"], f"{row['player']} {row['info']}")
+            storage.save_players(players)
+        storage.close()
+        single_time = time.perf_counter() - t0
+
+    print(
+        f"{backend:>6} !add  | one by one:  {single_time:6.2f} s ({len(rows) / single_time:9.0f} rows/s)"
+        f" | {len(rows)} rows, without validation and deduplication"
+    )
+
+
+if __name__ == "__main__":
+    rows_amount = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as rows_directory:
+        rows_file_paths = [Path(rows_directory) / "rows.csv", Path(rows_directory) / "rows.jsonl"]
+        for rows_file_path in rows_file_paths:
+            with rows_file_path.open("w", newline="", encoding="utf-8") as f:
+                write_rows(f, synthetic_rows(rows_amount), file_format(rows_file_path))
+        for backend in ["json", "sqlite"]:
+            for rows_file_path in rows_file_paths:
+                benchmark_import(backend, rows_file_path)
+            benchmark_single_rows(backend, rows_amount)
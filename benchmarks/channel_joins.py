@@ -0,0 +1,71 @@
+"""
+Connects the bot to a local fake IRC server and measures how long it takes until it is in all channels,
+at startup and after the server asked the bot to reconnect.
+The rate limit is 10 times faster than twitch, so the benchmark doesn't take minutes.
+Some joins are not answered on purpose, twitchio reports them as failed after 11 seconds and they are retried.
+
+python benchmarks/channel_joins.py [channels] [join failure rate]
+"""
+import asyncio
+import sys
+import time
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from bot import TwitchChatBot
+from chat.channel_manager import ChannelManager
+from benchmarks.fake_irc import FakeIrcServer, connect_bot
+
+JOINS_PER_PERIOD = 20
+PERIOD = 1.0
+
+
+async def wait_converged(bot: TwitchChatBot, server: FakeIrcServer, channels_amount: int, t0: float) -> float:
+    while not (
+        len(bot.channel_manager.states) == channels_amount
+        and bot.channel_manager.last_convergence_time is not None
+        and bot.channel_manager._converging_since is None
+    ):
+        await asyncio.sleep(0.05)
+    return time.monotonic() - t0
+
+
+async def main(channels_amount: int, join_failure_rate: float):
+    logger.remove()
+    logger.add(sys.stdout, level="WARNING")
+    server = FakeIrcServer(JOINS_PER_PERIOD, PERIOD, join_failure_rate)
+    await server.start()
+
+    bot = TwitchChatBot("abc", "...", "thelist_bot", "!")
+    # Only in memory, nothing is saved
+    bot.channels.channels = {f"channel{i}" for i in range(channels_amount)}
+    bot.channel_manager = ChannelManager(bot.join_channels, bot.part_channels, JOINS_PER_PERIOD, PERIOD, 0.5)
+
+    print(f"{channels_amount} channels, {JOINS_PER_PERIOD} joins per {PERIOD}s, {join_failure_rate:.0%} joins fail")
+    print(f"Lower bound: {max(0.0, (channels_amount - JOINS_PER_PERIOD) / JOINS_PER_PERIOD * PERIOD):.2f}s")
+    t0 = time.monotonic()
+    await connect_bot(bot, server)
+    duration = await wait_converged(bot, server, channels_amount, t0)
+    print(f"Startup: in all channels after {duration:.2f}s, {bot.channel_manager.stats()}")
+    print(f"  server: {server.joins_received} JOINs received, {server.joins_dropped} dropped")
+
+    bot.channel_manager.last_convergence_time = None
+    t0 = time.monotonic()
+    await server.reconnect_all()
+    duration = await wait_converged(bot, server, channels_amount, t0)
+    print(f"Reconnect: in all channels after {duration:.2f}s, {bot.channel_manager.stats()}")
+    print(f"  server: {server.joins_received} JOINs received, {server.joins_dropped} dropped")
+    assert all(len(sockets) == 1 for sockets in server.channels.values()) and len(server.channels) == channels_amount
+
+    await bot.close()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    channels_amount = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    join_failure_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    asyncio.run(main(channels_amount, join_failure_rate))
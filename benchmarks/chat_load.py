@@ -0,0 +1,252 @@
+"""
+Replays chat through a local fake IRC server to a connected bot and measures the end to end latency of replies:
+from the moment the server sends a command until it receives the reply of the bot.
+Chat is either synthetic, random words with a mix of !info, !add and !edit commands, or recorded: a jsonl file
+with {"channel": str, "user": str, "text": str} per line, which is repeated until the duration is over.
+Server, load generator and bot share one event loop, like the bot would share a machine with twitchio.
+The result is printed and written as json, to compare it between commits.
+
+python benchmarks/chat_load.py [--rate 500] [--duration 20] [--channels 50] [--commands 0.05]
+    [--mix info=0.8,add=0.1,edit=0.1] [--replay chat.jsonl] [--flood-control] [--output result.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, Iterator, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from bot import TwitchChatBot
+from chat.flood_control import FloodControl
+from chat.send_scheduler import CHANNEL_RATE_LIMITS, RATE_LIMITS, SendScheduler
+from models.bot_config import BotConfig
+from storage.backends import create_storage
+from storage.codec import encode_players
+from storage.write_behind import write_file_atomic
+from benchmarks.fake_irc import FakeIrcServer, chat_tags, connect_bot
+from benchmarks.synthetic import WORDS, synthetic_players
+
+ROOT_FOLDER = Path(__file__).parent.parent
+# Every reply of the commands names the player like this
+REPLY_PLAYER = re.compile(r"[Pp]layer '([^']*)'")
+ADMINS_AMOUNT = 10
+
+# (channel name, user name, text)
+ChatMessage = Tuple[str, str, str]
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """ "info=0.8,add=0.2" -> {"info": 0.8, "add": 0.2} """
+    mix: Dict[str, float] = {}
+    for part in text.split(","):
+        command_name, _, share = part.partition("=")
+        mix[command_name.strip()] = float(share)
+    return mix
+
+
+def synthetic_chat(
+    channel_names: List[str], players_amount: int, command_share: float, mix: Dict[str, float], seed: int = 0
+) -> Iterator[ChatMessage]:
+    rng = random.Random(seed)
+    command_names = list(mix)
+    weights = list(mix.values())
+    while True:
+        channel_name = rng.choice(channel_names)
+        if rng.random() >= command_share:
+            yield channel_name, f"chatter{rng.randrange(10_000)}", " ".join(rng.choices(WORDS, k=rng.randint(1, 12)))
+            continue
+        author_name = f"admin{rng.randrange(ADMINS_AMOUNT)}"
+        player_name = f"player{rng.randrange(players_amount)}"
+        command_name = rng.choices(command_names, weights)[0]
+        if command_name == "info":
+            text = f"!info {player_name}"
+        elif command_name == "add":
+            text = f"!add {player_name} {' '.join(rng.choices(WORDS, k=rng.randint(2, 8)))}"
+        elif command_name == "edit":
+            text = f"!edit {player_name} 0 {' '.join(rng.choices(WORDS, k=rng.randint(2, 8)))}"
+        else:
+            raise ValueError(f"Unknown command in mix: {command_name}")
+        yield channel_name, author_name, text
+
+
+def recorded_chat(file_path: Path) -> Iterator[ChatMessage]:
+    with file_path.open() as f:
+        messages = [json.loads(line) for line in f if line.strip()]
+    for message in itertools.cycle(messages):
+        yield message["channel"].lower(), message["user"].lower(), message["text"]
+
+
+class ReplyTracker:
+    """ Matches the replies of the bot to the commands by channel and player name, oldest command first. """
+
+    def __init__(self):
+        # [(channel name, player name): (command name, sent at) of commands without reply]
+        self.waiting: Dict[Tuple[str, str], Deque[Tuple[str, float]]] = {}
+        self.waiting_amount = 0
+        # [command name: latencies in seconds]
+        self.latencies: Dict[str, List[float]] = {}
+        self.commands_sent = 0
+        self.unmatched_replies = 0
+
+    def sent(self, channel_name: str, text: str):
+        command_name, _, rest = text[1:].partition(" ")
+        player_name = rest.partition(" ")[0].lower()
+        self.waiting.setdefault((channel_name, player_name), deque()).append((command_name, time.perf_counter()))
+        self.waiting_amount += 1
+        self.commands_sent += 1
+
+    def received(self, channel_name: str, text: str):
+        match = REPLY_PLAYER.search(text)
+        waiting = self.waiting.get((channel_name, match.group(1))) if match else None
+        if not waiting:
+            self.unmatched_replies += 1
+            return
+        command_name, sent_at = waiting.popleft()
+        self.waiting_amount -= 1
+        self.latencies.setdefault(command_name, []).append(time.perf_counter() - sent_at)
+
+
+def latency_summary(latencies: List[float]) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"replies": 0}
+    return {
+        "replies": len(latencies),
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT_FOLDER), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def main(arguments: argparse.Namespace):
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    channel_names = [f"channel{i}" for i in range(arguments.channels)]
+    if arguments.replay:
+        chat = recorded_chat(Path(arguments.replay))
+    else:
+        chat = synthetic_chat(channel_names, arguments.players, arguments.commands, parse_mix(arguments.mix))
+    messages = list(itertools.islice(chat, int(arguments.rate * arguments.duration)))
+    channel_names = sorted({channel_name for channel_name, _, _ in messages})
+
+    with tempfile.TemporaryDirectory() as data_folder:
+        # The bot works on a copy of synthetic data, its changes are thrown away
+        write_file_atomic(Path(data_folder) / "players.json", encode_players(synthetic_players(arguments.players)))
+        storage = create_storage(BotConfig(), Path(data_folder))
+        bot = TwitchChatBot(
+            "abc", "...", "thelist_bot", "!", storage=storage, history_file_path=Path(data_folder) / "history"
+        )
+        bot.channels.channels = set(channel_names)
+        for i in range(ADMINS_AMOUNT):
+            bot.users.add_admin(f"admin{i}")
+        for _, user_name, text in messages:
+            if text.startswith("!") and bot.users.role_of(user_name) is None:
+                # Recorded chat: whoever used a command may use it again
+                bot.users.add_admin(user_name)
+        bot.send_scheduler = SendScheduler(
+            bot._send_to_channel,
+            RATE_LIMITS[arguments.account_type],
+            channel_messages_per_period=CHANNEL_RATE_LIMITS[arguments.account_type],
+        )
+        if not arguments.flood_control:
+            # The synthetic users run far more commands than the default limits allow, every command is measured
+            bot.flood_control = FloodControl(0, 0, 0, 30.0, {}, [], 0, lambda: 0, set())
+
+        server = FakeIrcServer(joins_per_period=100_000)
+        await server.start()
+        tracker = ReplyTracker()
+        server.on_received = tracker.received
+        await connect_bot(bot, server)
+        while len(server.channels) < len(channel_names):
+            await asyncio.sleep(0.05)
+
+        user_ids: Dict[str, int] = {}
+        t0 = time.perf_counter()
+        for i, (channel_name, user_name, text) in enumerate(messages):
+            delay = t0 + i / arguments.rate - time.perf_counter()
+            if delay > 0.001:
+                await asyncio.sleep(delay)
+            user_id = user_ids.setdefault(user_name, len(user_ids) + 1)
+            if text.startswith("!"):
+                tracker.sent(channel_name, text)
+            await server.send_message(channel_name, user_name, text, chat_tags(user_name, user_id))
+        send_duration = time.perf_counter() - t0
+
+        # Replies that are still on their way
+        drain_until = time.perf_counter() + arguments.drain
+        while tracker.waiting_amount and time.perf_counter() < drain_until:
+            await asyncio.sleep(0.01)
+        duration = time.perf_counter() - t0
+
+        all_latencies = [latency for latencies in tracker.latencies.values() for latency in latencies]
+        result = {
+            "commit": git_commit(),
+            "timestamp": int(time.time()),
+            "parameters": vars(arguments),
+            "messages_sent": len(messages),
+            "send_rate": len(messages) / send_duration,
+            "commands_sent": tracker.commands_sent,
+            # E.g. repeated !info of the same player in a channel, which the bot collapses into one reply
+            "commands_without_reply": tracker.waiting_amount,
+            "unmatched_replies": tracker.unmatched_replies,
+            # Replies that twitchio refused to send, it limits every channel to 20 messages per 30 seconds itself
+            "failed_sends": bot.send_scheduler.failed_amount,
+            "replies_per_second": len(all_latencies) / duration,
+            "latency": {
+                "all": latency_summary(all_latencies),
+                **{
+                    command_name: latency_summary(latencies)
+                    for command_name, latencies in sorted(tracker.latencies.items())
+                },
+            },
+            "send_scheduler": bot.send_scheduler.stats(),
+            "render_cache": bot.render_cache.stats(),
+            "flood_control": bot.flood_control.stats(),
+        }
+        await bot.close()
+        await server.stop()
+        storage.close()
+
+    print(json.dumps(result, indent=2))
+    if arguments.output:
+        with open(arguments.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End to end latency of the bot under chat load")
+    parser.add_argument("--rate", type=float, default=500.0, help="Chat messages per second over all channels")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of chat")
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--players", type=int, default=10_000, help="Players in the synthetic database")
+    parser.add_argument("--commands", type=float, default=0.05, help="Share of messages that are commands")
+    parser.add_argument("--mix", default="info=0.8,add=0.1,edit=0.1", help="Share of each command")
+    parser.add_argument("--replay", help="Recorded chat, jsonl, instead of synthetic chat")
+    parser.add_argument("--account-type", default="verified", choices=sorted(RATE_LIMITS))
+    parser.add_argument("--drain", type=float, default=10.0, help="Seconds to wait for replies after the last message")
+    parser.add_argument(
+        "--flood-control", action="store_true", help="Keep the flood control limits of the config, off by default"
+    )
+    parser.add_argument("--output", help="Also write the json result to this file")
+    asyncio.run(main(parser.parse_args()))
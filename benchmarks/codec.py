@@ -0,0 +1,67 @@
+"""
+Compares load and save times of storage/codec.py against dataclasses_json and checks that both produce the same text.
+
+python benchmarks/codec.py [players amount ...]
+"""
+import sys
+import time
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic import synthetic_players
+from models.channels import Channels
+from models.players import Players
+from models.user import User
+from models.users import Users
+from storage.codec import decode_channels, decode_players, decode_users, encode_channels, encode_players, encode_users
+
+
+def timed(function, *args):
+    t0 = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - t0
+
+
+def check_small_models():
+    users = Users({"burny": User("superadmin"), "harstem": User("admin"), "chatter": User("user")})
+    assert encode_users(users) == users.to_json(indent=4)
+    assert decode_users(users.to_json(indent=4)) == Users.from_json(users.to_json(indent=4))
+    channels = Channels({"burnysc2", "thelist", "esl_sc2"})
+    assert encode_channels(channels) == channels.to_json(indent=4)
+    assert decode_channels(channels.to_json(indent=4)) == Channels.from_json(channels.to_json(indent=4))
+
+
+def benchmark(players_amount: int):
+    players = synthetic_players(players_amount)
+    # Float timestamps as written by older versions
+    for player in list(players.players.values())[::10]:
+        player.information[0].created_timestamp += 0.5
+        player.information[0].modified_by = "burny"
+        player.information[0].modified_timestamp = 1_650_000_000.25
+
+    reference_text, reference_save = timed(lambda: players.to_json(indent=4))
+    codec_text, codec_save = timed(encode_players, players, 4)
+    assert codec_text == reference_text, "encoded text differs from dataclasses_json"
+
+    reference_players, reference_load = timed(Players.from_json, reference_text)
+    codec_players, codec_load = timed(decode_players, reference_text)
+    assert codec_players == reference_players, "decoded players differ from dataclasses_json"
+    # Files written by the codec round trip byte for byte
+    assert encode_players(decode_players(codec_text)) == encode_players(codec_players)
+    written_text = encode_players(codec_players)
+    assert encode_players(decode_players(written_text)) == written_text
+
+    print(
+        f"{players_amount:>7} players | save: dataclasses_json {reference_save * 1000:9.1f} ms, codec {codec_save * 1000:7.1f} ms"
+        f" ({reference_save / codec_save:5.1f}x) | load: dataclasses_json {reference_load * 1000:9.1f} ms,"
+        f" codec {codec_load * 1000:7.1f} ms ({reference_load / codec_load:5.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    check_small_models()
+    amounts = [int(amount) for amount in sys.argv[1:]] or [10_000, 100_000]
+    for amount in amounts:
+        benchmark(amount)
@@ -0,0 +1,82 @@
+"""
+Pushes chat messages through TwitchChatBot.event_message without a connection to twitch
+and compares the pre-dispatch stage with handing every message to twitchio's handle_commands,
+and the pre-dispatch stage with and without metrics.
+1 in 1000 messages is a command, like in a busy channel.
+
+python benchmarks/dispatch.py [messages]
+"""
+import asyncio
+import random
+import sys
+import time
+
+from pathlib import Path
+from typing import Callable, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+from twitchio import Channel, Message, PartialChatter
+
+from bot import TwitchChatBot
+from chat.metrics import Metrics
+from benchmarks.synthetic import WORDS
+
+COMMAND_DENSITY = 0.001
+
+
+def chat_messages(bot: TwitchChatBot, amount: int, seed: int = 0) -> List[Message]:
+    rng = random.Random(seed)
+    channel = Channel("busy_channel", bot._connection)
+    chatters = [PartialChatter(bot._connection, name=f"chatter{i}") for i in range(500)]
+    messages = []
+    for _ in range(amount):
+        author = rng.choice(chatters)
+        if rng.random() < COMMAND_DENSITY:
+            content = f"!info player{rng.randrange(100)}"
+        else:
+            content = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+        messages.append(Message(content=content, author=author, channel=channel, tags={}, echo=False))
+    return messages
+
+
+async def measure(name: str, handle: Callable, messages: List[Message]):
+    t0 = time.perf_counter()
+    for message in messages:
+        await handle(message)
+    duration = time.perf_counter() - t0
+    print(f"{name:>16}: {len(messages) / duration:>12,.0f} messages/s")
+
+
+async def main(amount: int):
+    bot = TwitchChatBot("abc", "...", "thelist_bot", "!")
+    # Commands would log every request
+    logger.remove()
+    # Every 10th chatter may use commands, only in memory, nothing is saved
+    for i in range(0, 500, 10):
+        bot.users.add_user(f"chatter{i}")
+    sent: List[str] = []
+
+    async def fake_sender(channel_name: str, text: str):
+        sent.append(text)
+
+    bot.send_scheduler._sender = fake_sender
+    messages = chat_messages(bot, amount)
+    print(f"{amount} messages, {sum(message.content.startswith('!') for message in messages)} commands")
+
+    async def handle_commands(message: Message):
+        try:
+            await bot.handle_commands(message)
+        except Exception:
+            pass
+
+    await measure("handle_commands", handle_commands, messages)
+    await measure("event_message", bot.event_message, messages)
+    bot.metrics = Metrics()
+    await measure("event_message with metrics", bot.event_message, messages)
+    await bot.send_scheduler.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000))
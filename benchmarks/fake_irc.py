@@ -0,0 +1,168 @@
+"""
+A local stand-in for the twitch IRC websocket server, to run the bot without a connection to twitch.
+Understands just enough IRC for twitchio: login, JOIN, PART and PRIVMSG.
+JOINs over the rate limit are silently ignored like twitch does, so twitchio reports the join as failed.
+
+Use 'connect_bot' to connect a TwitchChatBot to it.
+"""
+import asyncio
+import random
+import time
+import uuid
+
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import aiohttp
+import twitchio.websocket
+
+from aiohttp import web
+
+
+class FakeIrcServer:
+    def __init__(
+        self,
+        joins_per_period: int = 20,
+        period: float = 10.0,
+        join_failure_rate: float = 0.0,
+        seed: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.joins_per_period = joins_per_period
+        self.period = period
+        # Part of the JOINs that are not answered, even below the rate limit
+        self.join_failure_rate = join_failure_rate
+        self._random = random.Random(seed)
+        self.host = host
+        self.port = port
+
+        self._runner: Optional[web.AppRunner] = None
+        self._sockets: List[web.WebSocketResponse] = []
+        self._join_times: Deque[float] = deque()
+        # [channel name: connections that joined the channel]
+        self.channels: Dict[str, Set[web.WebSocketResponse]] = {}
+        # (channel name, text) of every PRIVMSG the bot sent
+        self.received: List[Tuple[str, str]] = []
+        self.received_event = asyncio.Event()
+        # Called with (channel name, text) for every PRIVMSG the bot sent
+        self.on_received: Optional[Callable[[str, str], None]] = None
+        self.joins_received = 0
+        self.joins_dropped = 0
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Port 0 picks a free port
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for socket in list(self._sockets):
+            await socket.close()
+        self._sockets.clear()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def reconnect_all(self):
+        """ Asks all clients to reconnect, like twitch does before it restarts a server. """
+        for socket in list(self._sockets):
+            await socket.send_str(":tmi.twitch.tv RECONNECT\r\n")
+        self.channels.clear()
+
+    async def send_message(self, channel_name: str, user_name: str, text: str, tags: str = ""):
+        """ Sends a chat message from 'user_name' to every connection in the channel. """
+        prefix = f"@{tags} " if tags else ""
+        line = f"{prefix}:{user_name}!{user_name}@{user_name}.tmi.twitch.tv PRIVMSG #{channel_name} :{text}\r\n"
+        for socket in self.channels.get(channel_name, ()):
+            await socket.send_str(line)
+
+    def _allow_join(self) -> bool:
+        now = time.monotonic()
+        while self._join_times and self._join_times[0] <= now - self.period:
+            self._join_times.popleft()
+        if len(self._join_times) >= self.joins_per_period:
+            return False
+        self._join_times.append(now)
+        return True
+
+    async def _handle(self, request: web.Request) -> web.WebSocketResponse:
+        socket = web.WebSocketResponse()
+        await socket.prepare(request)
+        self._sockets.append(socket)
+        nick = "justinfan"
+        async for message in socket:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                continue
+            for line in message.data.split("\r\n"):
+                command, _, argument = line.partition(" ")
+                if command == "NICK":
+                    nick = argument
+                    await socket.send_str(
+                        f":tmi.twitch.tv 001 {nick} :Welcome, GLHF!\r\n"
+                        f":tmi.twitch.tv 375 {nick} :-\r\n"
+                        f":tmi.twitch.tv 376 {nick} :>\r\n"
+                    )
+                elif command == "JOIN":
+                    for channel in argument.split(","):
+                        await self._join(socket, nick, channel.lstrip("#"))
+                elif command == "PART":
+                    for channel in argument.split(","):
+                        channel_name = channel.lstrip("#")
+                        self.channels.get(channel_name, set()).discard(socket)
+                        await socket.send_str(f":{nick}!{nick}@{nick}.tmi.twitch.tv PART #{channel_name}\r\n")
+                elif command == "PRIVMSG":
+                    channel, _, text = argument.partition(" :")
+                    self.received.append((channel.lstrip("#"), text))
+                    self.received_event.set()
+                    if self.on_received is not None:
+                        self.on_received(channel.lstrip("#"), text)
+                elif command == "PING":
+                    await socket.send_str("PONG :tmi.twitch.tv\r\n")
+        if socket in self._sockets:
+            self._sockets.remove(socket)
+        for sockets in self.channels.values():
+            sockets.discard(socket)
+        return socket
+
+    async def _join(self, socket: web.WebSocketResponse, nick: str, channel_name: str):
+        self.joins_received += 1
+        if not self._allow_join() or self._random.random() < self.join_failure_rate:
+            self.joins_dropped += 1
+            return
+        self.channels.setdefault(channel_name, set()).add(socket)
+        await socket.send_str(
+            f":{nick}!{nick}@{nick}.tmi.twitch.tv JOIN #{channel_name}\r\n"
+            f":{nick}.tmi.twitch.tv 353 {nick} = #{channel_name} :{nick}\r\n"
+            f":{nick}.tmi.twitch.tv 366 {nick} #{channel_name} :End of /NAMES list\r\n"
+        )
+
+
+def chat_tags(user_name: str, user_id: int, room_id: int = 1) -> str:
+    """ The tags twitch sends with a chat message of a normal chatter. """
+    return (
+        f"badge-info=;badges=;client-nonce={uuid.uuid4().hex};color=#1E90FF;display-name={user_name};emotes=;"
+        f"first-msg=0;flags=;id={uuid.uuid4()};mod=0;returning-chatter=0;room-id={room_id};subscriber=0;"
+        f"tmi-sent-ts={int(time.time() * 1000)};turbo=0;user-id={user_id};user-type="
+    )
+
+
+async def connect_bot(bot, server: FakeIrcServer, nick: str = "thelist_bot"):
+    """ Connects 'bot' to 'server' instead of twitch, without validating the token. """
+    await connect_bot_to_url(bot, server.url, nick)
+
+
+async def connect_bot_to_url(bot, url: str, nick: str = "thelist_bot"):
+    """ Like 'connect_bot', for a server in another process. """
+    twitchio.websocket.HOST = url
+    bot._http.nick = nick
+    if bot._http.session is None:
+        bot._http.session = aiohttp.ClientSession()
+    await bot.connect()
@@ -0,0 +1,105 @@
+"""
+Measures how long the bot takes from process start until it is ready, and how much memory it uses then,
+with a players.json of 100k players: loaded completely, loaded lazily the first time (scans the file and writes
+players.json.index) and loaded lazily again (reads players.json.index). Every start runs in its own process.
+Afterwards !info of random players is looked up, which decodes them in lazy mode.
+
+python benchmarks/lazy_loading.py [players amount] [lookups amount]
+"""
+import time
+
+STARTED = time.perf_counter()
+
+import json
+import random
+import subprocess
+import sys
+import tempfile
+
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic import synthetic_players
+from storage.codec import encode_players
+from storage.write_behind import write_file_atomic
+
+MODES = {"eager": "loaded completely", "lazy": "lazy, scanning the file", "indexed": "lazy, with players.json.index"}
+
+
+def rss_mib(field: str = "VmRSS") -> float:
+    """
+    Resident memory of this process from /proc where available. "RssAnon" leaves out pages of the memory mapped
+    players.json, which the OS can drop at any time.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def start_bot(data_folder: Path, lazy: bool, lookups_amount: int) -> Dict[str, float]:
+    """ Runs in the child process. """
+    from bot import TwitchChatBot
+    from models.bot_config import BotConfig
+    from storage.json_storage import JsonStorage
+
+    storage = JsonStorage(data_folder, BotConfig(lazy_players=lazy, reload_interval=0))
+    bot = TwitchChatBot("abc", "...", "thelist_bot", "!", storage=storage, history_file_path=data_folder / "history")
+    ready_time = time.perf_counter() - STARTED
+    ready_rss = rss_mib()
+    ready_anonymous_rss = rss_mib("RssAnon")
+
+    player_names = random.Random(0).sample(list(bot.players.players), lookups_amount)
+    t0 = time.perf_counter()
+    for player_name in player_names:
+        bot.players.get_information(player_name)
+    lookup_time = time.perf_counter() - t0
+    return {
+        "ready_seconds": ready_time,
+        "ready_rss_mib": ready_rss,
+        "ready_anonymous_rss_mib": ready_anonymous_rss,
+        "lookup_microseconds": lookup_time / lookups_amount * 1e6,
+        "rss_after_lookups_mib": rss_mib(),
+        "anonymous_rss_after_lookups_mib": rss_mib("RssAnon"),
+    }
+
+
+def run_child(data_folder: Path, mode: str, lookups_amount: int) -> Dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", str(data_folder), mode, str(lookups_amount)],
+        check=True,
+        stdout=subprocess.PIPE,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        print(json.dumps(start_bot(Path(sys.argv[2]), sys.argv[3] != "eager", int(sys.argv[4]))))
+        sys.exit()
+
+    players_amount = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    lookups_amount = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    with tempfile.TemporaryDirectory() as directory:
+        data_folder = Path(directory)
+        text = encode_players(synthetic_players(players_amount))
+        write_file_atomic(data_folder / "players.json", text)
+        print(f"{players_amount} players, players.json: {len(text) / 2 ** 20:.1f} MiB")
+        for mode, description in MODES.items():
+            if mode == "lazy":
+                (data_folder / "players.json.index").unlink(missing_ok=True)
+            result = run_child(data_folder, mode, lookups_amount)
+            print(
+                f"{description:>29} | ready after {result['ready_seconds']:4.2f} s,"
+                f" RSS {result['ready_rss_mib']:5.1f} MiB ({result['ready_anonymous_rss_mib']:5.1f} MiB anonymous)"
+                f" | {lookups_amount} lookups: {result['lookup_microseconds']:4.1f} us each,"
+                f" RSS {result['rss_after_lookups_mib']:5.1f} MiB ({result['anonymous_rss_after_lookups_mib']:5.1f} MiB)"
+            )
@@ -0,0 +1,74 @@
+"""
+Measures the memory used by 100k information entries with tracemalloc,
+compared to the previous representation (dataclass with __dict__, float timestamps, one author string per entry).
+
+python benchmarks/memory.py [information amount]
+"""
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic import synthetic_players
+from storage.codec import decode_players, encode_players
+
+
+@dataclass()
+class LegacyInformation:
+    info: str
+    created_by: str
+    created_timestamp: int = field(default_factory=lambda: time.time())
+    modified_by: Optional[str] = None
+    modified_timestamp: Optional[int] = None
+
+
+@dataclass()
+class LegacyPlayer:
+    information: List[LegacyInformation] = field(default_factory=lambda: [])
+
+
+def decode_legacy(text: str) -> Dict[str, LegacyPlayer]:
+    return {
+        player_name: LegacyPlayer(
+            [
+                LegacyInformation(**{**information, "created_timestamp": float(information["created_timestamp"])})
+                for information in player_dict["information"]
+            ]
+        )
+        for player_name, player_dict in json.loads(text)["players"].items()
+    }
+
+
+def measure(decode: Callable[[str], object], text: str) -> int:
+    gc.collect()
+    tracemalloc.start()
+    result = decode(text)
+    gc.collect()
+    size, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+if __name__ == "__main__":
+    information_amount = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    # Synthetic players have 2 information entries on average
+    players = synthetic_players(information_amount // 2)
+    actual_amount = sum(len(player.information) for player in players.players.values())
+    text = encode_players(players)
+    del players
+
+    legacy_size = measure(decode_legacy, text)
+    compact_size = measure(decode_players, text)
+    print(
+        f"{actual_amount} information entries | legacy: {legacy_size / 2 ** 20:6.1f} MiB ({legacy_size / actual_amount:5.0f} B/entry)"
+        f" | compact: {compact_size / 2 ** 20:6.1f} MiB ({compact_size / actual_amount:5.0f} B/entry)"
+        f" | {1 - compact_size / legacy_size:4.0%} less"
+    )
@@ -0,0 +1,147 @@
+"""
+Stress test of the MutationQueue: many admins add and edit information at the same time, like concurrent !add and
+!edit commands in different channels. Every admin adds to their own player and to one player they all share, and
+edits their own entries. Afterwards it checks that no change was lost, in memory and after loading the data again.
+Compared with applying and saving every mutation on its own like TwitchChatBot.mutate did before, for both
+storage backends.
+
+Only sqlite gets faster, one transaction per batch instead of one per mutation. With the json journal both are about
+the same: a mutation mostly costs applying it to Players and encoding its journal line, which a batch can't save,
+while the flush per line that it does save is a write to the page cache of about 2 microseconds.
+With few admins the queue is even slower, its futures and the wakeup cost more than that.
+
+python benchmarks/mutation_queue.py [admins amount] [mutations per admin]
+"""
+import asyncio
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from benchmarks.synthetic import synthetic_players
+from chat.mutation_queue import MutationQueue
+from models.bot_config import BotConfig
+from models.channels import Channels
+from models.mutations import MUTATION_TARGETS, apply_mutation
+from models.users import Users
+from storage.base import Storage
+from storage.codec import players_to_dict
+from storage.json_storage import JsonStorage
+from storage.sqlite_storage import SqliteStorage
+
+PLAYERS_AMOUNT = 1000
+SHARED_PLAYER = "shared"
+
+
+def create_backend(backend: str, data_folder: Path) -> Storage:
+    if backend == "json":
+        return JsonStorage(data_folder, BotConfig(reload_interval=0))
+    return SqliteStorage(data_folder / "thelist.sqlite3")
+
+
+def seed(backend: str, data_folder: Path):
+    storage = create_backend(backend, data_folder)
+    players = synthetic_players(PLAYERS_AMOUNT)
+    if isinstance(storage, SqliteStorage):
+        storage.import_players(players)
+    else:
+        storage.players = players
+        storage.persister.mark_dirty("players")
+    storage.close()
+
+
+async def admin(mutate: Callable[[dict], Awaitable[Any]], admin_index: int, mutations_amount: int):
+    """ Every third mutation adds to the shared player, every third edits the last own entry. """
+    author_name = f"admin{admin_index}"
+    own_player = f"own{admin_index}"
+    own_amount = 0
+    for i in range(mutations_amount):
+        if i % 3 == 0:
+            await mutate(
+                {"op": "add_information", "author": author_name, "content": f"{SHARED_PLAYER} {author_name} {i}"}
+            )
+        elif i % 3 == 1 or own_amount == 0:
+            own_amount = await mutate({"op": "add_information", "author": author_name, "content": f"{own_player} {i}"})
+        else:
+            edited = await mutate(
+                {"op": "edit_information", "author": author_name, "content": f"{own_player} {own_amount - 1} {i}"}
+            )
+            assert edited
+
+
+def check(players, admins_amount: int, mutations_amount: int):
+    shared_texts = [information.info for information in players.get_information(SHARED_PLAYER)]
+    expected_shared = admins_amount * len(range(0, mutations_amount, 3))
+    assert len(shared_texts) == len(set(shared_texts)) == expected_shared, (len(shared_texts), expected_shared)
+    for admin_index in range(admins_amount):
+        own_texts = [information.info for information in players.get_information(f"own{admin_index}")]
+        # Each add is followed by an edit of that entry, except maybe the last one
+        assert len(own_texts) == len(range(1, mutations_amount, 3)), own_texts
+        last_edit = max((i for i in range(mutations_amount) if i % 3 == 2), default=None)
+        if last_edit is not None and last_edit > 1:
+            assert str(last_edit) in own_texts, (own_texts, last_edit)
+
+
+async def run(backend: str, use_queue: bool, admins_amount: int, mutations_amount: int) -> float:
+    with tempfile.TemporaryDirectory() as directory:
+        data_folder = Path(directory)
+        seed(backend, data_folder)
+        storage = create_backend(backend, data_folder)
+        channels, users, players = Channels(), Users(), storage.load_players()
+
+        def save(target: str):
+            getattr(storage, f"save_{target}")({"channels": channels, "users": users, "players": players}[target])
+
+        async def mutate_directly(mutation: dict) -> Any:
+            # What TwitchChatBot.mutate did before: every command applies and saves its own mutation
+            result = apply_mutation(channels, users, players, mutation)
+            if result:
+                save(MUTATION_TARGETS[mutation["op"]])
+            return result
+
+        queue = MutationQueue(
+            lambda mutation: apply_mutation(channels, users, players, mutation),
+            lambda targets: [save(target) for target in sorted(targets)],
+            storage.batch,
+        )
+        mutate = queue.submit if use_queue else mutate_directly
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(admin(mutate, i, mutations_amount) for i in range(admins_amount)))
+        await queue.stop()
+        await storage.flush()
+        duration = time.perf_counter() - t0
+        check(players, admins_amount, mutations_amount)
+        expected_dict = players_to_dict(players)
+        storage.close()
+
+        reloaded_storage = create_backend(backend, data_folder)
+        reloaded_players = reloaded_storage.load_players()
+        check(reloaded_players, admins_amount, mutations_amount)
+        # The order of the players can differ, e.g. sqlite loads them sorted by name
+        assert players_to_dict(reloaded_players) == expected_dict
+        reloaded_storage.close()
+        if use_queue:
+            stats = queue.stats()
+            print(f"{backend:>6} | {stats['batches']} batches of {stats['batch_size_avg']:.1f} mutations on average")
+    return admins_amount * mutations_amount / duration
+
+
+if __name__ == "__main__":
+    logger.remove()
+    admins_amount = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    mutations_amount = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    for backend in ["json", "sqlite"]:
+        direct_rate = asyncio.run(run(backend, False, admins_amount, mutations_amount))
+        queue_rate = asyncio.run(run(backend, True, admins_amount, mutations_amount))
+        print(
+            f"{backend:>6} | {admins_amount} admins x {mutations_amount} mutations, nothing lost"
+            f" | saved per command: {direct_rate:8.0f} mutations/s | queue: {queue_rate:8.0f} mutations/s"
+            f" | {queue_rate / direct_rate:4.1f}x"
+        )
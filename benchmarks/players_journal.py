@@ -0,0 +1,51 @@
+"""
+Compares the cost of persisting one '!edit' with a full players.json rewrite against appending it to the journal.
+
+python benchmarks/players_journal.py
+"""
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic import synthetic_players
+from storage.journal import PlayersJournal
+from storage.write_behind import write_file_atomic
+
+
+def benchmark(players_amount: int, edits: int = 200):
+    players = synthetic_players(players_amount)
+    with tempfile.TemporaryDirectory() as directory:
+        players_file_path = Path(directory) / "players.json"
+
+        # Full rewrite, what save_players did for every edit
+        rewrites = max(1, min(edits, 20_000 // players_amount))
+        t0 = time.perf_counter()
+        for i in range(rewrites):
+            players.edit_information("burny", f"player{i} 0 rewritten {i}")
+            write_file_atomic(players_file_path, players.to_json(indent=4))
+        full_rewrite = (time.perf_counter() - t0) / rewrites
+        snapshot_size = players_file_path.stat().st_size
+
+        journal = PlayersJournal(Path(directory) / "players.journal.jsonl", compact_size=10 ** 12)
+        players.observers.append(journal)
+        t0 = time.perf_counter()
+        for i in range(edits):
+            players.edit_information("burny", f"player{i} 0 journaled {i}")
+        journaled = (time.perf_counter() - t0) / edits
+        journal_size_per_edit = journal.size / edits
+        journal.close()
+
+    print(
+        f"{players_amount:>7} players | full rewrite: {full_rewrite * 1000:9.3f} ms/edit, {snapshot_size:>11} bytes/edit"
+        f" | journal: {journaled * 1000:7.3f} ms/edit, {journal_size_per_edit:5.0f} bytes/edit"
+        f" | {full_rewrite / journaled:8.0f}x"
+    )
+
+
+if __name__ == "__main__":
+    for amount in [1_000, 10_000, 100_000]:
+        benchmark(amount)
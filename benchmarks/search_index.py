@@ -0,0 +1,48 @@
+"""
+Measures !search query latency at different database sizes
+and compares building the search index with loading players.json.
+
+python benchmarks/search_index.py
+"""
+import sys
+import time
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic import synthetic_players
+from storage.codec import decode_players, encode_players
+
+QUERIES = ["cheeser", "proxy cannon", "korean zerg macro", "mech toss sky early", "doesnotexist"]
+
+
+def benchmark(players_amount: int, repetitions: int = 100):
+    text = encode_players(synthetic_players(players_amount))
+    t0 = time.perf_counter()
+    players = decode_players(text)
+    load_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    players.search_index.search("")
+    players.search_index.search("x")
+    build_time = time.perf_counter() - t0
+
+    # Rare words are what makes a search fast, add one entry with a unique word
+    players.add_information("burny", "serral plays a unique proxyhatch cheeser style")
+    query_times = []
+    for query in QUERIES + ["proxyhatch cheeser"]:
+        t0 = time.perf_counter()
+        for _ in range(repetitions):
+            players.search_index.search(query)
+        query_times.append(f"'{query}' {(time.perf_counter() - t0) / repetitions * 1000:.3f} ms")
+
+    print(
+        f"{players_amount:>7} players | json load: {load_time * 1000:7.1f} ms, index build: {build_time * 1000:7.1f} ms"
+    )
+    print(f"        {', '.join(query_times)}")
+
+
+if __name__ == "__main__":
+    for amount in [1_000, 10_000, 100_000]:
+        benchmark(amount)
@@ -0,0 +1,49 @@
+"""
+Floods the SendScheduler with a fake sender (no network) and shows that quiet channels and admin confirmations
+don't wait behind a busy channel, and that duplicate replies are only sent once.
+
+python benchmarks/send_scheduler.py
+"""
+import asyncio
+import sys
+import time
+
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from chat.send_scheduler import PRIORITY_ADMIN, PRIORITY_READ, SendScheduler
+
+
+async def main():
+    sent: List[Tuple[float, str, str]] = []
+    t0 = time.monotonic()
+
+    async def fake_sender(channel_name: str, text: str):
+        sent.append((time.monotonic() - t0, channel_name, text))
+
+    # 200 messages per second so the benchmark doesn't take minutes
+    scheduler = SendScheduler(fake_sender, messages_per_period=20, period=0.1)
+    futures = []
+    for i in range(300):
+        futures.append(scheduler.enqueue("busy_channel", f"!info reply {i % 100}", PRIORITY_READ))
+    for i in range(10):
+        futures.append(scheduler.enqueue("quiet_channel", f"!info reply {i}", PRIORITY_READ))
+    for i in range(5):
+        futures.append(scheduler.enqueue("admin_channel", f"Added #{i} information", PRIORITY_ADMIN))
+    await asyncio.gather(*futures)
+    await scheduler.stop()
+
+    last_sent: Dict[str, float] = {}
+    for sent_time, channel_name, _text in sent:
+        last_sent[channel_name] = sent_time
+    print(f"Sent {len(sent)} of {len(futures)} queued messages in {sent[-1][0]:.2f}s")
+    for channel_name, sent_time in last_sent.items():
+        print(f"  last message of {channel_name:>14} sent after {sent_time:.3f}s")
+    print(f"  stats: {scheduler.stats()}")
+    assert last_sent["admin_channel"] < last_sent["quiet_channel"] < last_sent["busy_channel"]
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
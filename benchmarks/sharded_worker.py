@@ -0,0 +1,30 @@
+"""
+A worker of sharding/supervisor.py that connects to a local IRC server like benchmarks/fake_irc.py instead of twitch.
+Started by benchmarks/sharding.py with 'Supervisor(..., worker_module="benchmarks.sharded_worker")'.
+"""
+import asyncio
+import sys
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sharding.worker import argument_parser, run_worker
+from benchmarks.fake_irc import connect_bot_to_url
+
+if __name__ == "__main__":
+    parser = argument_parser("One shard of the bot that uses a local IRC server")
+    parser.add_argument("--irc-host", required=True, help="Websocket url of the local IRC server")
+    arguments = parser.parse_args()
+    asyncio.run(
+        run_worker(
+            arguments.supervisor,
+            arguments.shard,
+            arguments.data_folder,
+            arguments.logs_folder,
+            # The local server doesn't validate the token
+            "local",
+            lambda bot: connect_bot_to_url(bot, arguments.irc_host),
+        )
+    )
+    sys.exit(1)
@@ -0,0 +1,99 @@
+"""
+Runs the bot in sharded mode against a local fake IRC server: a supervisor in this process and worker processes.
+Checks that every channel is joined by exactly one worker and that a change made through one worker
+is visible in another one, and measures how long that takes.
+
+python benchmarks/sharding.py [workers] [channels]
+"""
+import asyncio
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from loguru import logger
+
+from models.bot_config import BotConfig
+from sharding.supervisor import Supervisor
+from benchmarks.fake_irc import FakeIrcServer
+
+
+async def wait_until(condition: Callable[[], bool], timeout: float = 30.0):
+    t0 = time.monotonic()
+    while not condition():
+        if time.monotonic() - t0 > timeout:
+            raise TimeoutError("Condition was not met in time")
+        await asyncio.sleep(0.01)
+
+
+async def chat_round_trip(server: FakeIrcServer, channel_name: str, text: str, expected_reply: str) -> float:
+    """ Sends 'text' as the superadmin and returns the seconds until the bot replied with 'expected_reply'. """
+    t0 = time.monotonic()
+    replies_before = len(server.received)
+    await server.send_message(channel_name, "burny", text)
+    await wait_until(
+        lambda: any(
+            reply_channel == channel_name and expected_reply in reply
+            for reply_channel, reply in server.received[replies_before:]
+        )
+    )
+    return time.monotonic() - t0
+
+
+async def main(shards_amount: int, channels_amount: int):
+    logger.remove()
+    logger.add(sys.stdout, level="WARNING")
+    server = FakeIrcServer(joins_per_period=1000)
+    await server.start()
+
+    with tempfile.TemporaryDirectory() as data_folder:
+        # The log files of the workers are written to the temporary folder as well
+        supervisor = Supervisor(
+            shards_amount,
+            Path(data_folder),
+            BotConfig(),
+            ["--irc-host", server.url],
+            logs_folder=Path(data_folder) / "logs",
+            worker_module="benchmarks.sharded_worker",
+        )
+        supervisor.mutate({"op": "add_users", "user_type": "superadmin", "names": ["burny"]})
+        channel_names = [f"channel{i}" for i in range(channels_amount)]
+        supervisor.mutate({"op": "add_channels", "names": channel_names})
+
+        t0 = time.monotonic()
+        await supervisor.start()
+        await wait_until(lambda: len(server.channels) == channels_amount)
+        print(f"{shards_amount} workers joined {channels_amount} channels after {time.monotonic() - t0:.2f}s")
+        for shard in range(shards_amount):
+            print(f"  worker {shard}: {len(supervisor.channels_of(shard))} channels")
+        assert all(len(sockets) == 1 for sockets in server.channels.values())
+
+        # A change through one worker has to be visible in the others
+        first_channel = supervisor.channels_of(0)[0]
+        other_channel = supervisor.channels_of(shards_amount - 1)[0]
+        duration = await chat_round_trip(server, first_channel, "!add serral hello from worker 0", "Added #1")
+        print(f"!add through worker 0 took {duration * 1000:.1f}ms")
+        duration = await chat_round_trip(server, other_channel, "!info serral", "hello from worker 0")
+        print(f"!info through worker {shards_amount - 1} took {duration * 1000:.1f}ms and saw the change")
+
+        # Only the worker of the new channel joins it
+        duration = await chat_round_trip(server, other_channel, "!addchannel newchannel", "Added new channels")
+        await wait_until(lambda: "newchannel" in server.channels)
+        print(
+            f"!addchannel took {duration * 1000:.1f}ms, "
+            f"newchannel was joined by worker {supervisor.ring.shard_for('newchannel')}"
+        )
+        assert len(server.channels["newchannel"]) == 1
+
+        await supervisor.stop()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    shards_amount = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    channels_amount = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    asyncio.run(main(shards_amount, channels_amount))
@@ -0,0 +1,117 @@
+"""
+Profiles the startup of the bot: which packages 'import bot' spends its time on (python -X importtime),
+how long it takes from starting python until the bot is constructed, and how long rendering the reply of
+!info <player> <index> takes, compared to formatting the timestamps with arrow like before
+(arrow is no longer a dependency, the comparison only runs if it is installed).
+Every start runs in a new process, the median of all runs is printed.
+
+python benchmarks/startup.py [runs] [top packages amount]
+"""
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+ROOT_FOLDER = Path(__file__).parent.parent
+RENDERED_AMOUNT = 100_000
+
+CONSTRUCT_BOT = """
+from pathlib import Path
+from bot import TwitchChatBot
+from models.bot_config import BotConfig
+from storage.json_storage import JsonStorage
+
+data_folder = Path({data_folder!r})
+storage = JsonStorage(data_folder, BotConfig(reload_interval=0))
+TwitchChatBot("abc", "...", "thelist_bot", "!", storage=storage, history_file_path=data_folder / "history")
+"""
+
+
+def import_profile() -> Tuple[float, Dict[str, float]]:
+    """ Seconds 'import bot' takes and seconds spent in the modules of each top level package. """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import bot"],
+        cwd=ROOT_FOLDER,
+        check=True,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    ).stderr
+    total = 0.0
+    packages: Dict[str, float] = defaultdict(float)
+    # import time: self [us] | cumulative | imported package
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, cumulative_time, module_name = line[len("import time:") :].split("|")
+        packages[module_name.strip().split(".")[0]] += int(self_time) / 1e6
+        if module_name.strip() == "bot":
+            total = int(cumulative_time) / 1e6
+    return total, packages
+
+
+def time_to_ready(data_folder: Path) -> float:
+    """ From starting python until the bot is constructed with empty data files. """
+    t0 = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", CONSTRUCT_BOT.format(data_folder=str(data_folder))], cwd=ROOT_FOLDER, check=True
+    )
+    return time.perf_counter() - t0
+
+
+def render_time() -> Dict[str, float]:
+    """ Microseconds per !info <player> <index> reply, half of the entries were edited. """
+    from models.information import Information
+
+    now = int(time.time())
+    entries: List[Information] = [
+        Information(f"plays zerg {i}", "burny", now - i * 3600, *(("harstem", now - i * 60) if i % 2 else ()))
+        for i in range(1000)
+    ]
+    results: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    for i in range(RENDERED_AMOUNT):
+        entries[i % len(entries)].info_detailled
+    results["info_detailled"] = (time.perf_counter() - t0) / RENDERED_AMOUNT * 1e6
+    try:
+        import arrow
+    except ImportError:
+        return results
+
+    t0 = time.perf_counter()
+    for i in range(RENDERED_AMOUNT):
+        information = entries[i % len(entries)]
+        last_modified_time = arrow.get(information.modified_timestamp or information.created_timestamp)
+        last_modified_name = information.modified_by or information.created_by
+        _ = f"'{information.info}' was last modified by '{last_modified_name}' on {last_modified_time} which was {last_modified_time.humanize()}."
+    results["arrow"] = (time.perf_counter() - t0) / RENDERED_AMOUNT * 1e6
+    return results
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    top_amount = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    profiles = [import_profile() for _ in range(runs)]
+    print(f"import bot: {statistics.median(total for total, _ in profiles) * 1000:6.1f} ms, slowest packages:")
+    package_times = {
+        package_name: statistics.median(packages.get(package_name, 0.0) for _, packages in profiles)
+        for package_name in profiles[0][1]
+    }
+    for package_name, seconds in sorted(package_times.items(), key=lambda item: -item[1])[:top_amount]:
+        print(f"{package_name:>20} {seconds * 1000:6.1f} ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        ready_seconds = statistics.median(time_to_ready(Path(directory)) for _ in range(runs))
+    print(f"ready after: {ready_seconds * 1000:6.1f} ms")
+
+    print(
+        "!info <player> <index>: "
+        + ", ".join(f"{name} {micro_seconds:5.2f} us" for name, micro_seconds in render_time().items())
+    )
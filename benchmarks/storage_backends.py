@@ -0,0 +1,110 @@
+"""
+Runs the same lookups and mutations against the json and the sqlite storage backend,
+checks that both load back the same data and prints the timings.
+
+python benchmarks/storage_backends.py
+"""
+import asyncio
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic import synthetic_players
+from models.bot_config import BotConfig
+from models.channels import Channels
+from models.users import Users
+from storage.base import Storage
+from storage.json_storage import JsonStorage
+from storage.sqlite_storage import SqliteStorage
+
+
+def create_backend(backend: str, data_folder: Path) -> Storage:
+    if backend == "json":
+        return JsonStorage(data_folder, BotConfig(save_interval=0.1))
+    return SqliteStorage(data_folder / "thelist.sqlite3")
+
+
+def seed(backend: str, data_folder: Path, players_amount: int):
+    storage = create_backend(backend, data_folder)
+    players = synthetic_players(players_amount)
+    if isinstance(storage, SqliteStorage):
+        storage.import_players(players)
+    else:
+        storage.players = players
+        storage.persister.mark_dirty("players")
+    storage.save_users(Users())
+    storage.save_channels(Channels({"burnysc2"}))
+    storage.close()
+
+
+async def mutate(storage: Storage, mutations: int):
+    players = storage.load_players()
+    users = storage.load_users()
+    channels = storage.load_channels()
+    t0 = time.perf_counter()
+    for i in range(mutations):
+        players.add_information("burny", f"player{i} added {i}")
+        storage.save_players(players)
+        players.edit_information("burny", f"player{i + 1} 0 edited {i}")
+        storage.save_players(players)
+        if i % 10 == 0:
+            players.delete_information(f"player{i + 2}")
+            storage.save_players(players)
+    users.add_admin("burny")
+    storage.save_users(users)
+    channels.channels.add("thelist")
+    storage.save_channels(channels)
+    await storage.flush()
+    return time.perf_counter() - t0
+
+
+def benchmark(backend: str, players_amount: int, mutations: int = 1000) -> str:
+    with tempfile.TemporaryDirectory() as directory:
+        data_folder = Path(directory)
+        seed(backend, data_folder, players_amount)
+
+        storage = create_backend(backend, data_folder)
+        t0 = time.perf_counter()
+        players = storage.load_players()
+        load_time = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for i in range(mutations):
+            players.get_information(f"player{i * 7 % players_amount}")
+        lookup_time = time.perf_counter() - t0
+
+        mutation_time = asyncio.run(mutate(storage, mutations))
+        storage.close()
+
+        # Everything has to be the same after a restart, timestamps differ between the runs
+        reloaded_storage = create_backend(backend, data_folder)
+        result = (
+            {
+                player_name: [
+                    (information.info, information.created_by, information.modified_by)
+                    for information in player.information
+                ]
+                for player_name, player in reloaded_storage.load_players().players.items()
+                if player.information
+            },
+            reloaded_storage.load_users().to_json(),
+            sorted(reloaded_storage.load_channels().channels),
+        )
+        reloaded_storage.close()
+
+    print(
+        f"{backend:>6} {players_amount:>7} players | load: {load_time * 1000:9.1f} ms"
+        f" | lookup: {lookup_time / mutations * 1e6:6.2f} us | mutation: {mutation_time / mutations / 2.1 * 1e6:8.1f} us"
+    )
+    return result
+
+
+if __name__ == "__main__":
+    for amount in [1_000, 10_000]:
+        json_result = benchmark("json", amount)
+        sqlite_result = benchmark("sqlite", amount)
+        assert json_result == sqlite_result, "json and sqlite storage returned different data"
@@ -0,0 +1,46 @@
+import random
+
+from models.information import Information
+from models.player import Player
+from models.players import Players
+
+ADMIN_NAMES = ["burny", "harstem", "lowko", "pig", "wardi", "rotterdam", "artosis", "tasteless"]
+WORDS = [
+    "cheeser",
+    "proxy",
+    "macro",
+    "god",
+    "zerg",
+    "terran",
+    "protoss",
+    "likes",
+    "mech",
+    "bio",
+    "ling",
+    "bane",
+    "cannon",
+    "rush",
+    "korean",
+    "european",
+    "plays",
+    "sky",
+    "toss",
+    "early",
+]
+
+
+def synthetic_players(players_amount: int, seed: int = 0) -> Players:
+    """ Creates a database with 'players_amount' players and 1 to 3 information entries each. """
+    rng = random.Random(seed)
+    players = Players()
+    for player_index in range(players_amount):
+        information = [
+            Information(
+                info=" ".join(rng.choices(WORDS, k=rng.randint(2, 8))),
+                created_by=rng.choice(ADMIN_NAMES),
+                created_timestamp=1_600_000_000 + rng.randint(0, 50_000_000),
+            )
+            for _ in range(rng.randint(1, 3))
+        ]
+        players.players[f"player{player_index}"] = Player(information)
+    return players
@@ -1,28 +1,41 @@
 from twitchio.ext import commands
 from twitchio import Message as TwitchMessage
+from twitchio import Channel as TwitchChannel
 from twitchio.ext.commands import Context as TwitchContext
+from twitchio.ext.commands.stringparser import StringParser
 
 
-import os
+import asyncio
+import atexit
 import sys
 import json
+import time
 from pathlib import Path
-from typing import List, Callable
+from typing import Any, List, Iterator, Optional, Set
 
 # https://github.com/Delgan/loguru
 from loguru import logger
 
-# Remove default loggers
-logger.remove()
-# Log to console
-logger.add(sys.stdout, level="INFO")
-# Log to file, max size 5mb
-logger.add("bot.log", level="INFO")
-
 from models.channels import Channels
-from models.users import Users
+from models.users import Users, role_allows
 from models.players import Players
 from models.information import Information
+from models.bot_config import BotConfig
+from models.history import EditHistory
+from models.mutations import apply_mutation, MUTATION_TARGETS
+from storage.base import Storage
+from storage.backends import create_storage
+from storage.file_watcher import Merge
+from chat.send_scheduler import SendScheduler, CHANNEL_RATE_LIMITS, RATE_LIMITS, PRIORITY_ADMIN, PRIORITY_READ
+from chat.pagination import PageCursors, paginate
+from chat.render_cache import RenderCache
+from chat.dispatch import CommandTable, ParsedCommand
+from chat.flood_control import FloodControl
+from chat.mutation_queue import MutationQueue
+from chat.channel_manager import ChannelManager, JOIN_RATE_LIMITS
+from chat.metrics import Metrics, MetricsServer
+from chat.logs import LogSampler, audit, setup_logging
+from chat.shutdown import handle_stop_signals
 
 
 """
@@ -54,9 +67,44 @@ data/player.json - Dict[str, List[Information]] info about players
 """
 
 
+# Commands that only read, their replies are sent with PRIORITY_READ and they are the first to be dropped under load
+READ_COMMANDS = {"info", "more", "stats", "search", "listplayers", "listchannels"}
+
+
 class TwitchChatBot(commands.Bot):
-    def __init__(self, irc_token: str, client_id: str, bot_name: str, command_prefix: str):
-        self.channels_file_path = Path(__file__).parent / "data" / "channels.json"
+    def __init__(
+        self,
+        irc_token: str,
+        client_id: str,
+        bot_name: str,
+        command_prefix: str,
+        storage: Optional[Storage] = None,
+        history_file_path: Optional[Path] = None,
+    ):
+        self.config = BotConfig.load(Path(__file__).parent / "config" / "bot_config.json")
+        # Workers in sharded mode get their storage from the supervisor
+        if storage is None:
+            storage = create_storage(self.config, Path(__file__).parent / "data")
+        self.storage: Storage = storage
+        # Set in sharded mode, then changes are sent to the supervisor, see 'mutate'
+        self.shard_client = None
+        # All messages to chat go through here, see 'reply'
+        self.send_scheduler = SendScheduler(
+            self._send_to_channel,
+            RATE_LIMITS[self.config.account_type],
+            channel_messages_per_period=CHANNEL_RATE_LIMITS[self.config.account_type],
+        )
+        # Remaining pages of long replies, see '!more'
+        self.page_cursors = PageCursors()
+        # Applies and saves all changes in order, see 'mutate'
+        self.mutation_queue = MutationQueue(self._apply_mutation, self._commit_mutations, lambda: self.storage.batch())
+        # Rendered !info replies
+        self.render_cache = RenderCache()
+        # Previous texts of edited information, see '!history'. Workers in sharded mode keep their own file
+        if history_file_path is None:
+            history_file_path = Path(__file__).parent / "data" / "history"
+        self.edit_history = EditHistory(history_file_path, self.config.history_size, self.config.history_memory_entries)
+
         self.channels = Channels()
         self.load_channels()
 
@@ -68,144 +116,511 @@ class TwitchChatBot(commands.Bot):
             # The name of the bot, you need to create a second twitch account for this
             nick=bot_name,
             prefix=command_prefix,
-            # The initial channels the bot is going to join, for now it will only be one channel
-            initial_channels=list(self.channels.channels),
+            # Channels are joined by the channel manager once the bot is connected
+            initial_channels=[],
         )
+        # Joins the channels in rate limited batches, see 'event_ready'
+        self.channel_manager = ChannelManager(
+            self.join_channels, self.part_channels, JOIN_RATE_LIMITS[self.config.account_type]
+        )
+        # Names and aliases of all commands, to check messages before invoking a command
+        self.command_table = CommandTable(command_prefix, self.commands, self._command_aliases)
 
         self.allow_all_users: bool = False
         self.whisper_responses: bool = False
+        # How many player names one page of !listplayers shows
+        self.players_per_page: int = 20
+        # How many entries !search shows
+        self.search_results_limit: int = 5
 
-        self.users_file_path = Path(__file__).parent / "data" / "users.json"
         self.users = Users()
         self.load_users()
 
-        self.players_file_path = Path(__file__).parent / "data" / "players.json"
         self.players = Players()
         self.load_players()
 
+        # Limits how many commands users and channels can run, checked before a command is invoked
+        self.flood_control = FloodControl(
+            self.config.flood_user_limit,
+            self.config.flood_channel_limit,
+            self.config.flood_global_limit,
+            self.config.flood_window,
+            self.config.flood_command_cooldowns,
+            self.config.flood_exempt_roles,
+            self.config.flood_shed_queue_depth,
+            lambda: self.send_scheduler.queue_depth,
+            READ_COMMANDS,
+        )
+
+        # Busy read commands only log every n-th invocation
+        self.log_sampler = LogSampler(self.config.log_sample_rates)
+
+        # Only recorded if enabled in the config, see '!stats'
+        self.metrics: Optional[Metrics] = None
+        self.metrics_server: Optional[MetricsServer] = None
+        if self.config.metrics:
+            self.metrics = Metrics(
+                {
+                    "send_scheduler": self.send_scheduler.stats,
+                    "mutation_queue": self.mutation_queue.stats,
+                    "render_cache": self.render_cache.stats,
+                    "edit_history": self.edit_history.stats,
+                    "channel_manager": self.channel_manager.stats,
+                    "flood_control": self.flood_control.stats,
+                    "storage": self.storage.stats,
+                }
+            )
+            if self.config.metrics_port:
+                self.metrics_server = MetricsServer(self.metrics, port=self.config.metrics_port)
+
+        # Make sure pending changes are written even if the bot is not closed cleanly
+        atexit.register(self.storage.close)
+        atexit.register(self.edit_history.close)
+        # Closes the bot on SIGTERM and SIGINT, see 'install_signal_handlers'
+        self._signal_shutdown: Optional[asyncio.Future] = None
+
     ############ FILE READING
     def load_channels(self):
-        if self.channels_file_path.exists():
-            with self.channels_file_path.open() as f:
-                self.channels = Channels.from_json(f.read())
+        self.channels = self.storage.load_channels()
 
     def load_users(self):
-        if self.users_file_path.exists():
-            with self.users_file_path.open() as f:
-                self.users = Users.from_json(f.read())
+        self.users = self.storage.load_users()
 
     def load_players(self):
-        if self.players_file_path.exists():
-            with self.players_file_path.open() as f:
-                self.players = Players.from_json(f.read())
+        self.players = self.storage.load_players()
+        self.players.observers.append(self.render_cache)
+        self.render_cache.invalidate()
+        self.players.observers.append(self.edit_history)
 
     ############ FILE WRITING
+    # Depending on the storage backend, the data might not be written immediately
     def save_channels(self):
-        os.makedirs(self.channels_file_path.parent, exist_ok=True)
-        with self.channels_file_path.open("w") as f:
-            f.write(self.channels.to_json(indent=4))
+        self.storage.save_channels(self.channels)
 
     def save_users(self):
-        os.makedirs(self.users_file_path.parent, exist_ok=True)
-        with self.users_file_path.open("w") as f:
-            f.write(self.users.to_json(indent=4))
+        self.storage.save_users(self.users)
 
     def save_players(self):
-        os.makedirs(self.players_file_path.parent, exist_ok=True)
-        with self.players_file_path.open("w") as f:
-            f.write(self.players.to_json(indent=4))
+        self.storage.save_players(self.players)
+
+    def on_data_reloaded(self, target: str, merge: Merge):
+        """ Another program changed a data file and 'merge.applied' was taken over, see Storage.start_watching. """
+        audit(f"reload_{target}", "file", None, applied=merge.applied, conflicts=merge.conflicts)
+        if target == "channels":
+            self.channel_manager.request_join([name for name in merge.applied if name in self.channels.channels])
+            self.channel_manager.request_part([name for name in merge.applied if name not in self.channels.channels])
+
+    ############ CHANGES
+    async def mutate(self, mutation: dict, ctx: Optional[TwitchContext] = None) -> Any:
+        """
+        Applies a change to the channels, users or players and saves it, see models/mutations.py.
+        In sharded mode the supervisor applies it and sends it to every worker, then the result is returned.
+        The change is written to the audit log with the author and channel of 'ctx'.
+        """
+        if self.shard_client is not None:
+            result = await self.shard_client.mutate(mutation)
+        else:
+            result = await self.mutation_queue.submit(mutation)
+        if ctx is not None:
+            # The rows of an import can be many, its file path is logged instead
+            details = {key: value for key, value in mutation.items() if key not in {"op", "rows"}}
+            audit(mutation["op"], ctx.author.name, ctx.channel.name, mutation=details, result=result)
+        return result
+
+    def _apply_mutation(self, mutation: dict) -> Any:
+        """ Runs in the MutationQueue, one mutation after another. """
+        result = apply_mutation(self.channels, self.users, self.players, mutation)
+        if result and mutation["op"] == "add_channels":
+            self.channel_manager.request_join(result)
+        elif result and mutation["op"] == "delete_channels":
+            self.channel_manager.request_part(result)
+        return result
+
+    def _commit_mutations(self, targets: Set[str]):
+        """ Saves what a batch of the MutationQueue changed, once per target. """
+        for target in sorted(targets):
+            getattr(self, f"save_{target}")()
+
+    ############ SENDING
+    async def _send_to_channel(self, channel_name: str, text: str):
+        channel = self.get_channel(channel_name)
+        if channel is None:
+            raise ValueError(f"Bot is not in channel '{channel_name}'")
+        await channel.send(text)
+
+    def reply(self, ctx: TwitchContext, text: str, priority: int = PRIORITY_READ) -> asyncio.Future:
+        """ Queues a message to the channel of the command. Returns a future that resolves when it was sent. """
+        sent = self.send_scheduler.enqueue(ctx.channel.name, text, priority)
+        if self.metrics is not None:
+            self.metrics.observe_send(self.parsed_command(ctx).name, sent)
+        return sent
+
+    def install_signal_handlers(self):
+        """
+        Closes the bot on SIGTERM (systemd, deploys) and SIGINT, so the changes that wait for their delayed write
+        are saved. twitchio's 'run' only handles KeyboardInterrupt. Call before 'run'.
+        """
+        handle_stop_signals(self.loop, self._on_stop_signal)
+
+    def _on_stop_signal(self):
+        if self._signal_shutdown is None:
+            self._signal_shutdown = asyncio.ensure_future(self._close_and_stop())
+
+    async def _close_and_stop(self):
+        try:
+            await self.close()
+        finally:
+            # Ends 'run', which then closes the event loop
+            self.loop.stop()
+
+    async def close(self):
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        await self.channel_manager.stop()
+        await self.send_scheduler.stop()
+        await self.mutation_queue.stop()
+        await self.storage.flush()
+        self.edit_history.close()
+        await super().close()
 
     ############ EVENTS
     async def event_ready(self):
         print(f"Ready | {self.nick}")
+        # Called after every (re)connect, a new connection is in no channel yet
+        self.channel_manager.on_connected(self.channels.channels)
+        self.storage.start_watching(self.on_data_reloaded)
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
+
+    async def event_channel_joined(self, channel: TwitchChannel):
+        self.channel_manager.on_joined(channel.name)
+
+    async def event_channel_join_failure(self, channel_name: str):
+        self.channel_manager.on_join_failed(channel_name)
 
     async def event_message(self, message: TwitchMessage):
-        # print(message.content)
+        # Almost no message in chat is a command, reject them before twitchio parses anything
+        if message.echo:
+            return
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.messages_received += 1
+            t0 = time.perf_counter()
+        content: str = message.content
+        if content.startswith("@") and "reply-parent-msg-id" in message.tags:
+            # Remove the @username of reply messages
+            content = content.partition(" ")[2]
+        parsed = self.command_table.parse(content)
+        if parsed is None:
+            return
+        if metrics is not None:
+            t1 = time.perf_counter()
+            metrics.observe(parsed.name, "parse", t1 - t0)
+        parsed.role = self.users.role_of(message.author.name)
+        if metrics is not None:
+            t0 = time.perf_counter()
+            metrics.observe(parsed.name, "auth", t0 - t1)
+        if parsed.role is None and not self.allow_all_users:
+            # Every command needs at least the 'user' permission
+            return
+        rejection = self.flood_control.check(message.author.name, message.channel.name, parsed.name, parsed.role)
+        if rejection is not None:
+            # Not answered, a reply would use up the messages the bot may send as well
+            logger.debug(
+                "Ignored !{} of {} in {}: {} limit", parsed.name, message.author.name, message.channel.name, rejection
+            )
+            return
+
+        context = TwitchContext(
+            message=message,
+            bot=self,
+            prefix=self.command_table.prefix,
+            command=self.commands[parsed.name],
+            valid=True,
+            # Commands only take 'ctx' and use 'parsed_command' instead of twitchio's parsed arguments
+            view=StringParser(),
+        )
+        context.parsed_command = parsed
         try:
-            await self.handle_commands(message)
+            await self.invoke(context)
         except Exception as e:
             logger.trace(f"Error while receiving a message")
+        if metrics is not None:
+            metrics.observe(parsed.name, "execute", time.perf_counter() - t0)
+            metrics.count_command(parsed.name)
+
+    def parsed_command(self, ctx: TwitchContext) -> ParsedCommand:
+        """ The command of 'ctx', parsed once in 'event_message'. """
+        parsed: Optional[ParsedCommand] = getattr(ctx, "parsed_command", None)
+        if parsed is None:
+            # Command was invoked without going through 'event_message'
+            parsed = self.command_table.parse(ctx.message.content)
+            parsed.role = self.users.role_of(ctx.author.name)
+        return parsed
+
+    def allowed(self, ctx: TwitchContext, permission: str) -> bool:
+        """ Checks the role of the author that was looked up once in 'event_message', see models/users.py. """
+        return role_allows(self.parsed_command(ctx).role, permission)
 
     ############ COMMANDS
     @commands.command(name="add", aliases=["a"])
     async def add_information(self, ctx: TwitchContext):
         author_name: str = ctx.author.name
-        raw_content: str = ctx.message.content
         # Without the command:
-        content: str = " ".join(raw_content.split(" ")[1:])
+        content: str = self.parsed_command(ctx).content
 
-        logger.info(f"Trying to add information ({author_name}): {content}")
-        if not self.users.allowed_to_add_information(author_name):
-            logger.info(f"User {author_name} not allowed to add information")
+        logger.info("Trying to add information ({}): {}", author_name, content)
+        if not self.allowed(ctx, "add_information"):
+            logger.info("User {} not allowed to add information", author_name)
             return
 
         player_name, *_ = content.split(" ")
-        player = self.players.get_player(player_name)
-        previous_information_amount = len(player.information)
-        new_amount_information = self.players.add_information(author_name, content)
-        if previous_information_amount != new_amount_information:
-            self.save_players()
+        mutation = {"op": "add_information", "author": author_name, "content": content}
+        new_amount_information = await self.mutate(mutation, ctx)
+        if new_amount_information:
             logger.info(
-                f"Added information ({previous_information_amount} -> {new_amount_information}) ({author_name}): {content}"
+                "Added information ({} -> {}) ({}): {}",
+                new_amount_information - 1,
+                new_amount_information,
+                author_name,
+                content,
             )
-            await ctx.send(f"Added #{new_amount_information} information for player '{player_name}'")
+            self.reply(ctx, f"Added #{new_amount_information} information for player '{player_name}'", PRIORITY_ADMIN)
 
     @commands.command(name="edit", aliases=["e"])
     async def edit_information(self, ctx: TwitchContext):
         author_name: str = ctx.author.name
-        raw_content: str = ctx.message.content
         # Without the command:
-        content: str = " ".join(raw_content.split(" ")[1:])
+        content: str = self.parsed_command(ctx).content
 
-        logger.info(f"Trying to edit information ({author_name}): {content}")
-        if not self.users.allowed_to_edit_information(author_name):
-            logger.info(f"User {author_name} not allowed to edit information")
+        logger.info("Trying to edit information ({}): {}", author_name, content)
+        if not self.allowed(ctx, "edit_information"):
+            logger.info("User {} not allowed to edit information", author_name)
             return
 
-        should_save_new_players_json = self.players.edit_information(author_name, content)
-        if should_save_new_players_json:
-            self.save_players()
+        edited = await self.mutate({"op": "edit_information", "author": author_name, "content": content}, ctx)
+        if edited:
             player_name, information_index, *_ = content.split(" ")
-            logger.info(f"Edited information ({author_name}): {content}")
-            await ctx.send(f"Edited information at index '{information_index}' for player '{player_name}'")
+            logger.info("Edited information ({}): {}", author_name, content)
+            self.reply(
+                ctx, f"Edited information at index '{information_index}' for player '{player_name}'", PRIORITY_ADMIN
+            )
 
     @commands.command(name="delete", aliases=["del", "d"])
     async def delete_information(self, ctx: TwitchContext):
         author_name: str = ctx.author.name
-        raw_content: str = ctx.message.content
         # Without the command:
-        content: str = " ".join(raw_content.split(" ")[1:])
+        content: str = self.parsed_command(ctx).content
 
-        logger.info(f"Trying to delete information ({author_name}): {content}")
-        if not self.users.allowed_to_delete_information(author_name):
-            logger.info(f"User {author_name} not allowed to delete information")
+        logger.info("Trying to delete information ({}): {}", author_name, content)
+        if not self.allowed(ctx, "delete_information"):
+            logger.info("User {} not allowed to delete information", author_name)
             return
 
         player_name, *_ = content.split(" ")
         if not player_name:
             # TODO Incorrect command usage
             return
+        alias_player_name = self.players.aliases.get(player_name.lower())
+        if alias_player_name is not None:
+            # A typo in an alias shouldn't delete the information of the player behind it
+            self.reply(
+                ctx,
+                f"'{player_name.lower()}' is an alias of player '{alias_player_name}', "
+                f"use !delete {alias_player_name} to remove the player or !unalias {player_name.lower()}",
+                PRIORITY_ADMIN,
+            )
+            return
+
+        removed_information = await self.mutate({"op": "delete_information", "content": content}, ctx)
+        if removed_information is not None:
+            logger.info("Deleted information ({}): {}\nRemoved entry: {}", author_name, content, removed_information)
+            self.reply(ctx, f"Removed all information about player '{player_name}'", PRIORITY_ADMIN)
+            return
+        self.reply(ctx, f"There was no information about player '{player_name}'", PRIORITY_ADMIN)
+
+    @commands.command(name="history", aliases=["h"])
+    async def get_history(self, ctx: TwitchContext):
+        """ Shows the previous texts of an information entry, newest first. Usage: !history <player name> <index> """
+        author_name: str = ctx.author.name
+        content: str = self.parsed_command(ctx).content
+
+        logger.info("Trying to get history ({}): {}", author_name, content)
+        if not self.allowed(ctx, "get_history"):
+            logger.info("User {} not allowed to get history", author_name)
+            return
+
+        player_name, index_str, *_ = content.split(" ") + [""]
+        player_name = self.players.resolve(player_name.lower())
+        information_list = self.players.get_information(player_name)
+        if not index_str.isnumeric() or int(index_str) >= len(information_list):
+            self.reply(ctx, "Usage: !history <player name> <information index>", PRIORITY_ADMIN)
+            return
+        index = int(index_str)
+        revisions = self.edit_history.revisions(player_name, index, information_list[index].info)
+        if not revisions:
+            self.reply(
+                ctx, f"Information at index '{index}' of player '{player_name}' was never edited", PRIORITY_ADMIN
+            )
+            return
+        entries = (
+            f"{number}) '{text}' until {revision.edited_by} edited it {revision.edited_ago}"
+            for number, (text, revision) in enumerate(revisions, start=1)
+        )
+        pages = paginate(lambda page: f"History of player '{player_name}' ({index}, page {page}): ", entries)
+        self.reply(ctx, next(pages), PRIORITY_ADMIN)
+        self.page_cursors.set(ctx.channel.name, author_name, pages)
+
+    @commands.command(name="revert")
+    async def revert_information(self, ctx: TwitchContext):
+        """
+        Sets an information entry back to a previous text, the one before the last edit by default.
+        The revert is an edit itself, so it can be reverted as well. Usage: !revert <player name> <index> <revision>
+        """
+        author_name: str = ctx.author.name
+        content: str = self.parsed_command(ctx).content
+
+        logger.info("Trying to revert information ({}): {}", author_name, content)
+        if not self.allowed(ctx, "revert_information"):
+            logger.info("User {} not allowed to revert information", author_name)
+            return
+
+        player_name, index_str, revision_str, *_ = content.split(" ") + ["", ""]
+        player_name = self.players.resolve(player_name.lower())
+        information_list = self.players.get_information(player_name)
+        revision_number = int(revision_str) if revision_str.isnumeric() else 1
+        if not index_str.isnumeric() or int(index_str) >= len(information_list) or revision_number < 1:
+            self.reply(ctx, "Usage: !revert <player name> <information index> <revision>", PRIORITY_ADMIN)
+            return
+        index = int(index_str)
+        revisions = self.edit_history.revisions(player_name, index, information_list[index].info)
+        if revision_number > len(revisions):
+            self.reply(
+                ctx,
+                f"Information at index '{index}' of player '{player_name}' has {len(revisions)} revisions",
+                PRIORITY_ADMIN,
+            )
+            return
+        text, _ = revisions[revision_number - 1]
+        # A normal edit, so it is saved, sent to the other shards and recorded in the history like one
+        mutation = {"op": "edit_information", "author": author_name, "content": f"{player_name} {index} {text}"}
+        if await self.mutate(mutation, ctx):
+            logger.info(
+                "Reverted information ({}): {} {} to revision {}", author_name, player_name, index, revision_number
+            )
+            self.reply(
+                ctx,
+                f"Reverted information at index '{index}' of player '{player_name}' to revision {revision_number}: '{text}'",
+                PRIORITY_ADMIN,
+            )
+
+    @commands.command(name="alias")
+    async def add_alias(self, ctx: TwitchContext):
+        """ Makes a name refer to another player, e.g. a barcode account. Usage: !alias <name> <player name> """
+        author_name: str = ctx.author.name
+        content: str = self.parsed_command(ctx).content
+
+        logger.info("Trying to add alias ({}): {}", author_name, content)
+        if not self.allowed(ctx, "add_alias"):
+            logger.info("User {} not allowed to add alias", author_name)
+            return
+
+        alias_name, player_name, *_ = content.split(" ") + [""]
+        if not alias_name or not player_name:
+            self.reply(ctx, "Usage: !alias <name> <player name>", PRIORITY_ADMIN)
+            return
+        merged_into = await self.mutate({"op": "add_alias", "alias": alias_name, "player": player_name}, ctx)
+        if merged_into is None:
+            self.reply(ctx, f"'{alias_name.lower()}' already belongs to player '{player_name.lower()}'", PRIORITY_ADMIN)
+            return
+        logger.info("Added alias ({}): {} -> {}", author_name, alias_name, merged_into)
+        information_amount = len(self.players.get_information(merged_into))
+        self.reply(
+            ctx,
+            f"'{alias_name.lower()}' is now an alias of player '{merged_into}' with {information_amount} information",
+            PRIORITY_ADMIN,
+        )
+
+    @commands.command(name="unalias")
+    async def delete_alias(self, ctx: TwitchContext):
+        """ Usage: !unalias <name>, the information stays with the player. """
+        author_name: str = ctx.author.name
+        content: str = self.parsed_command(ctx).content
+
+        logger.info("Trying to delete alias ({}): {}", author_name, content)
+        if not self.allowed(ctx, "delete_alias"):
+            logger.info("User {} not allowed to delete alias", author_name)
+            return
+
+        alias_name, *_ = content.split(" ")
+        player_name = await self.mutate({"op": "delete_alias", "alias": alias_name}, ctx)
+        if player_name is None:
+            self.reply(ctx, f"'{alias_name.lower()}' is no alias", PRIORITY_ADMIN)
+            return
+        logger.info("Deleted alias ({}): {} -> {}", author_name, alias_name, player_name)
+        self.reply(ctx, f"'{alias_name.lower()}' is no alias of player '{player_name}' anymore", PRIORITY_ADMIN)
+
+    @commands.command(name="import")
+    async def import_information(self, ctx: TwitchContext):
+        """ Adds the information of a csv or jsonl file on this machine, see models/bulk.py. Usage: !import <file path> """
+        author_name: str = ctx.author.name
+        content: str = self.parsed_command(ctx).content
 
-        removed_player = self.players.delete_information(content)
-        if removed_player:
-            self.save_players()
-            logger.info(f"Deleted information ({author_name}): {content}\nRemoved entry: {removed_player}")
-            await ctx.send(f"Removed all information about player '{player_name}'")
+        logger.info("Trying to import information ({}): {}", author_name, content)
+        if not self.allowed(ctx, "import_information"):
+            logger.info("User {} not allowed to import information", author_name)
+            return
+        if not content:
+            self.reply(ctx, "Usage: !import <file path>", PRIORITY_ADMIN)
             return
-        await ctx.send(f"There was no information about player '{player_name}'")
+
+        # Imported on first use like in models/mutations.py, most bots never import a file
+        from models.bulk import parse_file
+
+        # Relative paths start at the folder of the bot
+        file_path = Path(__file__).parent / content
+        # Reading the file doesn't block the bot, only adding the parsed rows waits for other changes
+        rows, report = await asyncio.get_running_loop().run_in_executor(None, parse_file, file_path, author_name)
+        if rows:
+            result = await self.mutate({"op": "import_information", "path": str(file_path), "rows": rows}, ctx)
+            report.imported, report.duplicates = result["imported"], result["duplicates"]
+        logger.info("Imported information ({}): {} {}", author_name, file_path, report)
+        self.reply(ctx, report.summary(), PRIORITY_ADMIN)
+
+    def _render_information(self, player_name: str, index: int) -> Iterator[str]:
+        """ Returns the pages of the !info reply, long replies are split into pages that fit into a twitch message. """
+        if index != -1:
+            # Information about a specific index
+            information: Information = self.players.get_information_at_index(player_name, index)
+            header = f"Player '{player_name}' ({index}): "
+            entries = [information.info_detailled]
+        else:
+            # All information available
+            information_list: List[Information] = self.players.get_information(player_name)
+            header = f"Player '{player_name}': "
+            if len(information_list) > 1:
+                # Generator, entries are only rendered when their page is requested
+                entries = (f"{index}) '{repr(information)}'" for index, information in enumerate(information_list))
+            else:
+                entries = [repr(information_list[0])]
+        return paginate(
+            lambda page_number: header if page_number == 1 else f"Player '{player_name}' (page {page_number}): ",
+            entries,
+        )
 
     @commands.command(name="info", aliases=["i"])
     async def get_information(self, ctx: TwitchContext):
         author_name: str = ctx.author.name
-        raw_content: str = ctx.message.content
         # Without the command:
-        content: str = " ".join(raw_content.split(" ")[1:])
+        content: str = self.parsed_command(ctx).content
 
-        if not self.users.allowed_to_get_information(author_name):
-            logger.info(f"User {author_name} not allowed to get information")
+        if not self.allowed(ctx, "get_information"):
+            logger.info("User {} not allowed to get information", author_name)
             return
 
-        logger.info(f"Trying to get information ({author_name}): {content}")
+        # Only a sample of the requests is logged at INFO, the others at DEBUG
+        log_level = "INFO" if self.log_sampler.sample("info") else "DEBUG"
+        logger.log(log_level, "Trying to get information ({}): {}", author_name, content)
         player_name, *rest = content.split(" ")
         player_name: str = player_name.lower()
         if not player_name:
@@ -218,34 +633,127 @@ class TwitchChatBot(commands.Bot):
             if index_str.isnumeric():
                 index = int(index_str)
 
-        if index != -1:
-            # Return information about a specific index
-            information: Information = self.players.get_information_at_index(player_name, index)
-            response_string = f"Player '{player_name}' ({index}): {information.info_detailled}"
-
-        else:
-            # Return all information available
-            information_list: List[Information] = self.players.get_information(content)
-            if not information_list:
-                await ctx.send(f"There was no information about player '{player_name}'")
+        information_amount = len(self.players.get_information(player_name))
+        if not information_amount:
+            suggestions = self.players.name_index.suggest(player_name)
+            if suggestions:
+                self.reply(
+                    ctx,
+                    f"There was no information about player '{player_name}'. Did you mean: {', '.join(suggestions)}?",
+                )
                 return
+            self.reply(ctx, f"There was no information about player '{player_name}'")
+            return
+        if index >= information_amount:
+            # Checked before rendering, an error page would end up in the render cache
+            valid_indexes = "0" if information_amount == 1 else f"0 to {information_amount - 1}"
+            self.reply(
+                ctx,
+                f"Player '{player_name}' has no information {index}, "
+                f"the information index has to be {valid_indexes}",
+            )
+            return
 
-            if len(information_list) > 1:
-                response_list = [
-                    f"{index}) '{repr(information)}'" for index, information in enumerate(information_list)
-                ]
-                response_string = f"Player '{player_name}': {' | '.join(response_list)}"
-            else:
-                response_string = f"Player '{player_name}': {repr(information_list[0])}"
+        # Aliases share the rendered pages and the reply names the player they belong to
+        player_name = self.players.resolve(player_name)
+        # Rendered pages are shared by everyone asking for the same player until the player is changed
+        cache_key = self.render_cache.key(player_name, index)
+        pages = self.render_cache.get(cache_key, lambda: self._render_information(player_name, index))
+        self.page_cursors.set(ctx.channel.name, author_name, pages.iter_from(1))
+        if self.render_cache.collapse(ctx.channel.name, cache_key):
+            # Chat just got the same reply, !more still works for this user
+            logger.log(
+                log_level, "Got information ({}): {}\nResponse was just sent to this channel", author_name, content
+            )
+            return
+        response_string = pages.page(0)
+        logger.log(log_level, "Got information ({}): {}\nResponse: {}", author_name, content, response_string)
+        self.reply(ctx, f"{response_string}")
+
+    @commands.command(name="more", aliases=["m"])
+    async def get_more_information(self, ctx: TwitchContext):
+        """ Sends the next page of the last !info reply of the user in this channel. """
+        author_name: str = ctx.author.name
+        if not self.allowed(ctx, "get_information"):
+            logger.info("User {} not allowed to get information", author_name)
+            return
+
+        page = self.page_cursors.next_page(ctx.channel.name, author_name)
+        if page is None:
+            self.reply(ctx, "There are no more pages")
+            return
+        self.reply(ctx, page)
 
-        logger.info(f"Got information ({author_name}): {content}\nResponse: {response_string}")
-        # TODO What if the response string is longer than the twitch message limit?
-        await ctx.send(f"{response_string}")
+    @commands.command(name="stats")
+    async def get_stats(self, ctx: TwitchContext):
+        """ Shows message rate, latency of the commands and the state of the send queue, cache, channels and storage. """
+        author_name: str = ctx.author.name
+        if not self.allowed(ctx, "get_stats"):
+            logger.info("User {} not allowed to get stats", author_name)
+            return
+
+        if self.metrics is None:
+            self.reply(ctx, "Metrics are disabled, enable them with 'metrics' in config/bot_config.json")
+            return
+        pages = paginate(lambda page: f"Stats ({page}): ", self.metrics.summary())
+        self.reply(ctx, next(pages))
+        self.page_cursors.set(ctx.channel.name, author_name, pages)
+
+    @commands.command(name="search", aliases=["s"])
+    async def search_information(self, ctx: TwitchContext):
+        """ Find information entries that contain all given words. Usage: !search <words> """
+        author_name: str = ctx.author.name
+        if not self.allowed(ctx, "get_information"):
+            logger.info("User {} not allowed to search information", author_name)
+            return
+
+        # Without the command:
+        query: str = self.parsed_command(ctx).content.strip()
+        if not query:
+            # TODO Incorrect command usage
+            return
+
+        # The first search after startup or a reload builds the index, without blocking other commands
+        await self.players.search_index.build_in_executor()
+        result = self.players.search_index.search(query, limit=self.search_results_limit)
+        if not result.keys:
+            self.reply(ctx, f"There was no information matching '{query}'")
+            return
+        response_list = [
+            f"{player_name} {index}) '{repr(self.players.get_information_at_index(player_name, index))}'"
+            for player_name, index in result.keys
+        ]
+        amount = str(result.matches_amount) if result.amount_is_exact else f"at least {result.matches_amount}"
+        shown = f" (showing {len(result.keys)})" if result.matches_amount > len(result.keys) else ""
+        self.reply(ctx, f"Found {amount} entries for '{query}'{shown}: {' | '.join(response_list)}")
 
     @commands.command(name="listplayers", aliases=["lp"])
     async def list_all_player_names(self, ctx: TwitchContext):
-        """ List all player names which the bot has information about. """
-        # TODO
+        """ List all player names which the bot has information about. Usage: !listplayers [prefix] [page] """
+        author_name: str = ctx.author.name
+        if not self.allowed(ctx, "get_information"):
+            logger.info("User {} not allowed to list players", author_name)
+            return
+
+        # Without the command:
+        arguments: List[str] = [argument for argument in self.parsed_command(ctx).arguments if argument]
+        prefix = ""
+        page = 1
+        if arguments and arguments[-1].isnumeric():
+            page = max(1, int(arguments.pop()))
+        if arguments:
+            prefix = arguments[0].lower()
+
+        players_amount = self.players.name_index.count_prefix(prefix)
+        if not players_amount:
+            self.reply(ctx, f"There are no players starting with '{prefix}'" if prefix else "There are no players")
+            return
+        pages_amount = (players_amount - 1) // self.players_per_page + 1
+        page = min(page, pages_amount)
+        player_names = self.players.name_index.complete(
+            prefix, limit=self.players_per_page, offset=(page - 1) * self.players_per_page
+        )
+        self.reply(ctx, f"Players ({page}/{pages_amount}): {', '.join(player_names)}")
 
     @commands.command(name="listchannels", aliases=["lc"])
     async def list_all_channel_names(self, ctx: TwitchContext):
@@ -260,129 +768,108 @@ class TwitchChatBot(commands.Bot):
         # channel: TwitchChannel = ctx.channel
         # message: TwitchMessage = ctx.message
         assert user_type in {"superadmin", "admin", "user"}
-        add_permission = {
-            "superadmin": self.users.allowed_to_add_super_admin,
-            "admin": self.users.allowed_to_add_admin,
-            "user": self.users.allowed_to_add_user,
-        }
-        del_permission = {
-            "superadmin": self.users.allowed_to_delete_super_admin,
-            "admin": self.users.allowed_to_delete_admin,
-            "user": self.users.allowed_to_delete_user,
-        }
-        permission_function: Callable[[str], bool] = add_permission[user_type] if add else del_permission[user_type]
+        add_permission = {"superadmin": "add_super_admin", "admin": "add_admin", "user": "add_user"}
+        del_permission = {"superadmin": "delete_super_admin", "admin": "delete_admin", "user": "delete_user"}
+        permission: str = add_permission[user_type] if add else del_permission[user_type]
 
         # Check if command sender has permission
         author_name: str = ctx.author.name
-        if not permission_function(author_name):
-            return
-
-        logger.info(f"Trying to edit users ({author_name}): {user_names}")
-        add_dict = {
-            "superadmin": self.users.add_super_admin,
-            "admin": self.users.add_admin,
-            "user": self.users.add_user,
-        }
-        del_dict = {
-            "superadmin": self.users.delete_super_admin,
-            "admin": self.users.delete_admin,
-            "user": self.users.delete_user,
-        }
-        add_user_function: Callable[[str], bool] = add_dict[user_type] if add else del_dict[user_type]
-
-        added_users = []
+        if not self.allowed(ctx, permission):
+            return
+
+        logger.info("Trying to edit users ({}): {}", author_name, user_names)
         for user_name in user_names:
-            logger.info(f"Adding {user_name} to {user_type} (command by {ctx.author.name})")
-            # TODO Add information about who gave this person admin or user status
-            added = add_user_function(user_name.lower())
-            if added:
-                added_users.append(user_name)
+            logger.info("Adding {} to {} (command by {})", user_name, user_type, author_name)
+        # TODO Add information about who gave this person admin or user status
+        added_users: List[str] = await self.mutate(
+            {"op": "add_users" if add else "delete_users", "user_type": user_type, "names": user_names}, ctx
+        )
 
         if added_users:
-            self.save_users()
             if add:
-                await ctx.send(f"Added users with permission level '{user_type}': {', '.join(added_users)}")
+                self.reply(
+                    ctx, f"Added users with permission level '{user_type}': {', '.join(added_users)}", PRIORITY_ADMIN
+                )
             else:
-                await ctx.send(f"Removed users with permission level '{user_type}': {', '.join(added_users)}")
+                self.reply(
+                    ctx, f"Removed users with permission level '{user_type}': {', '.join(added_users)}", PRIORITY_ADMIN
+                )
 
     @commands.command(name="addsuperadmin", aliases=["addsuperadmins", "asa"])
     async def add_super_admin(self, ctx: TwitchContext):
         # Without '!addsuperadmin'
-        user_names: List[str] = ctx.message.content.split(" ")[1:]
+        user_names: List[str] = self.parsed_command(ctx).arguments
         await self.add_remove_admin_or_user(ctx, user_names, user_type="superadmin", add=True)
 
     @commands.command(name="delsuperadmin", aliases=["delsuperadmins", "dsa"])
     async def del_super_admin(self, ctx: TwitchContext):
         # Without '!delsuperadmin'
-        user_names: List[str] = ctx.message.content.split(" ")[1:]
+        user_names: List[str] = self.parsed_command(ctx).arguments
         await self.add_remove_admin_or_user(ctx, user_names, user_type="superadmin", add=False)
 
     @commands.command(name="addadmin", aliases=["addadmins", "aa"])
     async def add_admin(self, ctx: TwitchContext):
         # Without '!addadmin'
-        user_names: List[str] = ctx.message.content.split(" ")[1:]
+        user_names: List[str] = self.parsed_command(ctx).arguments
         await self.add_remove_admin_or_user(ctx, user_names, user_type="admin", add=True)
 
     @commands.command(name="deladmin", aliases=["deladmins", "da"])
     async def del_admin(self, ctx: TwitchContext):
         # Without '!deladmin'
-        user_names: List[str] = ctx.message.content.split(" ")[1:]
+        user_names: List[str] = self.parsed_command(ctx).arguments
         await self.add_remove_admin_or_user(ctx, user_names, user_type="admin", add=False)
 
     @commands.command(name="adduser", aliases=["addusers", "au"])
     async def add_user(self, ctx: TwitchContext):
         # Without '!adduser'
-        content: str = " ".join(ctx.message.content.split(" ")[1:])
-        await self.add_remove_admin_or_user(ctx, content.split(" "), user_type="user", add=True)
+        user_names: List[str] = self.parsed_command(ctx).arguments
+        await self.add_remove_admin_or_user(ctx, user_names, user_type="user", add=True)
 
     @commands.command(name="deluser", aliases=["delusers", "du"])
     async def del_user(self, ctx: TwitchContext):
         # Without '!deluser'
-        user_names: List[str] = ctx.message.content.split(" ")[1:]
+        user_names: List[str] = self.parsed_command(ctx).arguments
         await self.add_remove_admin_or_user(ctx, user_names, user_type="user", add=False)
 
     @commands.command(name="addchannel", aliases=["addchannels", "ac"])
     async def add_channel(self, ctx: TwitchContext):
         # Without '!addchannel'
-        channel_names: List[str] = ctx.message.content.split(" ")[1:]
-        if not self.users.allowed_to_add_channel(ctx.author.name):
-            return
-        logger.info(f"Trying to add channels ({ctx.author.name}): {', '.join(channel_names)}")
-
-        new_channels = []
-        for channel_name in channel_names:
-            channel_name: str = channel_name.lower()
-            if channel_name not in self.channels.channels:
-                logger.info(f"Adding channel ({ctx.author.name}): {channel_name}")
-                new_channels.append(channel_name)
-                self.channels.channels.add(channel_name)
+        channel_names: List[str] = self.parsed_command(ctx).arguments
+        if not self.allowed(ctx, "add_channel"):
+            return
+        logger.info("Trying to add channels ({}): {}", ctx.author.name, channel_names)
+
+        new_channels: List[str] = await self.mutate({"op": "add_channels", "names": channel_names}, ctx)
+        for channel_name in new_channels:
+            logger.info("Adding channel ({}): {}", ctx.author.name, channel_name)
         if new_channels:
-            self.save_channels()
-            await self.join_channels(new_channels)
-            await ctx.send(f"Added new channels: {', '.join(new_channels)}")
+            self.reply(ctx, f"Added new channels: {', '.join(new_channels)}", PRIORITY_ADMIN)
 
     @commands.command(name="delchannel", aliases=["delchannels", "dc"])
     async def del_channel(self, ctx: TwitchContext):
-        if not self.users.allowed_to_delete_channel(ctx.author.name):
+        if not self.allowed(ctx, "delete_channel"):
             return
         # Without '!delchannel'
-        channel_names: List[str] = ctx.message.content.split(" ")[1:]
-        logger.info(f"Trying to delete channels ({ctx.author.name}): {', '.join(channel_names)}")
-
-        new_channels = []
-        for channel_name in channel_names:
-            channel_name: str = channel_name.lower()
-            if channel_name in self.channels.channels:
-                logger.info(f"Deleting channel ({ctx.author.name}): {channel_name}")
-                new_channels.append(channel_name)
-                self.channels.channels.remove(channel_name)
+        channel_names: List[str] = self.parsed_command(ctx).arguments
+        logger.info("Trying to delete channels ({}): {}", ctx.author.name, channel_names)
+
+        new_channels: List[str] = await self.mutate({"op": "delete_channels", "names": channel_names}, ctx)
+        for channel_name in new_channels:
+            logger.info("Deleting channel ({}): {}", ctx.author.name, channel_name)
         if new_channels:
-            self.save_channels()
-            await self.part_channels(new_channels)
-            await ctx.send(f"Deleted channels: {', '.join(new_channels)}")
+            self.reply(ctx, f"Deleted channels: {', '.join(new_channels)}", PRIORITY_ADMIN)
 
 
 if __name__ == "__main__":
+    config = BotConfig.load(Path(__file__).parent / "config" / "bot_config.json")
+    if config.shards > 1:
+        from sharding.supervisor import run_supervisor
+
+        asyncio.run(run_supervisor(config.shards))
+        sys.exit(0)
+
+    setup_logging(config, Path("bot.log"), Path("audit.jsonl"))
+
     # Load token from twitch irc token config file
     token_file_path = Path(__file__).parent / "config" / "twitch_irc_token.json"
     with open(token_file_path) as f:
@@ -391,4 +878,6 @@ if __name__ == "__main__":
 
     # Start bot
     bot = TwitchChatBot(token, "...", "thelist_bot", "!")
+    bot.install_signal_handlers()
     bot.run()
+    bot.storage.close()
@@ -0,0 +1,49 @@
+"""
+Imports information from a csv or jsonl file into the players, or exports all information to such a file.
+One row per information: player, info, author, timestamp. See models/bulk.py.
+Stop the bot before importing, or use !import in chat while it is running.
+
+python bulk_data.py import season.csv [--author burny]
+python bulk_data.py export players.jsonl
+"""
+import argparse
+
+from pathlib import Path
+
+from models.bot_config import BotConfig
+from models.bulk import ImportReport, export_file, import_file
+from storage.backends import create_storage
+from storage.base import Storage
+
+
+def import_into_storage(storage: Storage, file_path: Path, author_name: str) -> ImportReport:
+    players = storage.load_players()
+    report = import_file(players, file_path, author_name)
+    if report.imported:
+        # The only write of the import
+        storage.save_players(players)
+    return report
+
+
+def export_from_storage(storage: Storage, file_path: Path) -> int:
+    return export_file(storage.load_players(), file_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import or export the information of all players")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("file", help="A .csv or .jsonl file")
+    parser.add_argument("--author", default="import", help="Author of imported rows that have none")
+    arguments = parser.parse_args()
+
+    config = BotConfig.load(Path(__file__).parent / "config" / "bot_config.json")
+    storage = create_storage(config, Path(__file__).parent / "data")
+    if arguments.action == "import":
+        import_report = import_into_storage(storage, Path(arguments.file), arguments.author.lower())
+        print(import_report.summary())
+        for error in import_report.errors:
+            print(error)
+    else:
+        rows_amount = export_from_storage(storage, Path(arguments.file))
+        print(f"Exported {rows_amount} rows to {arguments.file}")
+    storage.close()
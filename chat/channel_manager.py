@@ -0,0 +1,235 @@
+import asyncio
+import time
+
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional
+
+from loguru import logger
+
+# Channel states
+PENDING = "pending"
+JOINED = "joined"
+FAILED = "failed"
+
+# JOINs per 10 seconds twitch allows, see https://dev.twitch.tv/docs/irc/#rate-limits
+JOIN_RATE_LIMITS: Dict[str, int] = {
+    "normal": 20,
+    "moderator": 20,
+    "verified": 2000,
+}
+JOIN_RATE_LIMIT_PERIOD = 10.0
+# Channels per JOIN and PART call
+BATCH_SIZE = 20
+
+
+class ChannelManager:
+    """
+    Joins and parts channels in batches without exceeding the JOIN rate limit of twitch.
+    Every channel the bot should be in is either pending (join queued or sent), joined or failed.
+    Failed joins are retried with exponential backoff. After a (re)connect all channels are joined again.
+    """
+
+    def __init__(
+        self,
+        join: Callable[[List[str]], Awaitable[None]],
+        part: Callable[[List[str]], Awaitable[None]],
+        joins_per_period: int = JOIN_RATE_LIMITS["normal"],
+        period: float = JOIN_RATE_LIMIT_PERIOD,
+        retry_delay: float = 5.0,
+        max_retry_delay: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._join = join
+        self._part = part
+        self._clock = clock
+        self.joins_per_period = joins_per_period
+        self.period = period
+        # When the last 'joins_per_period' JOINs were sent, twitch counts them in a sliding window
+        self._join_times: Deque[float] = deque()
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        # [channel name: state] of all channels the bot should be in
+        self.states: Dict[str, str] = {}
+        self._join_queue: Deque[str] = deque()
+        self._part_queue: Deque[str] = deque()
+        # [channel name: failed join attempts in a row]
+        self._failed_attempts: Dict[str, int] = {}
+        # [channel name: when to try again]
+        self._retry_at: Dict[str, float] = {}
+        # Nothing can be joined until the bot is connected
+        self.connected = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Statistics
+        self.join_attempts = 0
+        self.join_failures = 0
+        self._converging_since: Optional[float] = None
+        # Seconds it took until all channels were joined, the last time that happened
+        self.last_convergence_time: Optional[float] = None
+
+    ############ REQUESTS
+    def request_join(self, channel_names: Iterable[str]):
+        for channel_name in channel_names:
+            if channel_name in self.states:
+                continue
+            if channel_name in self._part_queue:
+                self._part_queue.remove(channel_name)
+            self._queue_join(channel_name)
+        self._wake()
+
+    def request_part(self, channel_names: Iterable[str]):
+        for channel_name in channel_names:
+            state = self.states.pop(channel_name, None)
+            if state is None:
+                continue
+            if channel_name in self._join_queue:
+                self._join_queue.remove(channel_name)
+            self._failed_attempts.pop(channel_name, None)
+            self._retry_at.pop(channel_name, None)
+            if state != FAILED:
+                self._part_queue.append(channel_name)
+        self._check_converged()
+        self._wake()
+
+    def on_connected(self, channel_names: Iterable[str]):
+        """ Call after every (re)connect with the channels the bot should be in, the new connection is in none of them. """
+        self.connected = True
+        channel_names = set(channel_names)
+        self._join_queue.clear()
+        self._part_queue.clear()
+        self._retry_at.clear()
+        self._failed_attempts.clear()
+        self.states.clear()
+        for channel_name in sorted(channel_names):
+            self._queue_join(channel_name)
+        self._check_converged()
+        self._wake()
+
+    ############ EVENTS
+    def on_joined(self, channel_name: str):
+        if self.states.get(channel_name) not in {PENDING, FAILED}:
+            return
+        self.states[channel_name] = JOINED
+        self._failed_attempts.pop(channel_name, None)
+        self._retry_at.pop(channel_name, None)
+        self._check_converged()
+
+    def on_join_failed(self, channel_name: str):
+        if self.states.get(channel_name) != PENDING or channel_name in self._join_queue:
+            return
+        self.join_failures += 1
+        self.states[channel_name] = FAILED
+        attempts = self._failed_attempts[channel_name] = self._failed_attempts.get(channel_name, 0) + 1
+        delay = min(self.max_retry_delay, self.retry_delay * 2 ** (attempts - 1))
+        self._retry_at[channel_name] = self._clock() + delay
+        logger.warning(f"Failed to join channel {channel_name} ({attempts} times), trying again in {delay:.1f}s")
+        self._wake()
+
+    ############ WORKER
+    def _queue_join(self, channel_name: str):
+        self.states[channel_name] = PENDING
+        self._join_queue.append(channel_name)
+        if self._converging_since is None:
+            self._converging_since = self._clock()
+
+    def _check_converged(self):
+        if self._converging_since is None or any(state != JOINED for state in self.states.values()):
+            return
+        self.last_convergence_time = self._clock() - self._converging_since
+        self._converging_since = None
+        logger.info(f"In all {len(self.states)} channels after {self.last_convergence_time:.2f}s")
+
+    def _wake(self):
+        if self._worker is None or self._worker.done():
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                # Started by the first request after the event loop is running
+                return
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.ensure_future(self._run())
+        self._wakeup.set()
+
+    def _take_join(self) -> float:
+        """ Returns 0 and counts a JOIN if one can be sent now, otherwise returns the seconds until one can be sent. """
+        now = self._clock()
+        while self._join_times and self._join_times[0] <= now - self.period:
+            self._join_times.popleft()
+        if len(self._join_times) < self.joins_per_period:
+            self._join_times.append(now)
+            return 0.0
+        return self._join_times[0] + self.period - now
+
+    def _queue_due_retries(self):
+        now = self._clock()
+        for channel_name, retry_at in list(self._retry_at.items()):
+            if retry_at <= now:
+                del self._retry_at[channel_name]
+                self._queue_join(channel_name)
+
+    async def _run(self):
+        while True:
+            if not self.connected:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            self._queue_due_retries()
+
+            if self._part_queue:
+                batch = [self._part_queue.popleft() for _ in range(min(BATCH_SIZE, len(self._part_queue)))]
+                try:
+                    await self._part(batch)
+                except Exception as e:
+                    logger.error(f"Error while parting channels {', '.join(batch)}: {e}")
+                continue
+
+            if self._join_queue:
+                batch: List[str] = []
+                wait_time = 0.0
+                while self._join_queue and len(batch) < BATCH_SIZE:
+                    wait_time = self._take_join()
+                    if wait_time > 0:
+                        break
+                    batch.append(self._join_queue.popleft())
+                if not batch:
+                    await asyncio.sleep(wait_time)
+                    continue
+                self.join_attempts += len(batch)
+                try:
+                    await self._join(batch)
+                except Exception as e:
+                    logger.error(f"Error while joining channels {', '.join(batch)}: {e}")
+                    for channel_name in batch:
+                        self.on_join_failed(channel_name)
+                continue
+
+            # Nothing to do until the next retry or a new request
+            timeout = min(self._retry_at.values()) - self._clock() if self._retry_at else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    ############ STATISTICS
+    def stats(self) -> Dict[str, float]:
+        states = list(self.states.values())
+        return {
+            "pending": states.count(PENDING),
+            "joined": states.count(JOINED),
+            "failed": states.count(FAILED),
+            "join_attempts": self.join_attempts,
+            "join_failures": self.join_failures,
+            "last_convergence_time": self.last_convergence_time if self.last_convergence_time is not None else -1.0,
+        }
@@ -0,0 +1,42 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from twitchio.ext.commands import Command
+
+
+@dataclass()
+class ParsedCommand:
+    """ A chat message that called a command, parsed once before the command is invoked. """
+
+    # Name of the command, aliases are already resolved
+    name: str
+    # Everything after the command name
+    content: str
+    # 'content' split at spaces, empty if there is no content
+    arguments: List[str]
+    # User type of the sender from Users, None if the sender is not in Users
+    role: Optional[str]
+
+
+class CommandTable:
+    """
+    All names and aliases of the commands of the bot, so a message can be checked with a dict lookup
+    without twitchio creating a context and parsing the message first.
+    """
+
+    def __init__(self, prefix: str, commands: Dict[str, Command], aliases: Dict[str, str]):
+        self.prefix = prefix
+        # [command name or alias: command name]
+        self.names: Dict[str, str] = {name: name for name in commands}
+        for alias, name in aliases.items():
+            self.names.setdefault(alias, name)
+
+    def parse(self, text: str) -> Optional[ParsedCommand]:
+        """ Returns None if 'text' doesn't call a known command. The role is not looked up here. """
+        if not text.startswith(self.prefix):
+            return None
+        command_name, _, content = text[len(self.prefix) :].partition(" ")
+        name = self.names.get(command_name)
+        if name is None:
+            return None
+        return ParsedCommand(name, content, content.split(" ") if content else [], None)
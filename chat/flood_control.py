@@ -0,0 +1,167 @@
+import time
+
+from collections import OrderedDict
+from typing import Callable, Collection, Dict, List, Optional, Set
+
+# Why a command was rejected, see FloodControl.check
+REJECT_USER = "user"
+REJECT_CHANNEL = "channel"
+REJECT_GLOBAL = "global"
+REJECT_COOLDOWN = "cooldown"
+REJECT_SHED = "shed"
+REJECT_REASONS = [REJECT_USER, REJECT_CHANNEL, REJECT_GLOBAL, REJECT_COOLDOWN, REJECT_SHED]
+
+
+class SlidingWindow:
+    """
+    How many events happened in the last 'window' seconds for each key, e.g. per user.
+    Each key has a ring of 'buckets' counters that each cover window / buckets seconds, the oldest bucket is
+    cleared when time moves on, so the count is exact up to the length of one bucket.
+    Keys without events in the last window are dropped, and at most 'max_keys' keys are kept: if there are more,
+    the least recently active ones are dropped, which only makes the limit more lenient for them.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        window: float,
+        buckets: int = 10,
+        max_keys: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limit = limit
+        self.window = window
+        self.buckets = buckets
+        self.bucket_length = window / buckets
+        self.max_keys = max_keys
+        self._clock = clock
+        # [key: [number of the newest bucket, total count, count of each bucket...]], least recently active first
+        self._rings: "OrderedDict[str, List[int]]" = OrderedDict()
+
+    def _current_bucket(self) -> int:
+        return int(self._clock() / self.bucket_length)
+
+    def _drop_idle(self, bucket: int):
+        while self._rings:
+            key, ring = next(iter(self._rings.items()))
+            self._advance(ring, bucket)
+            if ring[1] > 0 and len(self._rings) <= self.max_keys:
+                return
+            del self._rings[key]
+
+    def _advance(self, ring: List[int], bucket: int):
+        """ Clears the buckets that fell out of the window since the ring was last used. """
+        for number in range(ring[0] + 1, min(bucket, ring[0] + self.buckets) + 1):
+            slot = 2 + number % self.buckets
+            ring[1] -= ring[slot]
+            ring[slot] = 0
+        ring[0] = bucket
+
+    def count(self, key: str) -> int:
+        ring = self._rings.get(key)
+        if ring is None:
+            return 0
+        self._advance(ring, self._current_bucket())
+        return ring[1]
+
+    def is_full(self, key: str) -> bool:
+        return 0 < self.limit <= self.count(key)
+
+    def add(self, key: str):
+        if self.limit <= 0:
+            # Disabled, nothing has to be counted
+            return
+        bucket = self._current_bucket()
+        ring = self._rings.get(key)
+        if ring is None:
+            ring = self._rings[key] = [bucket, 0] + [0] * self.buckets
+        else:
+            self._advance(ring, bucket)
+            self._rings.move_to_end(key)
+        ring[1] += 1
+        ring[2 + bucket % self.buckets] += 1
+        self._drop_idle(bucket)
+
+    def __len__(self) -> int:
+        return len(self._rings)
+
+
+class FloodControl:
+    """
+    Decides before a command is invoked if it is run at all, so one chatter or one busy channel can't use up
+    the messages the bot may send, see SendScheduler. A command is rejected if
+    - its user, its channel or all channels together ran more commands than allowed in the last 'window' seconds
+    - the same user ran the same command less than its cooldown ago
+    - the send queue is overloaded: replies to read commands are dropped first, once 'shed_queue_depth' replies
+      are waiting, admin commands only once twice as many are waiting
+    Users with one of the 'exempt_roles' from Users are never rejected. A limit of 0 disables it.
+    """
+
+    def __init__(
+        self,
+        user_limit: int,
+        channel_limit: int,
+        global_limit: int,
+        window: float,
+        cooldowns: Dict[str, float],
+        exempt_roles: Collection[str],
+        shed_queue_depth: int,
+        queue_depth: Callable[[], int],
+        read_commands: Set[str],
+        max_keys: int = 10_000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.users = SlidingWindow(user_limit, window, max_keys=max_keys, clock=clock)
+        self.channels = SlidingWindow(channel_limit, window, max_keys=max_keys, clock=clock)
+        self.all_channels = SlidingWindow(global_limit, window, max_keys=1, clock=clock)
+        # [command name: one invocation per user every 'cooldown' seconds]
+        self.cooldowns: Dict[str, SlidingWindow] = {
+            command_name: SlidingWindow(1, cooldown, max_keys=max_keys, clock=clock)
+            for command_name, cooldown in cooldowns.items()
+            if cooldown > 0
+        }
+        self.exempt_roles = set(exempt_roles)
+        self.shed_queue_depth = shed_queue_depth
+        self._queue_depth = queue_depth
+        self.read_commands = read_commands
+        # [reason: amount of rejected commands]
+        self.rejections: Dict[str, int] = dict.fromkeys(REJECT_REASONS, 0)
+
+    def _rejection(self, user_name: str, channel_name: str, command_name: str) -> Optional[str]:
+        if self.shed_queue_depth > 0:
+            is_read = command_name in self.read_commands
+            if self._queue_depth() >= self.shed_queue_depth * (1 if is_read else 2):
+                return REJECT_SHED
+        if self.users.is_full(user_name):
+            return REJECT_USER
+        if self.channels.is_full(channel_name):
+            return REJECT_CHANNEL
+        if self.all_channels.is_full(""):
+            return REJECT_GLOBAL
+        cooldown = self.cooldowns.get(command_name)
+        if cooldown is not None and cooldown.is_full(user_name):
+            return REJECT_COOLDOWN
+        return None
+
+    def check(self, user_name: str, channel_name: str, command_name: str, role: Optional[str]) -> Optional[str]:
+        """ Returns why the command is rejected, or None if it may run, then it is counted. """
+        if role in self.exempt_roles:
+            return None
+        reason = self._rejection(user_name, channel_name, command_name)
+        if reason is not None:
+            self.rejections[reason] += 1
+            return reason
+        # Rejected commands are not counted, so a spammer is let through again once the window moved on
+        self.users.add(user_name)
+        self.channels.add(channel_name)
+        self.all_channels.add("")
+        cooldown = self.cooldowns.get(command_name)
+        if cooldown is not None:
+            cooldown.add(user_name)
+        return None
+
+    def stats(self) -> Dict[str, float]:
+        stats: Dict[str, float] = {f"rejected_{reason}": amount for reason, amount in self.rejections.items()}
+        stats["tracked_users"] = len(self.users)
+        stats["tracked_channels"] = len(self.channels)
+        return stats
@@ -0,0 +1,101 @@
+import json
+import sys
+import time
+
+from pathlib import Path
+from typing import Any, Dict, Optional, TextIO
+
+from loguru import logger
+
+from models.bot_config import BotConfig
+
+# Records with this key in 'extra' only go to the audit log
+AUDIT_KEY = "audit"
+
+
+class SizeOrTimeRotation:
+    """ Rotates the log file once it is bigger than 'max_bytes' or older than 'max_age' seconds, for loguru's 'rotation'. """
+
+    def __init__(self, max_bytes: int, max_age: float):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._opened_at: Optional[float] = None
+
+    def __call__(self, message: Any, file: TextIO) -> bool:
+        now = time.time()
+        if self._opened_at is None:
+            self._opened_at = now
+        if file.tell() + len(message) > self.max_bytes or now - self._opened_at > self.max_age:
+            self._opened_at = now
+            return True
+        return False
+
+
+class LogSampler:
+    """
+    Picks which invocations of busy commands are logged, e.g. a rate of 0.1 picks every 10th !info.
+    Commands without a rate are always picked.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        # [command name: log every n-th invocation]
+        self.periods: Dict[str, int] = {
+            command_name: max(1, round(1 / rate)) if rate > 0 else 0 for command_name, rate in rates.items()
+        }
+        self._counts: Dict[str, int] = {}
+
+    def sample(self, command_name: str) -> bool:
+        period = self.periods.get(command_name, 1)
+        if period == 1:
+            return True
+        if period == 0:
+            return False
+        count = self._counts.get(command_name, 0)
+        self._counts[command_name] = count + 1
+        return count % period == 0
+
+
+def _is_audit(record: dict) -> bool:
+    return AUDIT_KEY in record["extra"]
+
+
+def _is_not_audit(record: dict) -> bool:
+    return AUDIT_KEY not in record["extra"]
+
+
+def setup_logging(config: BotConfig, log_file_path: Path, audit_file_path: Optional[Path] = None):
+    """
+    Logs to the console and to 'log_file_path', and changes of data to the json lines file 'audit_file_path'.
+    File sinks are written by a background thread, so a slow disk doesn't block the event loop.
+    """
+    logger.remove()
+    logger.add(sys.stdout, level=config.log_level, filter=_is_not_audit)
+    logger.add(
+        str(log_file_path),
+        level=config.log_level,
+        filter=_is_not_audit,
+        enqueue=True,
+        rotation=SizeOrTimeRotation(config.log_max_bytes, config.log_max_age),
+        retention=config.log_retention,
+        compression="gz",
+    )
+    if audit_file_path is not None and config.audit_log:
+        logger.add(
+            str(audit_file_path),
+            level="INFO",
+            format="{message}",
+            filter=_is_audit,
+            enqueue=True,
+            rotation=SizeOrTimeRotation(config.log_max_bytes, config.log_max_age),
+            retention=config.log_retention,
+            compression="gz",
+        )
+
+
+_audit_logger = logger.bind(**{AUDIT_KEY: True}).opt(lazy=True)
+
+
+def audit(action: str, author_name: str, channel_name: Optional[str], **details: Any):
+    """ Writes one json line to the audit log. The line is built in 'lazy' mode, so only if a sink takes INFO records. """
+    entry = {"time": time.time(), "action": action, "author": author_name, "channel": channel_name, **details}
+    _audit_logger.info("{}", lambda: json.dumps(entry, default=str))
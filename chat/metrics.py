@@ -0,0 +1,191 @@
+import asyncio
+import math
+import time
+
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Tuple
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+# Where the time of a command goes: parsing the message, looking up the role of the author,
+# running the command and waiting in the send queue until the reply was sent
+STAGES = ("parse", "auth", "execute", "send")
+METRIC_PREFIX = "thelist"
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # Observations per bucket, not cumulative. The last one is for values above the last bucket
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """ Upper bound of the bucket that contains the q-quantile, 'inf' if it is above the last bucket. """
+        rank = q * self.count
+        seen = 0
+        for bucket_index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                break
+        return self.buckets[bucket_index] if bucket_index < len(self.buckets) else math.inf
+
+    def cumulative(self) -> Iterator[Tuple[str, int]]:
+        """ (upper bound, observations up to it) as Prometheus expects them. """
+        seen = 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            seen += bucket_count
+            yield f"{bound:g}", seen
+        yield "+Inf", self.count
+
+
+def _milliseconds(seconds: float) -> str:
+    return f"{seconds * 1000:.3g}"
+
+
+class Metrics:
+    """
+    Counters and latency histograms of the bot, and the 'stats()' of its components which are collected on demand.
+    Rendered in the Prometheus text format by MetricsServer and as short text by '!stats'.
+    """
+
+    def __init__(self, collectors: Optional[Dict[str, Callable[[], Dict[str, float]]]] = None):
+        self.started_at = time.monotonic()
+        self.messages_received = 0
+        # [command name: times it was invoked]
+        self.commands: Dict[str, int] = {}
+        # [(command name, stage): histogram]
+        self.latencies: Dict[Tuple[str, str], Histogram] = {}
+        # [component name: function that returns its current stats], e.g. SendScheduler.stats
+        self.collectors: Dict[str, Callable[[], Dict[str, float]]] = collectors or {}
+
+    def observe(self, command_name: str, stage: str, seconds: float):
+        histogram = self.latencies.get((command_name, stage))
+        if histogram is None:
+            histogram = self.latencies[command_name, stage] = Histogram()
+        histogram.observe(seconds)
+
+    def count_command(self, command_name: str):
+        self.commands[command_name] = self.commands.get(command_name, 0) + 1
+
+    def observe_send(self, command_name: str, sent: asyncio.Future):
+        """ Records the time until 'sent', the future of a queued reply, is done. """
+        t0 = time.perf_counter()
+        sent.add_done_callback(lambda _: self.observe(command_name, "send", time.perf_counter() - t0))
+
+    def collect(self) -> Dict[str, Dict[str, float]]:
+        collected: Dict[str, Dict[str, float]] = {}
+        for component, stats in self.collectors.items():
+            try:
+                collected[component] = stats()
+            except Exception as e:
+                logger.error(f"Could not collect stats of {component}: {e}")
+        return collected
+
+    ############ OUTPUT
+    def render_prometheus(self) -> str:
+        lines = [
+            f"# TYPE {METRIC_PREFIX}_uptime_seconds gauge",
+            f"{METRIC_PREFIX}_uptime_seconds {time.monotonic() - self.started_at}",
+            f"# TYPE {METRIC_PREFIX}_messages_received_total counter",
+            f"{METRIC_PREFIX}_messages_received_total {self.messages_received}",
+            f"# TYPE {METRIC_PREFIX}_commands_total counter",
+        ]
+        for command_name, amount in sorted(self.commands.items()):
+            lines.append(f'{METRIC_PREFIX}_commands_total{{command="{command_name}"}} {amount}')
+        lines.append(f"# TYPE {METRIC_PREFIX}_command_seconds histogram")
+        for (command_name, stage), histogram in sorted(self.latencies.items()):
+            labels = f'command="{command_name}",stage="{stage}"'
+            for bound, amount in histogram.cumulative():
+                lines.append(f'{METRIC_PREFIX}_command_seconds_bucket{{{labels},le="{bound}"}} {amount}')
+            lines.append(f"{METRIC_PREFIX}_command_seconds_sum{{{labels}}} {histogram.sum}")
+            lines.append(f"{METRIC_PREFIX}_command_seconds_count{{{labels}}} {histogram.count}")
+        for component, stats in self.collect().items():
+            for key, value in stats.items():
+                name = f"{METRIC_PREFIX}_{component}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> List[str]:
+        """ Short entries for chat, to be paginated. Latencies are p50/p99 in milliseconds. """
+        uptime = time.monotonic() - self.started_at
+        entries = [
+            f"up {uptime / 3600:.1f}h, {self.messages_received} messages ({self.messages_received / uptime:.1f}/s)"
+        ]
+        for command_name, amount in sorted(self.commands.items(), key=lambda item: -item[1]):
+            stages = []
+            for stage in STAGES:
+                histogram = self.latencies.get((command_name, stage))
+                if histogram is not None:
+                    p50, p99 = _milliseconds(histogram.quantile(0.5)), _milliseconds(histogram.quantile(0.99))
+                    stages.append(f"{stage} {p50}/{p99}")
+            entries.append(f"!{command_name} {amount}x ms: {', '.join(stages)}")
+        for component, stats in self.collect().items():
+            entries.append(f"{component}: {', '.join(f'{key} {value:g}' for key, value in stats.items())}")
+        return entries
+
+
+class MetricsServer:
+    """ Serves the metrics for Prometheus on http://host:port/metrics, by default only reachable from this machine. """
+
+    def __init__(self, metrics: Metrics, host: str = "127.0.0.1", port: int = 9108):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self._runner: Optional["web.AppRunner"] = None
+
+    async def start(self):
+        if self._runner is not None:
+            return
+        # The web server part of aiohttp takes a while to import and most bots don't serve metrics
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+
+    async def _handle(self, request: "web.Request") -> "web.Response":
+        from aiohttp import web
+
+        return web.Response(text=self.metrics.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
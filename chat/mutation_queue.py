@@ -0,0 +1,152 @@
+import asyncio
+import time
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, ContextManager, Deque, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from models.mutations import MUTATION_TARGETS
+
+
+@dataclass()
+class PendingMutation:
+    mutation: dict
+    # Resolves to the result of the mutation, see models/mutations.py
+    future: asyncio.Future
+
+
+class MutationQueue:
+    """
+    The only writer of channels, users and players. Commands submit their mutations and await the result.
+    One task applies the mutations in the order they were submitted: all that are waiting when it runs are
+    applied as one batch inside 'batch' (e.g. one transaction of the storage), then every changed target is
+    saved once with 'commit' and the results are handed back to the commands.
+    A batch is applied without giving control back to the event loop, so commands that read see either
+    none or all of its changes.
+    """
+
+    def __init__(
+        self,
+        apply: Callable[[dict], Any],
+        commit: Callable[[Set[str]], None],
+        batch: Callable[[], ContextManager],
+        max_batch_size: int = 1000,
+    ):
+        self._apply = apply
+        self._commit = commit
+        self._batch = batch
+        self.max_batch_size = max_batch_size
+        self._pending: Deque[PendingMutation] = deque()
+        # Created together with the worker, so it belongs to the running event loop
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Statistics
+        self.batch_amount = 0
+        self.mutation_amount = 0
+        self.largest_batch = 0
+        self.commit_seconds_total = 0.0
+
+    ############ QUEUEING
+    def submit(self, mutation: dict) -> asyncio.Future:
+        """ Queues a mutation and returns a future that resolves to its result once it was applied and saved. """
+        self._ensure_worker()
+        pending = PendingMutation(mutation, asyncio.get_running_loop().create_future())
+        self._pending.append(pending)
+        self._wakeup.set()
+        return pending.future
+
+    ############ APPLYING
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            # Commands that are ready in the same tick of the event loop still get into this batch
+            await asyncio.sleep(0)
+            self.apply_pending()
+
+    def apply_pending(self):
+        """ Applies and commits the next batch. """
+        batch: List[PendingMutation] = [
+            self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch_size))
+        ]
+        if not batch:
+            return
+        # (result, error) of every mutation
+        outcomes: List[Tuple[Any, Optional[Exception]]] = []
+        targets: Set[str] = set()
+        t0 = time.perf_counter()
+        try:
+            with self._batch():
+                for pending in batch:
+                    try:
+                        result = self._apply(pending.mutation)
+                    except Exception as e:
+                        logger.error(f"Error while applying {pending.mutation}: {e}")
+                        outcomes.append((None, e))
+                        continue
+                    if result:
+                        targets.add(MUTATION_TARGETS[pending.mutation["op"]])
+                    outcomes.append((result, None))
+        except Exception as e:
+            # Ending the batch failed, e.g. the journal couldn't be written or the transaction couldn't be committed.
+            # The mutations are applied in memory, but none of them is known to be saved
+            logger.error(f"Error while saving a batch of {len(batch)} mutations: {e}")
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+        if targets:
+            try:
+                self._commit(targets)
+            except Exception as e:
+                # The mutations are applied in memory, the next commit saves them again
+                logger.error(f"Error while saving {', '.join(sorted(targets))}: {e}")
+        self.commit_seconds_total += time.perf_counter() - t0
+        self.batch_amount += 1
+        self.mutation_amount += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for pending, (result, error) in zip(batch, outcomes):
+            if pending.future.done():
+                # The command was cancelled, the mutation is applied anyway
+                continue
+            if error is not None:
+                pending.future.set_exception(error)
+            else:
+                pending.future.set_result(result)
+
+    async def stop(self):
+        """ Applies the mutations that are still waiting, then stops the worker. """
+        while self._pending:
+            self.apply_pending()
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    ############ STATISTICS
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queue_depth": self.queue_depth,
+            "batches": self.batch_amount,
+            "mutations": self.mutation_amount,
+            "batch_size_avg": self.mutation_amount / self.batch_amount if self.batch_amount else 0.0,
+            "batch_size_max": self.largest_batch,
+            "commit_time_avg": self.commit_seconds_total / self.batch_amount if self.batch_amount else 0.0,
+        }
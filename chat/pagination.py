@@ -0,0 +1,97 @@
+import time
+
+from collections import OrderedDict
+from typing import Callable, Iterable, Iterator, Optional, Tuple
+
+# Twitch drops chat messages that are longer than this
+MESSAGE_LENGTH_LIMIT = 500
+MORE_HINT = " (!more)"
+ENTRY_SEPARATOR = " | "
+
+
+def _shorten(text: str, length: int) -> str:
+    if len(text) <= length:
+        return text
+    return text[: max(0, length - 3)] + "..."
+
+
+def paginate(
+    header: Callable[[int], str],
+    entries: Iterable[str],
+    limit: int = MESSAGE_LENGTH_LIMIT,
+    separator: str = ENTRY_SEPARATOR,
+    more_hint: str = MORE_HINT,
+) -> Iterator[str]:
+    """
+    Joins 'entries' into messages of at most 'limit' characters, only splitting between entries.
+    'header(page_number)' starts every message, pages that are followed by another page end with 'more_hint'.
+    Works lazily: entries are only rendered until the requested page is full.
+    """
+    entries = iter(entries)
+    entry: Optional[str] = next(entries, None)
+    page_number = 1
+    while entry is not None:
+        page = header(page_number)
+        # Room for the hint is always kept, so it can be appended once it is clear there is another page
+        available = limit - len(more_hint)
+        page += _shorten(entry, available - len(page))
+        entry = next(entries, None)
+        while entry is not None and len(page) + len(separator) + len(entry) <= available:
+            page += separator + entry
+            entry = next(entries, None)
+        if entry is not None:
+            page += more_hint
+        yield page
+        page_number += 1
+
+
+class PageCursors:
+    """
+    The remaining pages of the last paginated reply per (channel, user), so '!more' can continue it.
+    Cursors expire after 'ttl' seconds and at most 'max_cursors' are kept.
+    """
+
+    def __init__(self, ttl: float = 120.0, max_cursors: int = 1000, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_cursors = max_cursors
+        self._clock = clock
+        # [(channel name, user name): (remaining pages, expires at)], oldest first
+        self._cursors: "OrderedDict[Tuple[str, str], Tuple[Iterator[str], float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._cursors)
+
+    def set(self, channel_name: str, user_name: str, pages: Iterator[str]):
+        key = (channel_name, user_name)
+        self._cursors.pop(key, None)
+        self._cursors[key] = (pages, self._clock() + self.ttl)
+        while len(self._cursors) > self.max_cursors:
+            self._cursors.popitem(last=False)
+
+    def clear(self, channel_name: str, user_name: str):
+        self._cursors.pop((channel_name, user_name), None)
+
+    def next_page(self, channel_name: str, user_name: str) -> Optional[str]:
+        """ Returns the next page or None if there is none or it expired. """
+        self._evict_expired()
+        key = (channel_name, user_name)
+        cursor = self._cursors.get(key)
+        if cursor is None:
+            return None
+        pages, _expires_at = cursor
+        page = next(pages, None)
+        if page is None:
+            del self._cursors[key]
+            return None
+        # Using the cursor keeps it alive
+        self._cursors.move_to_end(key)
+        self._cursors[key] = (pages, self._clock() + self.ttl)
+        return page
+
+    def _evict_expired(self):
+        now = self._clock()
+        while self._cursors:
+            key, (_pages, expires_at) = next(iter(self._cursors.items()))
+            if expires_at > now:
+                break
+            del self._cursors[key]
@@ -0,0 +1,133 @@
+import time
+
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from models.information import Information
+from models.observer import PlayersObserver
+from models.player import Player
+
+# (player name, information index or -1 for all information, version of the player)
+RenderKey = Tuple[str, int, int]
+
+
+class MemoizedPages:
+    """ The pages of one reply. Rendered on first use and shared by everyone who requests the same reply. """
+
+    def __init__(self, pages: Iterator[str]):
+        self._source: Optional[Iterator[str]] = pages
+        self._pages: List[str] = []
+
+    def page(self, number: int) -> Optional[str]:
+        """ Returns the page at 'number' (starting at 0) or None if there are not that many pages. """
+        while len(self._pages) <= number and self._source is not None:
+            page = next(self._source, None)
+            if page is None:
+                self._source = None
+                break
+            self._pages.append(page)
+        return self._pages[number] if number < len(self._pages) else None
+
+    def iter_from(self, number: int) -> Iterator[str]:
+        page = self.page(number)
+        while page is not None:
+            yield page
+            number += 1
+            page = self.page(number)
+
+
+class RenderCache(PlayersObserver):
+    """
+    LRU cache of rendered !info replies.
+    Every change of a player through Players bumps the version of that player, so cached replies of the old version
+    are never returned again and drop out of the cache over time.
+    Entries also expire after 'ttl' seconds, the detailed view contains the relative time of the last change.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl: float = 60.0,
+        collapse_window: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.collapse_window = collapse_window
+        self._clock = clock
+        # [player name: version], players that were never changed are at version 0
+        self._versions: Dict[str, int] = {}
+        # [key: (pages, expires at)], least recently used first
+        self._entries: "OrderedDict[RenderKey, Tuple[MemoizedPages, float]]" = OrderedDict()
+        # [(channel name, key): answered at], oldest first
+        self._recent: "OrderedDict[Tuple[str, RenderKey], float]" = OrderedDict()
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.collapsed_amount = 0
+
+    def key(self, player_name: str, index: int = -1) -> RenderKey:
+        return player_name, index, self._versions.get(player_name, 0)
+
+    def get(self, key: RenderKey, render: Callable[[], Iterator[str]]) -> MemoizedPages:
+        """ Returns the cached pages for 'key', calls 'render' to create them if they are not cached. """
+        entry = self._entries.get(key)
+        now = self._clock()
+        if entry is not None and entry[1] > now:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+        self.misses += 1
+        pages = MemoizedPages(render())
+        self._entries[key] = (pages, now + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return pages
+
+    def collapse(self, channel_name: str, key: RenderKey) -> bool:
+        """
+        Returns True if the same reply was already sent to the channel within the last 'collapse_window' seconds,
+        then the reply doesn't have to be sent again.
+        """
+        now = self._clock()
+        while self._recent:
+            oldest_key, answered_at = next(iter(self._recent.items()))
+            if answered_at + self.collapse_window > now:
+                break
+            del self._recent[oldest_key]
+        if (channel_name, key) in self._recent:
+            self.collapsed_amount += 1
+            return True
+        self._recent[(channel_name, key)] = now
+        return False
+
+    def invalidate(self):
+        """ Call after players were changed without going through the Players methods, e.g. after loading a file. """
+        self._entries.clear()
+        self._recent.clear()
+
+    ############ CHANGES
+    def _bump(self, player_name: str):
+        self._versions[player_name] = self._versions.get(player_name, 0) + 1
+
+    def on_add(self, player_name: str, index: int, information: Information):
+        self._bump(player_name)
+
+    def on_edit(self, player_name: str, index: int, information: Information, old_info: str):
+        self._bump(player_name)
+
+    def on_delete(self, player_name: str, player: Player):
+        self._bump(player_name)
+
+    ############ STATISTICS
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "collapsed": self.collapsed_amount,
+        }
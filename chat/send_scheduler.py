@@ -0,0 +1,265 @@
+import asyncio
+import time
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+# Lower number = sent first
+PRIORITY_ADMIN = 0
+PRIORITY_READ = 1
+PRIORITIES = [PRIORITY_ADMIN, PRIORITY_READ]
+
+# Messages per 30 seconds twitch allows for the account of the bot, see https://dev.twitch.tv/docs/irc/#rate-limits
+RATE_LIMITS: Dict[str, int] = {
+    "normal": 20,
+    "moderator": 100,
+    "verified": 7500,
+}
+# Messages per 30 seconds in a single channel, verified bots are limited like normal accounts there
+CHANNEL_RATE_LIMITS: Dict[str, int] = {
+    "normal": 20,
+    "moderator": 100,
+    "verified": 20,
+}
+RATE_LIMIT_PERIOD = 30.0
+# Twitch and twitchio see a message a bit later than it is taken from the queue, and not always equally later.
+# The window is longer by this much, so two messages never end up closer together than allowed
+SEND_LATENCY_MARGIN = 1.0
+
+
+class SlidingWindowLimiter:
+    """ Allows at most 'limit' events in any 'period' seconds, see also ChannelManager._take_join. """
+
+    def __init__(self, limit: int, period: float, clock: Callable[[], float] = time.monotonic):
+        self.limit = limit
+        self.period = period
+        self._clock = clock
+        # When the events within the last period happened, oldest first
+        self._times: Deque[float] = deque()
+
+    def wait_time(self) -> float:
+        """ 0 if an event is allowed now, otherwise the seconds until one is allowed. """
+        now = self._clock()
+        while self._times and self._times[0] <= now - self.period:
+            self._times.popleft()
+        if len(self._times) < self.limit:
+            return 0.0
+        return self._times[0] + self.period - now
+
+    def take(self):
+        self._times.append(self._clock())
+
+    def try_take(self) -> float:
+        """ Counts an event and returns 0 if one is allowed now, otherwise returns the seconds until one is allowed. """
+        wait_time = self.wait_time()
+        if wait_time <= 0:
+            self.take()
+        return wait_time
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+
+@dataclass()
+class OutgoingMessage:
+    channel_name: str
+    text: str
+    priority: int
+    enqueued_at: float
+    # Resolves to True when the message was sent, False if sending failed
+    future: asyncio.Future
+
+
+class SendScheduler:
+    """
+    Queue for all messages the bot sends to chat.
+    - Sliding windows keep the bot below the twitch rate limits of the account and of every channel instead of
+      getting throttled. twitchio's Channel.send refuses the message that reaches the limit in a window, so one
+      message less than the limit is sent per period
+    - Channels take turns, so one busy channel can't delay the replies in all other channels
+    - Admin confirmations are sent before replies to read commands like !info
+    - A message that is identical to one still waiting in the same channel is only sent once
+    """
+
+    def __init__(
+        self,
+        sender: Callable[[str, str], Awaitable[None]],
+        messages_per_period: int = RATE_LIMITS["normal"],
+        period: float = RATE_LIMIT_PERIOD + SEND_LATENCY_MARGIN,
+        clock: Callable[[], float] = time.monotonic,
+        channel_messages_per_period: Optional[int] = None,
+    ):
+        self._sender = sender
+        self._clock = clock
+        self.period = period
+        self.window = SlidingWindowLimiter(max(1, messages_per_period - 1), period, clock)
+        if channel_messages_per_period is None:
+            channel_messages_per_period = messages_per_period
+        self.channel_limit = max(1, channel_messages_per_period - 1)
+        # [channel name: window of the messages sent there], only channels that sent within the last period
+        self._channel_windows: Dict[str, SlidingWindowLimiter] = {}
+
+        # [(channel name, priority): waiting messages]
+        self._queues: Dict[Tuple[str, int], Deque[OutgoingMessage]] = {}
+        # Per priority, the channels that have waiting messages in the order they get their turn
+        self._turns: Dict[int, Deque[str]] = {priority: deque() for priority in PRIORITIES}
+        # [(channel name, text): waiting message], to coalesce duplicates
+        self._pending: Dict[Tuple[str, str], OutgoingMessage] = {}
+        # Created together with the worker, so it belongs to the running event loop
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        # Statistics
+        self.sent_amount = 0
+        self.failed_amount = 0
+        self.coalesced_amount = 0
+        self._wait_times: Deque[float] = deque(maxlen=1000)
+
+    ############ QUEUEING
+    def enqueue(self, channel_name: str, text: str, priority: int = PRIORITY_READ) -> asyncio.Future:
+        """ Queues a message and returns a future that resolves once it was sent. Starts the worker if needed. """
+        self._ensure_worker()
+        duplicate = self._pending.get((channel_name, text))
+        if duplicate is not None:
+            self.coalesced_amount += 1
+            return duplicate.future
+
+        message = OutgoingMessage(
+            channel_name, text, priority, self._clock(), asyncio.get_running_loop().create_future()
+        )
+        self._pending[(channel_name, text)] = message
+        queue = self._queues.get((channel_name, priority))
+        if queue is None:
+            queue = self._queues[(channel_name, priority)] = deque()
+        if not queue:
+            self._turns[priority].append(channel_name)
+        queue.append(message)
+        self._wakeup.set()
+        return message.future
+
+    def _channel_wait_time(self, channel_name: str) -> float:
+        window = self._channel_windows.get(channel_name)
+        if window is None:
+            return 0.0
+        wait_time = window.wait_time()
+        if not window:
+            # Nothing sent there within the last period
+            del self._channel_windows[channel_name]
+        return wait_time
+
+    def _next_message(self) -> Tuple[Optional[OutgoingMessage], float]:
+        """
+        The next message of a channel that is below its own limit. If every channel with waiting messages is at
+        its limit, None and the seconds until one of them is below it again.
+        """
+        shortest_wait_time = self.period
+        for priority in PRIORITIES:
+            turns = self._turns[priority]
+            for _ in range(len(turns)):
+                channel_name = turns[0]
+                wait_time = self._channel_wait_time(channel_name)
+                if wait_time > 0:
+                    shortest_wait_time = min(shortest_wait_time, wait_time)
+                    # Waits for its next turn
+                    turns.rotate(-1)
+                    continue
+                turns.popleft()
+                queue = self._queues[(channel_name, priority)]
+                message = queue.popleft()
+                if queue:
+                    # Back to the end of the line
+                    turns.append(channel_name)
+                else:
+                    del self._queues[(channel_name, priority)]
+                del self._pending[(channel_name, message.text)]
+                return message, 0.0
+        return None, shortest_wait_time
+
+    ############ SENDING
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            wait_time = self.window.wait_time()
+            if wait_time > 0:
+                await asyncio.sleep(wait_time)
+                continue
+            message, wait_time = self._next_message()
+            if message is None:
+                # A message for another channel may arrive before then
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait_time)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # Counted before sending, twitchio counts it before sending as well
+            self.window.take()
+            channel_window = self._channel_windows.get(message.channel_name)
+            if channel_window is None:
+                channel_window = self._channel_windows[message.channel_name] = SlidingWindowLimiter(
+                    self.channel_limit, self.period, self._clock
+                )
+            channel_window.take()
+            await self._send(message)
+
+    async def _send(self, message: OutgoingMessage):
+        self._wait_times.append(self._clock() - message.enqueued_at)
+        try:
+            await self._sender(message.channel_name, message.text)
+        except Exception as e:
+            logger.error(f"Error while sending to channel {message.channel_name}: {e}")
+            self.failed_amount += 1
+            message.future.set_result(False)
+            return
+        self.sent_amount += 1
+        message.future.set_result(True)
+
+    async def stop(self):
+        """ Stops the worker, waiting messages are not sent. """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for message in self._pending.values():
+            message.future.set_result(False)
+        self._pending.clear()
+        self._queues.clear()
+        for turns in self._turns.values():
+            turns.clear()
+
+    ############ STATISTICS
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def queue_depth_per_channel(self) -> Dict[str, int]:
+        depths: Dict[str, int] = {}
+        for (channel_name, _priority), queue in self._queues.items():
+            depths[channel_name] = depths.get(channel_name, 0) + len(queue)
+        return depths
+
+    def stats(self) -> Dict[str, float]:
+        wait_times: List[float] = sorted(self._wait_times)
+        return {
+            "queue_depth": self.queue_depth,
+            "sent": self.sent_amount,
+            "failed": self.failed_amount,
+            "coalesced": self.coalesced_amount,
+            "wait_time_avg": sum(wait_times) / len(wait_times) if wait_times else 0.0,
+            "wait_time_p99": wait_times[int(len(wait_times) * 0.99)] if wait_times else 0.0,
+            "wait_time_max": wait_times[-1] if wait_times else 0.0,
+        }
@@ -0,0 +1,27 @@
+import asyncio
+import signal
+
+from typing import Callable
+
+from loguru import logger
+
+# Sent by systemd and deploys (SIGTERM) and by Ctrl+C (SIGINT)
+STOP_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+
+def handle_stop_signals(loop: asyncio.AbstractEventLoop, stop: Callable[[], None]) -> bool:
+    """
+    Calls 'stop' in the event loop when the process is asked to stop, so it can save what is pending first.
+    Python doesn't run atexit handlers on SIGTERM. Returns False if the event loop has no signal handlers (Windows).
+    """
+
+    def on_signal(signal_number: int):
+        logger.info(f"Received {signal.Signals(signal_number).name}, stopping")
+        stop()
+
+    for signal_number in STOP_SIGNALS:
+        try:
+            loop.add_signal_handler(signal_number, on_signal, signal_number)
+        except NotImplementedError:
+            return False
+    return True
@@ -0,0 +1,74 @@
+"""
+Converts data/channels.json, data/users.json and data/players.json (including the journal) to binary snapshots
+data/*.bin, or the binary snapshots back to json. See storage/binary_snapshot.py.
+Stop the bot before converting and set "snapshot_format" in config/bot_config.json afterwards.
+
+python convert_snapshots.py binary [--compression zlib]
+python convert_snapshots.py json
+"""
+import argparse
+
+from dataclasses import replace
+from pathlib import Path
+
+from models.bot_config import BotConfig
+from models.players import Players
+from storage.binary_snapshot import COMPRESSIONS, SNAPSHOT_SUFFIX
+from storage.json_storage import JsonStorage
+
+
+def convert_snapshots(data_folder: Path, config: BotConfig, snapshot_format: str, compression: str) -> Players:
+    """ Writes the data in 'snapshot_format', returns the converted players. """
+    source_format = "json" if snapshot_format == "binary" else "binary"
+    json_file_path, binary_file_path = data_folder / "players.json", data_folder / f"players{SNAPSHOT_SUFFIX}"
+    source_file_path, target_file_path = json_file_path, binary_file_path
+    if snapshot_format == "json":
+        source_file_path, target_file_path = binary_file_path, json_file_path
+    if (
+        source_file_path.exists()
+        and target_file_path.exists()
+        and target_file_path.stat().st_mtime_ns > source_file_path.stat().st_mtime_ns
+    ):
+        # E.g. the bot already ran with the new format and wrote it
+        raise ValueError(f"{target_file_path} is newer than {source_file_path}, not overwriting it")
+
+    source_storage = JsonStorage(
+        data_folder, replace(config, snapshot_format=source_format, lazy_players=False, reload_interval=0)
+    )
+    channels = source_storage.load_channels()
+    users = source_storage.load_users()
+    # Replays the journal and writes it into the source files
+    players = source_storage.load_players()
+    source_storage.close()
+
+    # Without event loop, each file is written right away
+    target_storage = JsonStorage(
+        data_folder,
+        replace(
+            config,
+            snapshot_format=snapshot_format,
+            snapshot_compression=compression,
+            players_journal=False,
+            reload_interval=0,
+        ),
+    )
+    target_storage.save_channels(channels)
+    target_storage.save_users(users)
+    target_storage.save_players(players)
+    target_storage.close()
+    return players
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the data files between json and binary snapshots")
+    parser.add_argument("format", choices=["binary", "json"], help="Format to convert to")
+    parser.add_argument("--compression", choices=list(COMPRESSIONS), default="zlib", help="Of binary snapshots")
+    arguments = parser.parse_args()
+
+    config = BotConfig.load(Path(__file__).parent / "config" / "bot_config.json")
+    try:
+        players = convert_snapshots(Path(__file__).parent / "data", config, arguments.format, arguments.compression)
+    except ValueError as e:
+        print(e)
+    else:
+        print(f"Converted {len(players.players)} players to {arguments.format}")
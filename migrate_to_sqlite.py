@@ -0,0 +1,31 @@
+"""
+Imports data/channels.json, data/users.json and data/players.json (including the journal) into the SQLite database.
+Set "storage_backend": "sqlite" in config/bot_config.json afterwards.
+
+python migrate_to_sqlite.py
+"""
+from pathlib import Path
+
+from models.bot_config import BotConfig
+from storage.json_storage import JsonStorage
+from storage.sqlite_storage import SqliteStorage
+
+
+def migrate_to_sqlite(data_folder: Path, config: BotConfig) -> SqliteStorage:
+    json_storage = JsonStorage(data_folder, config)
+    sqlite_storage = SqliteStorage(data_folder / config.sqlite_file_name)
+
+    sqlite_storage.save_channels(json_storage.load_channels())
+    sqlite_storage.save_users(json_storage.load_users())
+    sqlite_storage.import_players(json_storage.load_players())
+    json_storage.close()
+    return sqlite_storage
+
+
+if __name__ == "__main__":
+    config = BotConfig.load(Path(__file__).parent / "config" / "bot_config.json")
+    data_folder = Path(__file__).parent / "data"
+    storage = migrate_to_sqlite(data_folder, config)
+    players = storage.load_players()
+    print(f"Imported {len(players.players)} players into {storage.database_file_path}")
+    storage.close()
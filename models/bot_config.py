@@ -0,0 +1,77 @@
+from dataclasses import dataclass, field
+from dataclasses_json import DataClassJsonMixin
+from pathlib import Path
+from typing import Dict, List
+
+
+@dataclass()
+class BotConfig(DataClassJsonMixin):
+    # Where channels, users and players are stored: "json" (data/*.json files) or "sqlite"
+    storage_backend: str = "json"
+    # File name of the database in the data folder if the storage backend is "sqlite"
+    sqlite_file_name: str = "thelist.sqlite3"
+    # Twitch rate limit of the bot account: "normal", "moderator" (the bot is moderator in all its channels) or "verified"
+    account_type: str = "normal"
+    # Seconds to wait after a mutation before the data files are written, bursts of mutations are coalesced into one write
+    save_interval: float = 5.0
+    # Append changes of players to data/players.journal.jsonl instead of rewriting data/players.json every time
+    players_journal: bool = True
+    # Size in bytes of the journal after which a new players.json snapshot is written
+    journal_compact_size: int = 1_000_000
+    # Format of the files in the data folder: "json" or "binary" (data/*.bin, smaller and faster to load and save).
+    # Binary snapshots are not reloaded when another program changes them and can't be loaded lazily.
+    # Convert existing files with convert_snapshots.py
+    snapshot_format: str = "json"
+    # Compression of binary snapshots: "none", "zlib" or "lzma" (smallest, but slower to load and save)
+    snapshot_compression: str = "zlib"
+    # Only look up where each player is in data/players.json at startup and decode players when they are used,
+    # for large files. Changes of data/players.json by other programs are not reloaded then
+    lazy_players: bool = False
+    # How many decoded players are kept in memory if 'lazy_players' is enabled, changed players are always kept
+    lazy_players_memory: int = 10_000
+    # Seconds between checks if data/*.json was changed by another program, e.g. configure.py. 0 disables reloading
+    reload_interval: float = 2.0
+    # Record message rates, command latencies and queue depths, shown by !stats
+    metrics: bool = False
+    # Port of the Prometheus endpoint on localhost if metrics are enabled, 0 doesn't serve them
+    metrics_port: int = 9108
+    # Lowest level that is logged to the console and to bot.log: "DEBUG", "INFO", "WARNING", ...
+    log_level: str = "INFO"
+    # bot.log is rotated and compressed once it is bigger than this many bytes or older than this many seconds
+    log_max_bytes: int = 5_000_000
+    log_max_age: float = 86400.0
+    # How many rotated log files are kept
+    log_retention: int = 10
+    # [command name: share of invocations that are logged at INFO, the others are logged at DEBUG], for busy commands
+    log_sample_rates: Dict[str, float] = field(default_factory=lambda: {"info": 0.1})
+    # Write every change of channels, users and players with author and channel to audit.jsonl
+    audit_log: bool = True
+    # How many previous texts are kept per information entry for !history and !revert
+    history_size: int = 10
+    # Histories of this many information entries are kept in memory, the others in data/history
+    history_memory_entries: int = 1000
+    # Most commands one user, one channel and all channels together may run within 'flood_window' seconds,
+    # further commands are ignored. 0 disables a limit
+    flood_user_limit: int = 10
+    flood_channel_limit: int = 30
+    flood_global_limit: int = 200
+    flood_window: float = 30.0
+    # [command name: seconds before the same user can run the command again], e.g. {"search": 10}
+    flood_command_cooldowns: Dict[str, float] = field(default_factory=lambda: {})
+    # Users with these roles ("superadmin", "admin", "user") are never limited
+    flood_exempt_roles: List[str] = field(default_factory=lambda: ["superadmin"])
+    # Read commands like !info are ignored while this many replies wait to be sent, admin commands at twice as many.
+    # 0 disables it
+    flood_shed_queue_depth: int = 50
+    # Amount of worker processes with their own IRC connection, the channels are split between them. 1 runs no workers
+    shards: int = 1
+    # Folder of the log and audit files of the supervisor and the workers in sharded mode, relative to the bot folder
+    shard_logs_folder: str = "logs"
+
+    @classmethod
+    def load(cls, config_file_path: Path) -> "BotConfig":
+        """ Loads the config from file. If the file doesn't exist, the default config is used. """
+        if config_file_path.exists():
+            with config_file_path.open() as f:
+                return cls.from_json(f.read())
+        return cls()
@@ -0,0 +1,237 @@
+import csv
+import json
+import time
+
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+from .information import Information
+from .players import Players
+
+"""
+Bulk import and export of information entries as CSV (with header) or JSON Lines, one entry per row:
+player, info, author (optional), timestamp (optional, unix seconds or ISO 8601)
+Files are read and written row by row. Imported rows are first validated without Players ('parse_rows'), e.g. in an
+executor while the bot runs, then deduplicated and added to Players at once ('add_rows'),
+so the storage writes them once instead of once per row.
+"""
+
+COLUMNS = ("player", "info", "author", "timestamp")
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+# How many of the invalid rows are described in the report
+MAX_REPORTED_ERRORS = 10
+
+# (line number, row or None if the line is not a json object)
+NumberedRow = Tuple[int, Optional[Dict[str, Any]]]
+
+
+@dataclass()
+class ImportReport:
+    rows: int = 0
+    imported: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    # "line <n>: <reason>" of the first invalid rows
+    errors: List[str] = field(default_factory=lambda: [])
+    # Set if the file couldn't be read at all, then nothing was imported
+    error: Optional[str] = None
+
+    def add_error(self, line_number: int, reason: str):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"line {line_number}: {reason}")
+
+    def summary(self) -> str:
+        if self.error is not None:
+            return f"Import failed: {self.error}"
+        text = f"Imported {self.imported} of {self.rows} rows, skipped {self.duplicates} duplicates"
+        if self.invalid:
+            text += f" and {self.invalid} invalid rows ({self.errors[0]})"
+        return text
+
+
+def file_format(file_path: Path) -> str:
+    format_name = FORMATS.get(file_path.suffix.lower())
+    if format_name is None:
+        raise ValueError(f"Unknown file type '{file_path.suffix}', expected one of {', '.join(FORMATS)}")
+    return format_name
+
+
+############ READING
+def read_rows(f: TextIO, format_name: str) -> Iterator[NumberedRow]:
+    if format_name == "csv":
+        reader = csv.DictReader(f)
+        missing_columns = [column for column in COLUMNS[:2] if column not in (reader.fieldnames or [])]
+        if missing_columns:
+            raise ValueError(f"The header of the file has no column {', '.join(missing_columns)}")
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(f, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def _text(row: Dict[str, Any], column: str) -> str:
+    value = row.get(column)
+    return "" if value is None else str(value).strip()
+
+
+def parse_timestamp(value: Any) -> int:
+    """ Unix seconds or an ISO 8601 date, which is in UTC if it has no time zone. """
+    text = str(value).strip()
+    try:
+        timestamp = int(float(text))
+    except (ValueError, OverflowError):
+        try:
+            parsed = datetime.fromisoformat(text.replace("Z", "+00:00"))
+        except ValueError:
+            raise ValueError(f"timestamp '{text}' is neither unix seconds nor an ISO 8601 date") from None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        timestamp = int(parsed.timestamp())
+    if timestamp < 0:
+        raise ValueError(f"timestamp '{text}' is before 1970")
+    return timestamp
+
+
+def parse_row(row: Dict[str, Any], default_author: str, now: int) -> Tuple[str, Information]:
+    """ Returns (player name, information) like !add would create them, raises ValueError if the row is invalid. """
+    player_name = _text(row, "player").lower()
+    info = _text(row, "info")
+    author_name = _text(row, "author").lower() or default_author
+    if not player_name:
+        raise ValueError("player is empty")
+    if len(player_name.split()) > 1:
+        raise ValueError("player contains a space")
+    if not info:
+        raise ValueError("info is empty")
+    if "\n" in info or "\r" in info:
+        raise ValueError("info contains a line break")
+    if len(author_name.split()) > 1:
+        raise ValueError("author contains a space")
+    timestamp_text = _text(row, "timestamp")
+    timestamp = parse_timestamp(timestamp_text) if timestamp_text else now
+    return player_name, Information(info=info, created_by=author_name, created_timestamp=timestamp)
+
+
+def parse_rows(rows: Iterable[NumberedRow], default_author: str) -> Tuple[List[Dict[str, Any]], ImportReport]:
+    """
+    Returns the valid rows as json serializable dicts with all COLUMNS, for 'add_rows', and the report of the
+    invalid rows. 'default_author' is used for rows without author.
+    """
+    report = ImportReport()
+    now = int(time.time())
+    valid_rows: List[Dict[str, Any]] = []
+    for line_number, row in rows:
+        report.rows += 1
+        if row is None:
+            report.add_error(line_number, "not a json object")
+            continue
+        try:
+            player_name, information = parse_row(row, default_author, now)
+        except ValueError as e:
+            report.add_error(line_number, str(e))
+            continue
+        valid_rows.append(
+            {
+                "player": player_name,
+                "info": information.info,
+                "author": information.created_by,
+                "timestamp": information.created_timestamp,
+            }
+        )
+    return valid_rows, report
+
+
+def parse_file(file_path: Path, default_author: str) -> Tuple[List[Dict[str, Any]], ImportReport]:
+    """ Like 'parse_rows'. If the file can't be read, there are no rows and the report has an 'error' instead. """
+    try:
+        format_name = file_format(file_path)
+        with file_path.open(newline="", encoding="utf-8") as f:
+            return parse_rows(read_rows(f, format_name), default_author)
+    except (OSError, ValueError, csv.Error) as e:
+        return [], ImportReport(error=str(e))
+
+
+def add_rows(players: Players, valid_rows: List[Dict[str, Any]], report: Optional[ImportReport] = None) -> ImportReport:
+    """
+    Adds the rows of 'parse_rows' whose info the player doesn't have yet, all at once.
+    Counts the imported and duplicate rows in 'report', or in a new report.
+    """
+    report = report or ImportReport()
+    # [player name: information texts], only of the players in the file
+    known_texts: Dict[str, Set[str]] = {}
+    new_entries: List[Tuple[str, Information]] = []
+    for row in valid_rows:
+        # Rows of an alias and of its player are compared with each other
+        player_name = players.resolve(row["player"])
+        texts = known_texts.get(player_name)
+        if texts is None:
+            texts = known_texts[player_name] = {
+                information.info for information in players.get_information(player_name)
+            }
+        if row["info"] in texts:
+            report.duplicates += 1
+            continue
+        texts.add(row["info"])
+        new_entries.append(
+            (player_name, Information(info=row["info"], created_by=row["author"], created_timestamp=row["timestamp"]))
+        )
+    report.imported = len(players.add_information_bulk(new_entries))
+    return report
+
+
+def import_rows(players: Players, rows: Iterable[NumberedRow], default_author: str) -> ImportReport:
+    """ 'parse_rows' and 'add_rows'. Nothing is added if reading the rows fails midway. """
+    valid_rows, report = parse_rows(rows, default_author)
+    return add_rows(players, valid_rows, report)
+
+
+def import_file(players: Players, file_path: Path, default_author: str) -> ImportReport:
+    """ Like 'import_rows'. If the file can't be read, the report has an 'error' instead. """
+    valid_rows, report = parse_file(file_path, default_author)
+    if report.error is not None:
+        return report
+    return add_rows(players, valid_rows, report)
+
+
+############ WRITING
+def export_rows(players: Players) -> Iterator[Dict[str, Any]]:
+    for player_name, player in players.players.items():
+        for information in player.information:
+            yield {
+                "player": player_name,
+                "info": information.info,
+                "author": information.created_by,
+                "timestamp": information.created_timestamp,
+            }
+
+
+def write_rows(f: TextIO, rows: Iterable[Dict[str, Any]], format_name: str) -> int:
+    """ Writes one row at a time, returns the amount of rows. """
+    rows_amount = 0
+    if format_name == "csv":
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            rows_amount += 1
+        return rows_amount
+    for row in rows:
+        f.write(json.dumps(row) + "\n")
+        rows_amount += 1
+    return rows_amount
+
+
+def export_file(players: Players, file_path: Path) -> int:
+    format_name = file_format(file_path)
+    with file_path.open("w", newline="", encoding="utf-8") as f:
+        return write_rows(f, export_rows(players), format_name)
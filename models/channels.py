@@ -6,3 +6,6 @@ from typing import Set
 @dataclass()
 class Channels(DataClassJsonMixin):
     channels: Set[str] = field(default_factory=lambda: set())
+
+    def shallow_copy(self) -> "Channels":
+        return Channels(set(self.channels))
@@ -0,0 +1,230 @@
+import dbm
+import json
+
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+from .information import Information
+from .observer import PlayersObserver
+from .player import Player
+from .slots import add_slots
+from .time_format import humanize
+
+# (start, end, text): replace [start:end] of the newer text with 'text' to get the older text
+DeltaOperation = Tuple[int, int, str]
+# (player name, information index)
+EntryKey = Tuple[str, int]
+
+
+def make_delta(newer_text: str, older_text: str) -> Tuple[DeltaOperation, ...]:
+    """ The changes that turn 'newer_text' back into 'older_text', or all of 'older_text' if that is shorter. """
+    delta = tuple(
+        (i1, i2, older_text[j1:j2])
+        for tag, i1, i2, j1, j2 in SequenceMatcher(None, newer_text, older_text, autojunk=False).get_opcodes()
+        if tag != "equal"
+    )
+    if sum(len(text) for _, _, text in delta) + 2 * len(delta) >= len(older_text):
+        return ((0, len(newer_text), older_text),)
+    return delta
+
+
+def apply_delta(newer_text: str, delta: Tuple[DeltaOperation, ...]) -> str:
+    older_text = newer_text
+    # From the back, so the positions of the operations in front stay valid
+    for start, end, text in reversed(delta):
+        older_text = older_text[:start] + text + older_text[end:]
+    return older_text
+
+
+@add_slots
+@dataclass()
+class Revision:
+    """ A previous text of an information entry, stored as delta to the text that replaced it. """
+
+    delta: Tuple[DeltaOperation, ...]
+    # Who replaced the text and when
+    edited_by: str
+    edited_timestamp: int
+
+    @property
+    def edited_ago(self) -> str:
+        return humanize(self.edited_timestamp)
+
+
+@add_slots
+@dataclass()
+class History:
+    """ The revisions of one information entry and the text they start from. """
+
+    # Text of the entry when it was last edited, the newest revision turns it into the previous text
+    text: str
+    # Newest first
+    revisions: Deque[Revision]
+
+
+class EditHistory(PlayersObserver):
+    """
+    The last 'size' texts of every edited information entry, newest first, each one a delta to the one after it.
+    Kept apart from the information itself, so !info doesn't pay for it. Every edit is written to a dbm file right away,
+    so no history is lost if the bot is stopped. Histories of at most 'memory_entries' entries are also kept in memory.
+    The text that a history starts from is stored with it. A history whose text is not the current text of the entry,
+    e.g. because the entry was changed while the bot was not running, is dropped, its deltas would not apply anymore.
+    """
+
+    def __init__(self, file_path: Optional[Path], size: int = 10, memory_entries: int = 1000):
+        # Without file, the histories that don't fit into memory are dropped
+        self.file_path = file_path
+        self.size = size
+        self.memory_entries = memory_entries
+        # [entry: its history], least recently used first
+        self._entries: "OrderedDict[EntryKey, History]" = OrderedDict()
+        self._file = None
+        self.evicted_amount = 0
+        self.loaded_amount = 0
+        self.dropped_amount = 0
+
+    ############ FILE
+    def _open_file(self, create: bool):
+        if self._file is None and self.file_path is not None:
+            try:
+                if create:
+                    # The data folder is only created by the first delayed write of the storage
+                    self.file_path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = dbm.open(str(self.file_path), "c" if create else "w")
+            except dbm.error:
+                # Nothing was written yet
+                return None
+        return self._file
+
+    @staticmethod
+    def _file_key(key: EntryKey) -> bytes:
+        return f"{key[0]}\t{key[1]}".encode()
+
+    def _evict(self):
+        while len(self._entries) > self.memory_entries:
+            # Every history is in the file already
+            self._entries.popitem(last=False)
+            self.evicted_amount += 1
+
+    def _write(self, key: EntryKey, history: History):
+        history_file = self._open_file(create=True)
+        if history_file is not None:
+            history_file[self._file_key(key)] = json.dumps(
+                {
+                    "text": history.text,
+                    "revisions": [
+                        [revision.delta, revision.edited_by, revision.edited_timestamp]
+                        for revision in history.revisions
+                    ],
+                }
+            )
+            # dbm.dumb only writes where the values are when it is closed or synced, gdbm buffers as well
+            if hasattr(history_file, "sync"):
+                history_file.sync()
+
+    def _read(self, key: EntryKey) -> Optional[History]:
+        history_file = self._open_file(create=False)
+        if history_file is None or self._file_key(key) not in history_file:
+            return None
+        try:
+            history_dict = json.loads(history_file[self._file_key(key)])
+            return History(
+                history_dict["text"],
+                deque(
+                    (
+                        Revision(tuple(tuple(operation) for operation in delta), edited_by, edited_timestamp)
+                        for delta, edited_by, edited_timestamp in history_dict["revisions"]
+                    ),
+                    maxlen=self.size,
+                ),
+            )
+        except (ValueError, KeyError, TypeError):
+            # Written without its text by an older version, or broken by a crash while it was written
+            self.dropped_amount += 1
+            self._forget(key)
+            return None
+
+    def _load(self, key: EntryKey, current_text: str) -> Optional[History]:
+        """ The history of the entry if it starts from 'current_text', otherwise it is dropped. """
+        history = self._entries.get(key)
+        if history is not None:
+            self._entries.move_to_end(key)
+        else:
+            history = self._read(key)
+            if history is None:
+                return None
+            self._entries[key] = history
+            self.loaded_amount += 1
+            self._evict()
+        if history.text != current_text:
+            self.dropped_amount += 1
+            self._forget(key)
+            return None
+        return history
+
+    def _forget(self, key: EntryKey):
+        self._entries.pop(key, None)
+        history_file = self._open_file(create=False)
+        if history_file is not None and self._file_key(key) in history_file:
+            del history_file[self._file_key(key)]
+
+    def close(self):
+        """ Every history is in the file already, this only closes it. """
+        self._entries.clear()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    ############ LOOKUPS
+    def revisions(self, player_name: str, index: int, current_text: str) -> List[Tuple[str, Revision]]:
+        """ (text, revision) of the previous texts of an entry, newest first. """
+        history = self._load((player_name, index), current_text)
+        if history is None:
+            return []
+        texts: List[Tuple[str, Revision]] = []
+        text = current_text
+        for revision in history.revisions:
+            text = apply_delta(text, revision.delta)
+            texts.append((text, revision))
+        return texts
+
+    ############ CHANGES
+    def on_edit(self, player_name: str, index: int, information: Information, old_info: str):
+        key = (player_name, index)
+        history = self._load(key, old_info)
+        if history is None:
+            history = self._entries[key] = History(old_info, deque(maxlen=self.size))
+        # The older revisions are deltas to 'old_info', which the new revision restores
+        history.revisions.appendleft(
+            Revision(make_delta(information.info, old_info), information.modified_by, information.modified_timestamp)
+        )
+        history.text = information.info
+        self._write(key, history)
+        self._evict()
+
+    def on_merge(self, alias_name: str, merged_player: Player, player_name: str, first_index: int):
+        # The entries of the merged player keep their histories at their new indexes
+        for index, information in enumerate(merged_player.information):
+            history = self._load((alias_name, index), information.info)
+            if history is not None:
+                new_key = (player_name, first_index + index)
+                self._entries[new_key] = history
+                self._write(new_key, history)
+        self._evict()
+
+    def on_delete(self, player_name: str, player: Player):
+        # The indexes are used again by the next information of a player with this name
+        for index in range(len(player.information)):
+            self._forget((player_name, index))
+
+    ############ STATISTICS
+    def stats(self) -> Dict[str, float]:
+        return {
+            "entries_in_memory": len(self._entries),
+            "evicted": self.evicted_amount,
+            "loaded": self.loaded_amount,
+            "dropped": self.dropped_amount,
+        }
@@ -1,30 +1,51 @@
-import arrow
+import sys
 import time
 
 from dataclasses import dataclass, field
-from dataclasses_json import DataClassJsonMixin
+from dataclasses_json import dataclass_json
 from typing import Optional
 
+from .slots import add_slots
+from .time_format import format_timestamp, humanize
 
+
+def intern_author(author_name: Optional[str]) -> Optional[str]:
+    """ Admin names repeat thousands of times, all information objects share one string object per name. """
+    if author_name is None:
+        return None
+    return sys.intern(author_name)
+
+
+# Not a DataClassJsonMixin subclass, the mixin doesn't define __slots__ which would give every instance a __dict__ again
+@add_slots
+@dataclass_json
 @dataclass()
-class Information(DataClassJsonMixin):
+class Information:
     # The actual piece of information
     info: str
     # Who created the information
     created_by: str
     # When the information was created
-    created_timestamp: int = field(default_factory=lambda: time.time())
+    created_timestamp: int = field(default_factory=lambda: int(time.time()))
     # Who modified this entry
     modified_by: Optional[str] = None
     # When it was last modified
     modified_timestamp: Optional[int] = None
 
+    def __post_init__(self):
+        self.created_by = intern_author(self.created_by)
+        self.modified_by = intern_author(self.modified_by)
+
     def __repr__(self) -> str:
         return self.info
 
+    def modify(self, information_text: str, admin_name: str, timestamp: Optional[int] = None):
+        self.modified_by = intern_author(admin_name)
+        self.modified_timestamp = int(time.time()) if timestamp is None else timestamp
+        self.info = information_text
+
     @property
     def info_detailled(self) -> str:
         last_modified_name = self.created_by if not self.modified_by else self.modified_by
-        latest_time = self.created_timestamp if not self.modified_timestamp else self.modified_by
-        last_modified_time: arrow.Arrow = arrow.get(int(latest_time))
-        return f"'{self.info}' was last modified by '{last_modified_name}' on {last_modified_time} which was {last_modified_time.humanize()}."
+        latest_time = self.created_timestamp if not self.modified_timestamp else self.modified_timestamp
+        return f"'{self.info}' was last modified by '{last_modified_name}' on {format_timestamp(latest_time)} which was {humanize(latest_time)}."
@@ -0,0 +1,148 @@
+import json
+import mmap
+
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Callable, Dict, Iterator, List, Tuple, Union
+
+from .player import Player
+
+# Part of the text of a player without information in the snapshot
+EMPTY_PLAYER_MARKER = b'"information": []'
+
+
+def parse_information_texts(player_text: str) -> List[str]:
+    """ Info texts of the json object of a player in the snapshot, without decoding it to Player. """
+    return [information["info"] for information in json.loads(player_text)["information"]]
+
+
+class LazyPlayerMap(MutableMapping):
+    """
+    The players of a memory mapped players.json snapshot. A player is decoded on first access, at most 'max_loaded'
+    decoded players are kept and the least recently used ones are dropped again, so they only take memory while used.
+    A player is only dropped if it is still the same as in the snapshot. Changed and new players stay in memory.
+    'spans' holds (start of name, start of value, end) of every player in the snapshot, see storage/lazy_loading.py.
+    """
+
+    def __init__(
+        self,
+        snapshot: bytes,
+        spans: array,
+        entries: Dict[str, Union[Player, int]],
+        decode: Callable[[str], Player],
+        encode: Callable[[str, Player], str],
+        max_loaded: int = 10_000,
+    ):
+        self._snapshot = snapshot
+        self._spans = spans
+        # [player name: decoded player or number of its span], in file order
+        self._entries = entries
+        # Players that can be dropped again: [player name: number of its span], least recently used first
+        self._evictable: "OrderedDict[str, int]" = OrderedDict()
+        self._decode = decode
+        self._encode = encode
+        self.max_loaded = max(1, max_loaded)
+        self.decoded_amount = 0
+        self.evicted_amount = 0
+
+    ############ SNAPSHOT
+    def _entry_text(self, slot: int) -> str:
+        return self._snapshot[self._spans[3 * slot] : self._spans[3 * slot + 2]].decode()
+
+    def _value_text(self, slot: int) -> str:
+        return self._snapshot[self._spans[3 * slot + 1] : self._spans[3 * slot + 2]].decode()
+
+    def _evict(self):
+        while len(self._evictable) > self.max_loaded:
+            player_name, slot = self._evictable.popitem(last=False)
+            if self._encode(player_name, self._entries[player_name]) == self._entry_text(slot):
+                self._entries[player_name] = slot
+                self.evicted_amount += 1
+
+    def release_file(self):
+        """
+        Copies the snapshot to memory and closes the memory map, so the file can be replaced by a new snapshot:
+        Windows refuses to replace a file that is mapped. Copies made with 'shallow_copy' before still use the map.
+        """
+        if isinstance(self._snapshot, mmap.mmap):
+            snapshot = self._snapshot
+            self._snapshot = snapshot[:]
+            snapshot.close()
+
+    ############ MAPPING
+    def __getitem__(self, player_name: str) -> Player:
+        value = self._entries[player_name]
+        if value.__class__ is not int:
+            if player_name in self._evictable:
+                self._evictable.move_to_end(player_name)
+            return value
+        player = self._decode(self._value_text(value))
+        self._entries[player_name] = player
+        self._evictable[player_name] = value
+        self.decoded_amount += 1
+        self._evict()
+        return player
+
+    def __setitem__(self, player_name: str, player: Player):
+        self._entries[player_name] = player
+        self._evictable.pop(player_name, None)
+
+    def __delitem__(self, player_name: str):
+        del self._entries[player_name]
+        self._evictable.pop(player_name, None)
+
+    def __contains__(self, player_name: object) -> bool:
+        return player_name in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    ############ WITHOUT DECODING
+    def raw_items(self) -> Iterator[Tuple[str, Union[Player, str]]]:
+        """ (player name, player or its text in the snapshot), to write a new snapshot without decoding every player. """
+        for player_name, value in self._entries.items():
+            yield player_name, self._entry_text(value) if value.__class__ is int else value
+
+    def information_sources(self) -> List[Tuple[str, Union[List[str], str]]]:
+        """
+        (player name, info texts of a decoded player or the json text of a player that is not decoded, see
+        parse_information_texts), e.g. to build the search index in another thread. No player is decoded,
+        so none is dropped from memory either.
+        """
+        return [
+            (
+                player_name,
+                self._value_text(value) if value.__class__ is int else [info.info for info in value.information],
+            )
+            for player_name, value in self._entries.items()
+        ]
+
+    def names_with_information(self) -> Iterator[str]:
+        for player_name, value in self._entries.items():
+            if value.__class__ is int:
+                start, end = self._spans[3 * value + 1], self._spans[3 * value + 2]
+                if self._snapshot.find(EMPTY_PLAYER_MARKER, start, end) < 0:
+                    yield player_name
+            elif value.information:
+                yield player_name
+
+    def shallow_copy(self) -> "LazyPlayerMap":
+        """ Like Players.shallow_copy, players that are not decoded stay that way. """
+        entries: Dict[str, Union[Player, int]] = {
+            player_name: value if value.__class__ is int else Player(list(value.information))
+            for player_name, value in self._entries.items()
+        }
+        return LazyPlayerMap(self._snapshot, self._spans, entries, self._decode, self._encode, self.max_loaded)
+
+    def stats(self) -> Dict[str, float]:
+        decoded = sum(1 for value in self._entries.values() if value.__class__ is not int)
+        return {
+            "players_decoded": decoded,
+            "players_changed": decoded - len(self._evictable),
+            "player_decodes": self.decoded_amount,
+            "player_evictions": self.evicted_amount,
+        }
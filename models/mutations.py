@@ -0,0 +1,83 @@
+from typing import Any, Callable, Dict, List, Tuple
+
+from .channels import Channels
+from .players import Players
+from .users import Users
+
+"""
+Every change the chat commands make to channels, users and players, as json serializable dicts.
+That way a change can be applied where the data lives, e.g. by the supervisor in sharded mode:
+{"op": "add_information", "author": str, "content": str} -> amount of information of the player or False
+{"op": "edit_information", "author": str, "content": str} -> True if the information was changed
+{"op": "delete_information", "content": str} -> list of the removed information texts or None
+{"op": "add_alias", "alias": str, "player": str} -> name of the player the alias points to now or None
+{"op": "delete_alias", "alias": str} -> name of the player the alias pointed to or None
+{"op": "import_information", "path": str, "rows": [dict]} -> {"imported": int, "duplicates": int},
+    the rows are parsed and validated by models/bulk.py parse_file before
+{"op": "add_users" / "delete_users", "user_type": str, "names": [str]} -> names that were added / removed
+{"op": "add_channels" / "delete_channels", "names": [str]} -> channel names that were added / removed
+"""
+
+# Which file has to be saved after the mutation changed something
+MUTATION_TARGETS: Dict[str, str] = {
+    "add_information": "players",
+    "edit_information": "players",
+    "delete_information": "players",
+    "add_alias": "players",
+    "delete_alias": "players",
+    "import_information": "players",
+    "add_users": "users",
+    "delete_users": "users",
+    "add_channels": "channels",
+    "delete_channels": "channels",
+}
+
+
+def _user_functions(users: Users) -> Dict[Tuple[str, str], Callable[[str], bool]]:
+    return {
+        ("add_users", "superadmin"): users.add_super_admin,
+        ("add_users", "admin"): users.add_admin,
+        ("add_users", "user"): users.add_user,
+        ("delete_users", "superadmin"): users.delete_super_admin,
+        ("delete_users", "admin"): users.delete_admin,
+        ("delete_users", "user"): users.delete_user,
+    }
+
+
+def apply_mutation(channels: Channels, users: Users, players: Players, mutation: dict) -> Any:
+    """ Applies the mutation and returns its result, a falsy result means nothing was changed. """
+    op = mutation["op"]
+    if op == "add_information":
+        return players.add_information(mutation["author"], mutation["content"])
+    if op == "edit_information":
+        return players.edit_information(mutation["author"], mutation["content"])
+    if op == "delete_information":
+        removed_player = players.delete_information(mutation["content"])
+        if removed_player is None:
+            return None
+        return [information.info for information in removed_player.information]
+    if op == "add_alias":
+        return players.add_alias(mutation["alias"], mutation["player"])
+    if op == "delete_alias":
+        return players.delete_alias(mutation["alias"])
+    if op == "import_information":
+        # Only needed for this rare mutation, so it is not imported at startup
+        from .bulk import add_rows
+
+        report = add_rows(players, mutation["rows"])
+        return {"imported": report.imported, "duplicates": report.duplicates}
+    if op in {"add_users", "delete_users"}:
+        user_function = _user_functions(users)[(op, mutation["user_type"])]
+        return [user_name for user_name in mutation["names"] if user_function(user_name.lower())]
+    if op in {"add_channels", "delete_channels"}:
+        changed_channels: List[str] = []
+        for channel_name in mutation["names"]:
+            channel_name: str = channel_name.lower()
+            if op == "add_channels" and channel_name not in channels.channels:
+                channels.channels.add(channel_name)
+                changed_channels.append(channel_name)
+            elif op == "delete_channels" and channel_name in channels.channels:
+                channels.channels.remove(channel_name)
+                changed_channels.append(channel_name)
+        return changed_channels
+    raise ValueError(f"Unknown mutation: {mutation}")
@@ -0,0 +1,167 @@
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple, Union
+
+from .information import Information
+from .observer import PlayersObserver
+from .player import Player
+
+if TYPE_CHECKING:
+    from .players import Players
+
+
+def edit_distance(a: str, b: str, max_distance: int) -> int:
+    """ Levenshtein distance of a and b, returns max_distance + 1 as soon as it is known to be bigger than max_distance. """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_row = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current_row = [i]
+        for j, char_b in enumerate(b, 1):
+            current_row.append(
+                min(previous_row[j] + 1, current_row[j - 1] + 1, previous_row[j - 1] + (char_a != char_b))
+            )
+        if min(current_row) > max_distance:
+            return max_distance + 1
+        previous_row = current_row
+    return previous_row[-1]
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    """ All strings that can be made by deleting up to 'distance' characters from 'word', including 'word' itself. """
+    variants = {word}
+    current = {word}
+    for _ in range(distance):
+        current = {variant[:i] + variant[i + 1 :] for variant in current for i in range(len(variant))}
+        variants |= current
+    return variants
+
+
+class PlayerNameIndex(PlayersObserver):
+    """
+    Index of all player names that have information, to complete prefixes and suggest names for typos.
+    Prefix lookups use a sorted list, suggestions use symmetric deletes (SymSpell): every name is stored under itself and
+    each variant with one character removed, a query looks up its own variants with up to two removed characters.
+    The index is kept up to date by Players and is only (re)built on the first lookup after a bulk change.
+    """
+
+    def __init__(self, players: "Players"):
+        self._players = players
+        self._sorted_names: List[str] = []
+        # [deleted variant: name or list of names], a single name is stored without list to save memory
+        self._variants: Dict[str, Union[str, List[str]]] = {}
+        self._built = False
+
+    def invalidate(self):
+        """ Call after players were changed without going through the Players methods, e.g. after loading a file. """
+        self._built = False
+        self._sorted_names = []
+        self._variants = {}
+
+    def _ensure_built(self):
+        if self._built:
+            return
+        self._sorted_names = sorted(self._players.names_with_information())
+        self._variants = {}
+        for name in self._sorted_names:
+            self._add_variants(name)
+        self._built = True
+
+    def __len__(self) -> int:
+        self._ensure_built()
+        return len(self._sorted_names)
+
+    ############ CHANGES
+    def _add_variants(self, name: str):
+        for variant in _deletes(name, 1):
+            existing = self._variants.get(variant)
+            if existing is None:
+                self._variants[variant] = name
+            elif isinstance(existing, str):
+                self._variants[variant] = [existing, name]
+            else:
+                existing.append(name)
+
+    def _remove_variants(self, name: str):
+        for variant in _deletes(name, 1):
+            existing = self._variants.get(variant)
+            if existing == name:
+                del self._variants[variant]
+            elif isinstance(existing, list) and name in existing:
+                existing.remove(name)
+                if len(existing) == 1:
+                    self._variants[variant] = existing[0]
+
+    def add(self, name: str):
+        if not self._built:
+            return
+        index = bisect_left(self._sorted_names, name)
+        if index < len(self._sorted_names) and self._sorted_names[index] == name:
+            return
+        self._sorted_names.insert(index, name)
+        self._add_variants(name)
+
+    def remove(self, name: str):
+        if not self._built:
+            return
+        index = bisect_left(self._sorted_names, name)
+        if index == len(self._sorted_names) or self._sorted_names[index] != name:
+            return
+        self._sorted_names.pop(index)
+        self._remove_variants(name)
+
+    def on_add(self, player_name: str, index: int, information: Information):
+        if index == 0:
+            self.add(player_name)
+
+    def on_delete(self, player_name: str, player: Player):
+        self.remove(player_name)
+
+    def on_bulk_add(self, entries: List[Tuple[str, int, Information]]):
+        # Every name inserted into the sorted list moves the names after it, building it again is cheaper
+        if any(index == 0 for _, index, _ in entries):
+            self.invalidate()
+
+    ############ LOOKUPS
+    def _prefix_range(self, prefix: str):
+        start = bisect_left(self._sorted_names, prefix)
+        if not prefix:
+            return start, len(self._sorted_names)
+        end = bisect_left(self._sorted_names, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo=start)
+        return start, end
+
+    def count_prefix(self, prefix: str = "") -> int:
+        self._ensure_built()
+        start, end = self._prefix_range(prefix)
+        return end - start
+
+    def complete(self, prefix: str = "", limit: int = 10, offset: int = 0) -> List[str]:
+        """ Names starting with 'prefix' in alphabetical order. """
+        self._ensure_built()
+        start, end = self._prefix_range(prefix)
+        return self._sorted_names[min(start + offset, end) : min(start + offset + limit, end)]
+
+    def suggest(self, name: str, limit: int = 3, max_distance: int = 2) -> List[str]:
+        """ Names that are at most 'max_distance' typos away from 'name', closest first. Exact matches are not returned. """
+        self._ensure_built()
+        checked: Set[str] = {name}
+        looked_up: Set[str] = set()
+        scored: List[Tuple[int, str]] = []
+        # Names within distance 1 are all found with the variants of distance 1, only look further if there are not enough
+        for distance in range(1, max_distance + 1):
+            variants = _deletes(name, distance) - looked_up
+            looked_up |= variants
+            for variant in variants:
+                existing: Optional[Union[str, List[str]]] = self._variants.get(variant)
+                if existing is None:
+                    continue
+                for candidate in [existing] if isinstance(existing, str) else existing:
+                    if candidate in checked:
+                        continue
+                    checked.add(candidate)
+                    candidate_distance = edit_distance(name, candidate, max_distance)
+                    if candidate_distance <= max_distance:
+                        scored.append((candidate_distance, candidate))
+            if sum(1 for candidate_distance, _candidate in scored if candidate_distance <= distance) >= limit:
+                break
+        scored.sort()
+        return [candidate for _candidate_distance, candidate in scored[:limit]]
@@ -0,0 +1,36 @@
+from typing import List, Optional, Tuple
+
+from .information import Information
+from .player import Player
+
+
+class PlayersObserver:
+    """
+    Gets notified about every change that is made through the Players object, e.g. to write a journal or to keep an index up to date.
+    The methods are called after the change was applied. Override the ones you need.
+    """
+
+    def on_add(self, player_name: str, index: int, information: Information):
+        pass
+
+    def on_edit(self, player_name: str, index: int, information: Information, old_info: str):
+        pass
+
+    def on_delete(self, player_name: str, player: Player):
+        pass
+
+    def on_merge(self, alias_name: str, merged_player: Player, player_name: str, first_index: int):
+        """
+        The information of 'alias_name' is about to be appended to 'player_name', the first entry at 'first_index'.
+        Called before 'on_delete' and 'on_add' for the moved entries, to carry over what belongs to them.
+        """
+        pass
+
+    def on_alias(self, alias_name: str, player_name: Optional[str]):
+        """ 'alias_name' points to 'player_name' now, or is no alias anymore if it is None. """
+        pass
+
+    def on_bulk_add(self, entries: List[Tuple[str, int, Information]]):
+        """ Many entries were added at once, e.g. by an import. By default the same as 'on_add' for every entry. """
+        for player_name, index, information in entries:
+            self.on_add(player_name, index, information)
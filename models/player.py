@@ -1,14 +1,16 @@
-import time
-
 from dataclasses import dataclass, field
-from dataclasses_json import DataClassJsonMixin
+from dataclasses_json import dataclass_json
 from typing import List, Optional
 
 from .information import Information
+from .slots import add_slots
 
 
+# Like Information, one Player object exists per player name so it is slotted as well
+@add_slots
+@dataclass_json
 @dataclass()
-class Player(DataClassJsonMixin):
+class Player:
     information: List[Information] = field(default_factory=lambda: [])
 
     def add_information(self, information_text: str, admin_name: str):
@@ -19,10 +21,7 @@ class Player(DataClassJsonMixin):
         # Index out of range already checked in Players.edit_information
         assert information_index < len(self.information)
 
-        old_information = self.information[information_index]
-        old_information.modified_by = admin_name
-        old_information.modified_timestamp = time.time()
-        old_information.info = information_text
+        self.information[information_index].modify(information_text, admin_name)
 
     def get_information_at_index(self, information_index: int) -> Optional[Information]:
         # Out of range
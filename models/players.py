@@ -1,18 +1,55 @@
 from dataclasses import dataclass, field
-from dataclasses_json import DataClassJsonMixin
-from typing import List, Dict, Optional
+from dataclasses_json import DataClassJsonMixin, config
+from typing import Iterable, Iterator, List, Dict, Optional, Set, Tuple
 
 from .player import Player
 from .information import Information
+from .lazy_players import LazyPlayerMap
+from .name_index import PlayerNameIndex
+from .observer import PlayersObserver
+from .search_index import InformationSearchIndex
 
 
 @dataclass()
 class Players(DataClassJsonMixin):
     # Dict of [player_name: player_object]
     players: Dict[str, Player] = field(default_factory=lambda: {})
+    # Dict of [alias: player_name], e.g. barcode accounts or old names. An alias never points to another alias
+    # and is never a key of 'players'. Left out of the json file if there are none
+    aliases: Dict[str, str] = field(default_factory=lambda: {}, metadata=config(exclude=lambda aliases: not aliases))
+
+    def __post_init__(self):
+        # Not dataclass fields, so they don't end up in the json file
+        self.name_index = PlayerNameIndex(self)
+        self.search_index = InformationSearchIndex(self)
+        self.observers: List[PlayersObserver] = [self.name_index, self.search_index]
+        # [player_name: its aliases], to move them to another player when players are merged
+        self._aliases_of: Dict[str, Set[str]] = {}
+        for alias_name, player_name in self.aliases.items():
+            self._aliases_of.setdefault(player_name, set()).add(alias_name)
+
+    def shallow_copy(self) -> "Players":
+        """ Copies the dicts and information lists, the information objects themselves are shared. """
+        if isinstance(self.players, LazyPlayerMap):
+            return Players(self.players.shallow_copy(), dict(self.aliases))
+        return Players(
+            {player_name: Player(list(player.information)) for player_name, player in self.players.items()},
+            dict(self.aliases),
+        )
+
+    def names_with_information(self) -> Iterator[str]:
+        """ Without decoding the players that are not loaded yet, see LazyPlayerMap. """
+        if isinstance(self.players, LazyPlayerMap):
+            return self.players.names_with_information()
+        return (player_name for player_name, player in self.players.items() if player.information)
+
+    def resolve(self, player_name: str) -> str:
+        """ The name under which the information of 'player_name' is stored, 'player_name' itself if it is no alias. """
+        return self.aliases.get(player_name, player_name)
 
     def get_player(self, player_name: str) -> Player:
         """ Tries to return the player from the database. If it doesn't exist, create a new one. """
+        player_name = self.resolve(player_name)
         if player_name in self.players:
             return self.players.get(player_name)
         new_player = Player()
@@ -23,7 +60,7 @@ class Players(DataClassJsonMixin):
         """ Returns the amount of information the player has now. """
         # Split content: head (player name) and rest (player information)
         player_name, *new_information = content_string.split(" ")
-        player_name: str = player_name.lower()
+        player_name: str = self.resolve(player_name.lower())
         new_information = " ".join(new_information)
 
         if not new_information:
@@ -33,13 +70,31 @@ class Players(DataClassJsonMixin):
         player = self.get_player(player_name)
         player.add_information(new_information, author_name)
         new_information_amount = len(player.information)
+        for observer in self.observers:
+            observer.on_add(player_name, new_information_amount - 1, player.information[-1])
         return new_information_amount
 
+    def add_information_bulk(self, entries: Iterable[Tuple[str, Information]]) -> List[Tuple[str, int, Information]]:
+        """
+        Appends (player name, information) entries, e.g. from an import. Observers are notified once with all
+        added entries, e.g. the journal writes them at once and the name index is rebuilt instead of updated per entry.
+        """
+        added: List[Tuple[str, int, Information]] = []
+        for player_name, information in entries:
+            player_name = self.resolve(player_name)
+            player = self.get_player(player_name)
+            player.information.append(information)
+            added.append((player_name, len(player.information) - 1, information))
+        if added:
+            for observer in self.observers:
+                observer.on_bulk_add(added)
+        return added
+
     def edit_information(self, author_name: str, content_string: str) -> bool:
         # Split content: head (player name), index and rest (player information)
         player_name, information_index, *new_information = content_string.split(" ")
         information_index: str
-        player_name: str = player_name.lower()
+        player_name: str = self.resolve(player_name.lower())
         new_information = " ".join(new_information)
 
         if not new_information:
@@ -56,10 +111,14 @@ class Players(DataClassJsonMixin):
             # Index out of range
             return False
 
+        old_info = player.information[information_index].info
         player.edit_information(information_index, new_information, author_name)
+        for observer in self.observers:
+            observer.on_edit(player_name, information_index, player.information[information_index], old_info)
         return True
 
     def delete_information(self, content_string: str) -> Optional[Player]:
+        """ Removes the player with all information. Aliases are not resolved, deleting them is done with delete_alias. """
         # Split content: head (player name) and rest (player information)
         player_name, *_ = content_string.split(" ")
         player_name: str = player_name.lower()
@@ -68,9 +127,66 @@ class Players(DataClassJsonMixin):
             # TODO Add error: player_name is empty or new_information is empty = incorrect command usage
             return None
 
-        return self.players.pop(player_name, None)
+        removed_player = self.players.pop(player_name, None)
+        if removed_player is not None:
+            for observer in self.observers:
+                observer.on_delete(player_name, removed_player)
+        # The aliases would point to nothing
+        for alias_name in list(self._aliases_of.get(player_name, ())):
+            self.set_alias(alias_name, None)
+        return removed_player
+
+    ############ ALIASES
+    def set_alias(self, alias_name: str, player_name: Optional[str], notify: bool = True):
+        """ Points 'alias_name' to 'player_name' or removes the alias if it is None. Doesn't move any information. """
+        old_player_name = self.aliases.pop(alias_name, None)
+        if old_player_name is not None:
+            old_aliases = self._aliases_of[old_player_name]
+            old_aliases.discard(alias_name)
+            if not old_aliases:
+                del self._aliases_of[old_player_name]
+        if player_name is not None:
+            self.aliases[alias_name] = player_name
+            self._aliases_of.setdefault(player_name, set()).add(alias_name)
+        if notify:
+            for observer in self.observers:
+                observer.on_alias(alias_name, player_name)
+
+    def add_alias(self, alias_name: str, player_name: str) -> Optional[str]:
+        """
+        Makes 'alias_name' an alias of the player 'player_name' (or of the player that 'player_name' is an alias of).
+        If 'alias_name' has information, it is appended to the information of the player, and its aliases move too.
+        Returns the player the alias points to, None if both names already belong to the same player.
+        """
+        alias_name = alias_name.lower()
+        player_name = self.resolve(player_name.lower())
+        if not alias_name or not player_name or self.resolve(alias_name) == player_name:
+            return None
+
+        merged_player = self.players.pop(alias_name, None)
+        if merged_player is not None:
+            player = self.get_player(player_name)
+            for observer in self.observers:
+                observer.on_merge(alias_name, merged_player, player_name, len(player.information))
+            for observer in self.observers:
+                observer.on_delete(alias_name, merged_player)
+            for information in merged_player.information:
+                player.information.append(information)
+                for observer in self.observers:
+                    observer.on_add(player_name, len(player.information) - 1, information)
+        for moved_alias_name in [alias_name, *sorted(self._aliases_of.get(alias_name, ()))]:
+            self.set_alias(moved_alias_name, player_name)
+        return player_name
+
+    def delete_alias(self, alias_name: str) -> Optional[str]:
+        """ Returns the player that 'alias_name' pointed to, None if it was no alias. The information stays with the player. """
+        player_name = self.aliases.get(alias_name.lower())
+        if player_name is not None:
+            self.set_alias(alias_name.lower(), None)
+        return player_name
 
     def get_information(self, player_name: str) -> List[Information]:
+        player_name = self.resolve(player_name)
         if player_name in self.players:
             return self.players[player_name].information
         return []
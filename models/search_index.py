@@ -0,0 +1,279 @@
+import asyncio
+import heapq
+import math
+import re
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from .information import Information
+from .lazy_players import LazyPlayerMap, parse_information_texts
+from .observer import PlayersObserver
+from .player import Player
+
+if TYPE_CHECKING:
+    from .players import Players
+
+TOKEN_PATTERN = re.compile(r"\w+")
+# How many entries are checked at most per search
+MAX_CANDIDATES = 1000
+
+# (player name, information index)
+EntryKey = Tuple[str, int]
+# (player name, info texts of the player or its json text in a lazily loaded snapshot)
+InformationSource = Tuple[str, Union[List[str], str]]
+# (_add_entry or _remove_entry, its arguments)
+PendingChange = Tuple[Callable[[EntryKey, str], None], EntryKey, str]
+
+
+@dataclass()
+class SearchResult:
+    # How many entries contain all words of the query, at least, see 'amount_is_exact'
+    matches_amount: int
+    # The best entries, best first
+    keys: List[EntryKey]
+    # False if the search stopped before all entries of a word were checked, then there may be more matches
+    amount_is_exact: bool = True
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class InformationSearchIndex(PlayersObserver):
+    """
+    Inverted index from the words of all information texts to the entries containing them.
+    A search checks all entries of the rarest word of the query against the other words if there are at most
+    MAX_CANDIDATES of them. Otherwise it checks at most MAX_CANDIDATES entries, those that can score highest first,
+    so it doesn't get slower with the size of the database, even for common words.
+    The index is kept up to date by Players and is only (re)built on the first search after a bulk change,
+    in another thread if the search awaits 'build_in_executor' first.
+    """
+
+    def __init__(self, players: "Players"):
+        self._players = players
+        # [token: [(player name, information index): how often the token appears in the entry]]
+        self._postings: Dict[str, Dict[EntryKey, int]] = {}
+        # The same entries grouped by that count: [token: [count: [(player name, information index): None]]]
+        self._impacts: Dict[str, Dict[int, Dict[EntryKey, None]]] = {}
+        self._entries_amount = 0
+        self._built = False
+        self._building: Optional[asyncio.Future] = None
+        # Changes of players while the index is built in another thread, applied once it is done
+        self._pending_changes: Optional[List[PendingChange]] = None
+
+    def invalidate(self):
+        """ Call after players were changed without going through the Players methods, e.g. after loading a file. """
+        self._built = False
+        self._postings = {}
+        self._impacts = {}
+        self._entries_amount = 0
+        # An index that is being built from the old players is thrown away
+        self._pending_changes = None
+
+    ############ BUILDING
+    def _information_sources(self) -> List[InformationSource]:
+        players = self._players.players
+        if isinstance(players, LazyPlayerMap):
+            # Decoding every player would drop the others from memory again and again
+            return players.information_sources()
+        return [
+            (player_name, [information.info for information in player.information])
+            for player_name, player in players.items()
+        ]
+
+    def _build(self, sources: List[InformationSource]):
+        for player_name, source in sources:
+            texts = parse_information_texts(source) if source.__class__ is str else source
+            for index, text in enumerate(texts):
+                self._add_entry((player_name, index), text)
+        self._built = True
+
+    def _ensure_built(self):
+        if self._built:
+            return
+        self.invalidate()
+        self._build(self._information_sources())
+
+    async def build_in_executor(self):
+        """ Builds the index in another thread if it isn't built, so the bot can answer other commands meanwhile. """
+        if self._built:
+            return
+        if self._building is None:
+            # Only the new index is changed by the thread, the players are read before
+            sources = self._information_sources()
+            self._pending_changes = []
+            self._building = asyncio.ensure_future(self._build_in_executor(sources, self._pending_changes))
+        await asyncio.shield(self._building)
+
+    async def _build_in_executor(self, sources: List[InformationSource], pending_changes: List[PendingChange]):
+        index = InformationSearchIndex(self._players)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, index._build, sources)
+        finally:
+            self._building = None
+        if self._pending_changes is not pending_changes:
+            # Invalidated meanwhile, the next search builds it again
+            return
+        self._pending_changes = None
+        self._postings, self._impacts, self._entries_amount = index._postings, index._impacts, index._entries_amount
+        self._built = True
+        for change, key, text in pending_changes:
+            change(key, text)
+
+    ############ CHANGES
+    def _add_entry(self, key: EntryKey, text: str):
+        self._entries_amount += 1
+        counts: Dict[str, int] = {}
+        for token in tokenize(text):
+            counts[token] = counts.get(token, 0) + 1
+        postings = self._postings
+        for token, count in counts.items():
+            entries = postings.get(token)
+            if entries is None:
+                entries = postings[token] = {}
+                self._impacts[token] = {}
+            impacts = self._impacts[token]
+            old_count = entries.get(key)
+            if old_count is not None:
+                self._remove_impact(impacts, old_count, key)
+                count += old_count
+            entries[key] = count
+            bucket = impacts.get(count)
+            if bucket is None:
+                impacts[count] = {key: None}
+            else:
+                bucket[key] = None
+
+    @staticmethod
+    def _remove_impact(impacts: Dict[int, Dict[EntryKey, None]], count: int, key: EntryKey):
+        bucket = impacts[count]
+        del bucket[key]
+        if not bucket:
+            del impacts[count]
+
+    def _remove_entry(self, key: EntryKey, text: str):
+        self._entries_amount -= 1
+        for token in set(tokenize(text)):
+            entries = self._postings.get(token)
+            if entries is None:
+                continue
+            count = entries.pop(key, None)
+            if count is None:
+                continue
+            self._remove_impact(self._impacts[token], count, key)
+            if not entries:
+                del self._postings[token]
+                del self._impacts[token]
+
+    def _change(self, change: Callable[[EntryKey, str], None], key: EntryKey, text: str):
+        if self._built:
+            change(key, text)
+        elif self._pending_changes is not None:
+            self._pending_changes.append((change, key, text))
+
+    def on_add(self, player_name: str, index: int, information: Information):
+        self._change(self._add_entry, (player_name, index), information.info)
+
+    def on_edit(self, player_name: str, index: int, information: Information, old_info: str):
+        self._change(self._remove_entry, (player_name, index), old_info)
+        self._change(self._add_entry, (player_name, index), information.info)
+
+    def on_delete(self, player_name: str, player: Player):
+        for index, information in enumerate(player.information):
+            self._change(self._remove_entry, (player_name, index), information.info)
+
+    ############ LOOKUPS
+    def search(self, query: str, limit: int = 5) -> SearchResult:
+        """
+        Finds the entries that contain all words of 'query', the 'limit' best of them first.
+        Entries are ranked by tf-idf, so rare words and repeated words count more.
+        """
+        self._ensure_built()
+        tokens = set(tokenize(query))
+        if not tokens:
+            return SearchResult(0, [])
+        token_postings: List[Tuple[str, Dict[EntryKey, int]]] = []
+        for token in tokens:
+            entries = self._postings.get(token)
+            if not entries:
+                return SearchResult(0, [])
+            token_postings.append((token, entries))
+        token_postings.sort(key=lambda token_entries: len(token_entries[1]))
+        weights = [math.log(1 + self._entries_amount / len(entries)) for _token, entries in token_postings]
+        rarest_entries = token_postings[0][1]
+
+        matches: List[Tuple[float, EntryKey]] = []
+        # Scores of the 'limit' best matches so far, the lowest first
+        best_scores: List[float] = []
+
+        def check(key: EntryKey):
+            score = 0.0
+            for (_token, entries), weight in zip(token_postings, weights):
+                count = entries.get(key)
+                if count is None:
+                    return
+                score += count * weight
+            matches.append((-score, key))
+            if len(best_scores) < limit:
+                heapq.heappush(best_scores, score)
+            elif score > best_scores[0]:
+                heapq.heapreplace(best_scores, score)
+
+        if len(rarest_entries) <= MAX_CANDIDATES:
+            # Few enough to check all of them
+            for key in rarest_entries:
+                check(key)
+            amount_is_exact = True
+        else:
+            amount_is_exact = self._check_best_first(token_postings, weights, best_scores, limit, check)
+
+        # Best score first, then alphabetically by player name and index
+        best = heapq.nsmallest(limit, matches)
+        matches_amount = len(matches)
+        if len(token_postings) == 1:
+            # Every entry of the only word matches
+            matches_amount, amount_is_exact = len(rarest_entries), True
+        return SearchResult(matches_amount, [key for _score, key in best], amount_is_exact)
+
+    def _check_best_first(
+        self,
+        token_postings: List[Tuple[str, Dict[EntryKey, int]]],
+        weights: List[float],
+        best_scores: List[float],
+        limit: int,
+        check: Callable[[EntryKey], None],
+    ) -> bool:
+        """
+        Checks at most MAX_CANDIDATES entries, taken from the words of the query in the order of what they add to the
+        score: next is always the entries of the word and count with the highest count * weight that are left.
+        An entry that wasn't checked yet has every word at most as often as the next count of that word,
+        so once the 'limit'-th best score is higher than that, no other entry can get into the best matches.
+        Returns True if all matches were found.
+        """
+        # [descending counts of the token], and which of them is next
+        token_counts = [sorted(self._impacts[token], reverse=True) for token, _entries in token_postings]
+        positions = [0] * len(token_postings)
+        checked: Set[EntryKey] = set()
+        while len(checked) < MAX_CANDIDATES:
+            next_scores = [
+                counts[position] * weight for counts, position, weight in zip(token_counts, positions, weights)
+            ]
+            if best_scores and len(best_scores) == limit and best_scores[0] > sum(next_scores):
+                # None of the entries that are left can get into the best matches
+                return False
+            token_index = max(range(len(next_scores)), key=next_scores.__getitem__)
+            token, _entries = token_postings[token_index]
+            bucket = self._impacts[token][token_counts[token_index][positions[token_index]]]
+            for key in bucket:
+                if key in checked:
+                    continue
+                checked.add(key)
+                check(key)
+                if len(checked) == MAX_CANDIDATES:
+                    return False
+            positions[token_index] += 1
+            if positions[token_index] == len(token_counts[token_index]):
+                # Every entry containing this word was checked, so every match was
+                return True
+        return False
@@ -0,0 +1,22 @@
+from dataclasses import fields
+from typing import Type, TypeVar
+
+T = TypeVar("T")
+
+
+def add_slots(cls: Type[T]) -> Type[T]:
+    """
+    Recreates a dataclass with __slots__, so instances don't carry a __dict__.
+    Same as '@dataclass(slots=True)' which is only available in Python 3.10+.
+    """
+    cls_dict = dict(cls.__dict__)
+    field_names = tuple(f.name for f in fields(cls))
+    cls_dict["__slots__"] = field_names
+    for field_name in field_names:
+        # Default values are stored in __init__, the class attributes would conflict with the slots
+        cls_dict.pop(field_name, None)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+    new_cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+    new_cls.__qualname__ = cls.__qualname__
+    return new_cls
@@ -0,0 +1,62 @@
+import time
+
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Optional
+
+"""
+Timestamps as text for chat replies, e.g. "2020-10-10T12:00:00+00:00" and "3 days ago", like arrow formats them.
+Replies of the same entries are rendered over and over, so both are cached.
+"""
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+WEEK = 7 * DAY
+# Months and years are counted as 30 and 365 days, there is no calendar involved
+MONTH = 30 * DAY
+YEAR = 365 * DAY
+
+
+@lru_cache(maxsize=4096)
+def format_timestamp(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _amount(seconds: int, unit: int, singular: str, plural: str) -> str:
+    amount = seconds // unit
+    return singular if amount <= 1 else f"{amount} {plural}"
+
+
+@lru_cache(maxsize=4096)
+def _describe(seconds: int) -> str:
+    """ How long 'seconds' (at least 0) is, in the largest unit that fits. """
+    if seconds < 10:
+        return ""
+    if seconds < MINUTE:
+        return f"{seconds} seconds"
+    if seconds < HOUR:
+        return _amount(seconds, MINUTE, "a minute", "minutes")
+    if seconds < DAY:
+        return _amount(seconds, HOUR, "an hour", "hours")
+    if seconds < WEEK:
+        return _amount(seconds, DAY, "a day", "days")
+    if seconds < 15 * DAY:
+        return _amount(seconds, WEEK, "a week", "weeks")
+    if seconds < YEAR:
+        # Rounded to the nearest month, so 3 weeks are already "a month"
+        return _amount(seconds + MONTH // 2, MONTH, "a month", "months")
+    return _amount(seconds, YEAR, "a year", "years")
+
+
+def humanize(timestamp: int, now: Optional[float] = None) -> str:
+    """ E.g. "just now", "44 seconds ago", "an hour ago", "in 2 days". """
+    elapsed = int((time.time() if now is None else now) - timestamp)
+    distance = abs(elapsed)
+    if distance >= DAY:
+        # Only whole days matter from here on, which keeps the cache small
+        distance -= distance % DAY
+    description = _describe(distance)
+    if not description:
+        return "just now"
+    return f"{description} ago" if elapsed >= 0 else f"in {description}"
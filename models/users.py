@@ -1,15 +1,58 @@
 from dataclasses import dataclass, field
 from dataclasses_json import DataClassJsonMixin
-from typing import Dict
+from typing import Dict, FrozenSet, Optional
 
 from .user import User
 
+USER_PERMISSIONS = frozenset({"get_information"})
+ADMIN_PERMISSIONS = USER_PERMISSIONS | {
+    "add_user",
+    "delete_user",
+    "add_information",
+    "edit_information",
+    "delete_information",
+    "get_history",
+    "revert_information",
+    "add_alias",
+    "delete_alias",
+    "import_information",
+    "get_stats",
+}
+SUPERADMIN_PERMISSIONS = ADMIN_PERMISSIONS | {
+    "add_channel",
+    "delete_channel",
+    "add_super_admin",
+    "delete_super_admin",
+    "add_admin",
+    "delete_admin",
+}
+# What every user type may do, the permission names are the ones of the 'allowed_to_' functions of Users
+ROLE_PERMISSIONS: Dict[str, FrozenSet[str]] = {
+    "superadmin": SUPERADMIN_PERMISSIONS,
+    "admin": ADMIN_PERMISSIONS,
+    "user": USER_PERMISSIONS,
+}
+
+
+def role_allows(role: Optional[str], permission: str) -> bool:
+    """ 'role' is the user type from Users.role_of, None for users that are not known. """
+    return permission in ROLE_PERMISSIONS.get(role, frozenset())
+
 
 @dataclass()
 class Users(DataClassJsonMixin):
     # Dict of [twitch_user_name: user_object]
     users: Dict[str, User] = field(default_factory=lambda: {})
 
+    def shallow_copy(self) -> "Users":
+        # User objects are never modified, they get replaced
+        return Users(dict(self.users))
+
+    def role_of(self, user_name: str) -> Optional[str]:
+        """ Returns the user type ("superadmin", "admin" or "user") or None if the user is not known. """
+        user = self.users.get(user_name)
+        return None if user is None else user.type
+
     # Add and delete admins/users, return True if the operation was successful, False if it wasnt (e.g. name was already a admin/user or was more powerful)
     def add_super_admin(self, user_name: str) -> bool:
         if user_name in self.users and self.users[user_name].is_superadmin:
@@ -49,46 +92,69 @@ class Users(DataClassJsonMixin):
     # SUPERADMIN COMMANDS
     def allowed_to_add_channel(self, user_name: str) -> bool:
         """ In which channels the bot should stay. """
-        return user_name in self.users and self.users[user_name].is_superadmin
+        return role_allows(self.role_of(user_name), "add_channel")
 
     def allowed_to_delete_channel(self, user_name: str) -> bool:
-        return user_name in self.users and self.users[user_name].is_superadmin
+        return role_allows(self.role_of(user_name), "delete_channel")
 
     def allowed_to_add_super_admin(self, user_name: str) -> bool:
         """ Able to add superadmins to the list. """
-        return user_name in self.users and self.users[user_name].is_superadmin
+        return role_allows(self.role_of(user_name), "add_super_admin")
 
     def allowed_to_delete_super_admin(self, user_name: str) -> bool:
-        return user_name in self.users and self.users[user_name].is_superadmin
+        return role_allows(self.role_of(user_name), "delete_super_admin")
 
     def allowed_to_add_admin(self, user_name: str) -> bool:
         """ Able to add admins to the list. """
-        return user_name in self.users and self.users[user_name].is_superadmin
+        return role_allows(self.role_of(user_name), "add_admin")
 
     def allowed_to_delete_admin(self, user_name: str) -> bool:
-        return user_name in self.users and self.users[user_name].is_superadmin
+        return role_allows(self.role_of(user_name), "delete_admin")
 
     # ADMIN COMMANDS
     def allowed_to_add_user(self, user_name: str) -> bool:
         """ Able to add users to the list. """
-        return user_name in self.users and self.users[user_name].is_at_least_admin
+        return role_allows(self.role_of(user_name), "add_user")
 
     def allowed_to_delete_user(self, user_name: str) -> bool:
-        return user_name in self.users and self.users[user_name].is_at_least_admin
+        return role_allows(self.role_of(user_name), "delete_user")
 
     def allowed_to_add_information(self, user_name: str) -> bool:
         """ Able to add information. """
-        return user_name in self.users and self.users[user_name].is_at_least_admin
+        return role_allows(self.role_of(user_name), "add_information")
 
     def allowed_to_edit_information(self, user_name: str) -> bool:
         """ Able to edit information. """
-        return user_name in self.users and self.users[user_name].is_at_least_admin
+        return role_allows(self.role_of(user_name), "edit_information")
 
     def allowed_to_delete_information(self, user_name: str) -> bool:
         """ Able to delete information. """
-        return user_name in self.users and self.users[user_name].is_at_least_admin
+        return role_allows(self.role_of(user_name), "delete_information")
+
+    def allowed_to_get_history(self, user_name: str) -> bool:
+        """ Able to see the previous texts of information. """
+        return role_allows(self.role_of(user_name), "get_history")
+
+    def allowed_to_revert_information(self, user_name: str) -> bool:
+        """ Able to set information back to a previous text. """
+        return role_allows(self.role_of(user_name), "revert_information")
+
+    def allowed_to_add_alias(self, user_name: str) -> bool:
+        """ Able to make a name refer to another player. """
+        return role_allows(self.role_of(user_name), "add_alias")
+
+    def allowed_to_delete_alias(self, user_name: str) -> bool:
+        return role_allows(self.role_of(user_name), "delete_alias")
+
+    def allowed_to_import_information(self, user_name: str) -> bool:
+        """ Able to import information from a file on the machine of the bot. """
+        return role_allows(self.role_of(user_name), "import_information")
+
+    def allowed_to_get_stats(self, user_name: str) -> bool:
+        """ Able to see the metrics of the bot. """
+        return role_allows(self.role_of(user_name), "get_stats")
 
     # TWITCH USER COMMANDS
     def allowed_to_get_information(self, user_name: str) -> bool:
         """ Able to grab information about a player. """
-        return user_name in self.users and self.users[user_name].is_at_least_user
+        return role_allows(self.role_of(user_name), "get_information")
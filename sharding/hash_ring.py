@@ -0,0 +1,43 @@
+import bisect
+import hashlib
+
+from typing import Dict, Iterable, List
+
+
+def _hash(key: str) -> int:
+    # Python's hash() of strings changes between processes, md5 is the same everywhere
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent hashing of channel names to shards.
+    Every shard has 'replicas' points on the ring, a channel belongs to the shard of the next point after its hash.
+    Adding or removing a shard only moves the channels of that shard.
+    """
+
+    def __init__(self, shards: Iterable[int] = (), replicas: int = 100):
+        self.replicas = replicas
+        self._points: List[int] = []
+        # [point: shard]
+        self._shards: Dict[int, int] = {}
+        for shard in shards:
+            self.add_shard(shard)
+
+    def add_shard(self, shard: int):
+        for replica in range(self.replicas):
+            point = _hash(f"shard{shard}-{replica}")
+            self._shards[point] = shard
+            bisect.insort(self._points, point)
+
+    def remove_shard(self, shard: int):
+        for replica in range(self.replicas):
+            point = _hash(f"shard{shard}-{replica}")
+            if self._shards.pop(point, None) is not None:
+                self._points.remove(point)
+
+    def shard_for(self, channel_name: str) -> int:
+        if not self._points:
+            raise ValueError("The hash ring has no shards")
+        position = bisect.bisect(self._points, _hash(channel_name)) % len(self._points)
+        return self._shards[self._points[position]]
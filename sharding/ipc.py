@@ -0,0 +1,21 @@
+import asyncio
+import json
+
+from typing import AsyncIterator
+
+# The first state message contains all players, the default limit of 64 KiB per line is far too small
+LINE_LIMIT = 2 ** 30
+
+
+def send_message(writer: asyncio.StreamWriter, message: dict):
+    """ Messages between supervisor and workers are json lines. Buffered, the order of messages is kept. """
+    writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+
+
+async def read_messages(reader: asyncio.StreamReader) -> AsyncIterator[dict]:
+    """ Yields messages until the connection is closed. """
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        yield json.loads(line)
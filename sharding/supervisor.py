@@ -0,0 +1,243 @@
+import asyncio
+import json
+import sys
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from chat.logs import setup_logging
+from chat.shutdown import handle_stop_signals
+from models.bot_config import BotConfig
+from models.information import Information
+from models.mutations import MUTATION_TARGETS, apply_mutation
+from models.observer import PlayersObserver
+from models.player import Player
+from storage.backends import create_storage
+from storage.codec import encode_players, encode_users
+from storage.file_watcher import Merge
+from storage.journal import add_operation, alias_operation, delete_operation, edit_operation
+from .hash_ring import HashRing
+from .ipc import LINE_LIMIT, read_messages, send_message
+
+"""
+Sharded mode: the supervisor is the only process that changes and saves channels, users and players.
+Every worker process runs its own TwitchChatBot with its own IRC connection for a part of the channels.
+
+supervisor -> worker:
+{"type": "state", "shards": int, "channels": [str], "users": str, "players": str} once after the worker connected
+{"type": "channels", "channels": [str]} the channels of the worker changed
+{"type": "users", "users": str} users changed
+{"type": "players", "operations": [dict]} players changed, operations in the journal format
+{"type": "result", "id": int, "result": Any} answer to a mutation, sent after the change itself
+{"type": "result", "id": int, "error": str} the mutation failed
+
+worker -> supervisor:
+{"type": "hello", "shard": int}
+{"type": "mutate", "id": int, "mutation": dict} see models/mutations.py
+"""
+
+ROOT_FOLDER = Path(__file__).parent.parent
+
+
+class OperationRecorder(PlayersObserver):
+    """ Collects the changes of players in the journal format, so they can be sent to the workers. """
+
+    def __init__(self):
+        self.operations: List[dict] = []
+
+    def on_add(self, player_name: str, index: int, information: Information):
+        self.operations.append(add_operation(player_name, index, information))
+
+    def on_edit(self, player_name: str, index: int, information: Information, old_info: str):
+        self.operations.append(edit_operation(player_name, index, information))
+
+    def on_delete(self, player_name: str, player: Player):
+        self.operations.append(delete_operation(player_name))
+
+    def on_alias(self, alias_name: str, player_name: Optional[str]):
+        self.operations.append(alias_operation(alias_name, player_name))
+
+    def take(self) -> List[dict]:
+        operations, self.operations = self.operations, []
+        return operations
+
+
+class Supervisor:
+    def __init__(
+        self,
+        shards_amount: int,
+        data_folder: Path,
+        config: BotConfig,
+        worker_arguments: List[str] = (),
+        host: str = "127.0.0.1",
+        logs_folder: Optional[Path] = None,
+        worker_module: str = "sharding.worker",
+    ):
+        self.shards_amount = shards_amount
+        self.data_folder = data_folder
+        self.logs_folder = logs_folder or ROOT_FOLDER / config.shard_logs_folder
+        self.worker_arguments = list(worker_arguments)
+        # Started with 'python -m', e.g. benchmarks/sharded_worker.py to use a local IRC server
+        self.worker_module = worker_module
+        self.host = host
+        self.port = 0
+
+        self.storage = create_storage(config, data_folder)
+        self.channels = self.storage.load_channels()
+        self.users = self.storage.load_users()
+        self.players = self.storage.load_players()
+        self.recorder = OperationRecorder()
+        self.players.observers.append(self.recorder)
+
+        self.ring = HashRing(range(shards_amount))
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._processes: Dict[int, asyncio.subprocess.Process] = {}
+        self._watchers: List[asyncio.Task] = []
+        # [shard: connection to the worker]
+        self._writers: Dict[int, asyncio.StreamWriter] = {}
+        # Workers that connected and got the state, e.g. to wait until all are running
+        self.connected_event = asyncio.Event()
+        self._stopping = False
+
+    def channels_of(self, shard: int) -> List[str]:
+        return sorted(
+            channel_name for channel_name in self.channels.channels if self.ring.shard_for(channel_name) == shard
+        )
+
+    ############ WORKERS
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_worker, self.host, 0, limit=LINE_LIMIT)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self.storage.start_watching(self._on_reload)
+        for shard in range(self.shards_amount):
+            self._watchers.append(asyncio.ensure_future(self._run_worker(shard)))
+
+    async def _run_worker(self, shard: int):
+        """ Starts the worker process and restarts it if it exits. """
+        while not self._stopping:
+            process = self._processes[shard] = await asyncio.create_subprocess_exec(
+                sys.executable,
+                "-m",
+                self.worker_module,
+                "--supervisor",
+                f"{self.host}:{self.port}",
+                "--shard",
+                str(shard),
+                "--data-folder",
+                str(self.data_folder),
+                "--logs-folder",
+                str(self.logs_folder),
+                *self.worker_arguments,
+                cwd=str(ROOT_FOLDER),
+            )
+            return_code = await process.wait()
+            if self._stopping:
+                return
+            logger.error(f"Worker {shard} exited with code {return_code}, restarting it")
+            await asyncio.sleep(1)
+
+    async def _handle_worker(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        shard: Optional[int] = None
+        try:
+            async for message in read_messages(reader):
+                if message["type"] == "hello":
+                    shard = message["shard"]
+                    self._writers[shard] = writer
+                    send_message(
+                        writer,
+                        {
+                            "type": "state",
+                            "shards": self.shards_amount,
+                            "channels": self.channels_of(shard),
+                            "users": encode_users(self.users),
+                            # Lazily loaded players are copied from the snapshot without decoding them
+                            "players": encode_players(self.players),
+                        },
+                    )
+                    logger.info(f"Worker {shard} connected")
+                    if len(self._writers) == self.shards_amount:
+                        self.connected_event.set()
+                elif message["type"] == "mutate":
+                    try:
+                        result = self.mutate(message["mutation"])
+                    except Exception as e:
+                        # Only the command of the worker fails, the connection stays open
+                        logger.error(f"Error while applying {message['mutation']} of worker {shard}: {e}")
+                        send_message(writer, {"type": "result", "id": message["id"], "error": str(e)})
+                    else:
+                        send_message(writer, {"type": "result", "id": message["id"], "result": result})
+                await writer.drain()
+        except (ConnectionError, json.JSONDecodeError) as e:
+            logger.error(f"Lost connection to worker {shard}: {e}")
+        finally:
+            if shard is not None and self._writers.get(shard) is writer:
+                del self._writers[shard]
+                self.connected_event.clear()
+            writer.close()
+
+    def _broadcast(self, message: dict):
+        for writer in self._writers.values():
+            send_message(writer, message)
+
+    ############ CHANGES
+    def mutate(self, mutation: dict) -> Any:
+        """ Applies and saves a change, then sends it to the workers that are affected. """
+        result = apply_mutation(self.channels, self.users, self.players, mutation)
+        if not result:
+            return result
+        target = MUTATION_TARGETS[mutation["op"]]
+        getattr(self.storage, f"save_{target}")(getattr(self, target))
+        self._publish(target, result if target == "channels" else [])
+        return result
+
+    def _on_reload(self, target: str, merge: Merge):
+        """ Another program changed a data file, see Storage.start_watching. """
+        self._publish(target, merge.applied)
+
+    def _publish(self, target: str, changed_channels: List[str]):
+        if target == "players":
+            self._broadcast({"type": "players", "operations": self.recorder.take()})
+        elif target == "users":
+            self._broadcast({"type": "users", "users": encode_users(self.users)})
+        elif target == "channels":
+            # Only the shards of the added or removed channels change
+            for shard in {self.ring.shard_for(channel_name) for channel_name in changed_channels}:
+                writer = self._writers.get(shard)
+                if writer is not None:
+                    send_message(writer, {"type": "channels", "channels": self.channels_of(shard)})
+
+    async def stop(self):
+        self._stopping = True
+        for process in self._processes.values():
+            if process.returncode is None:
+                process.terminate()
+        for watcher in self._watchers:
+            watcher.cancel()
+        for process in self._processes.values():
+            await process.wait()
+        if self._server is not None:
+            self._server.close()
+        await self.storage.flush()
+        self.storage.close()
+
+
+async def run_supervisor(shards_amount: int):
+    config = BotConfig.load(ROOT_FOLDER / "config" / "bot_config.json")
+    logs_folder = ROOT_FOLDER / config.shard_logs_folder
+    logs_folder.mkdir(parents=True, exist_ok=True)
+    setup_logging(config, logs_folder / "supervisor.log")
+    supervisor = Supervisor(shards_amount, ROOT_FOLDER / "data", config, logs_folder=logs_folder)
+    await supervisor.start()
+    stopped = asyncio.Event()
+    handle_stop_signals(asyncio.get_running_loop(), stopped.set)
+    try:
+        # Runs until the process is stopped, then saves what is pending
+        await stopped.wait()
+    finally:
+        await supervisor.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(run_supervisor(int(sys.argv[1]) if len(sys.argv) > 1 else 2))
@@ -0,0 +1,168 @@
+import argparse
+import asyncio
+import json
+import sys
+
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict
+
+from loguru import logger
+
+from bot import TwitchChatBot
+from chat.logs import setup_logging
+from chat.shutdown import handle_stop_signals
+from models.bot_config import BotConfig
+from models.channels import Channels
+from models.players import Players
+from models.users import Users
+from storage.base import Storage
+from storage.codec import decode_players, decode_users
+from storage.journal import apply_operation
+from .ipc import LINE_LIMIT, read_messages, send_message
+
+ROOT_FOLDER = Path(__file__).parent.parent
+
+
+class ShardStorage(Storage):
+    """ Storage of a worker: the state comes from the supervisor, which also saves every change. """
+
+    def __init__(self, state: dict):
+        self._state = state
+
+    def load_channels(self) -> Channels:
+        return Channels(set(self._state["channels"]))
+
+    def load_users(self) -> Users:
+        return decode_users(self._state["users"])
+
+    def load_players(self) -> Players:
+        return decode_players(self._state["players"])
+
+    def save_channels(self, channels: Channels) -> None:
+        pass
+
+    def save_users(self, users: Users) -> None:
+        pass
+
+    def save_players(self, players: Players) -> None:
+        pass
+
+
+class MutationError(Exception):
+    """ A mutation failed in the supervisor, the message is the error there. """
+
+
+class ShardClient:
+    """ Connection of a worker to the supervisor: sends changes to it and applies the changes it sends. """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, timeout: float = 10.0):
+        self._reader = reader
+        self._writer = writer
+        self.timeout = timeout
+        self._next_id = 0
+        # [id: future of the result]
+        self._waiting: Dict[int, asyncio.Future] = {}
+
+    async def mutate(self, mutation: dict) -> Any:
+        """ Sends the mutation to the supervisor and waits until it was applied everywhere. """
+        self._next_id += 1
+        mutation_id = self._next_id
+        future = self._waiting[mutation_id] = asyncio.get_running_loop().create_future()
+        send_message(self._writer, {"type": "mutate", "id": mutation_id, "mutation": mutation})
+        await self._writer.drain()
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._waiting.pop(mutation_id, None)
+
+    async def run(self, bot):
+        """ Applies the changes from the supervisor to the bot until the connection is closed. """
+        async for message in read_messages(self._reader):
+            message_type = message["type"]
+            if message_type == "result":
+                future = self._waiting.pop(message["id"], None)
+                if future is None or future.done():
+                    continue
+                if "error" in message:
+                    future.set_exception(MutationError(message["error"]))
+                else:
+                    future.set_result(message["result"])
+            elif message_type == "players":
+                for operation in message["operations"]:
+                    apply_operation(bot.players, operation, notify=True)
+            elif message_type == "users":
+                bot.users = decode_users(message["users"])
+            elif message_type == "channels":
+                new_channels = set(message["channels"])
+                old_channels = bot.channels.channels
+                bot.channels = Channels(new_channels)
+                bot.channel_manager.request_join(sorted(new_channels - old_channels))
+                bot.channel_manager.request_part(sorted(old_channels - new_channels))
+
+
+async def run_worker(
+    supervisor_address: str,
+    shard: int,
+    data_folder: Path,
+    logs_folder: Path,
+    token: str,
+    connect: Callable[[TwitchChatBot], Awaitable[None]] = TwitchChatBot.connect,
+):
+    """ Runs one shard until the supervisor closes the connection. 'connect' connects the bot to IRC. """
+    config = BotConfig.load(ROOT_FOLDER / "config" / "bot_config.json")
+    # Every process writes its own files, loguru can't rotate a file that another process writes to
+    logs_folder.mkdir(parents=True, exist_ok=True)
+    setup_logging(config, logs_folder / f"bot.shard{shard}.log", logs_folder / f"audit.shard{shard}.jsonl")
+
+    host, port = supervisor_address.rsplit(":", 1)
+    reader, writer = await asyncio.open_connection(host, int(port), limit=LINE_LIMIT)
+    send_message(writer, {"type": "hello", "shard": shard})
+    await writer.drain()
+    state = json.loads(await reader.readline())
+    assert state["type"] == "state", state
+
+    bot = TwitchChatBot(
+        token,
+        "...",
+        "thelist_bot",
+        "!",
+        storage=ShardStorage(state),
+        history_file_path=data_folder / f"history.shard{shard}",
+    )
+    client = ShardClient(reader, writer)
+    bot.shard_client = client
+    # All workers use the same twitch account and share its JOIN rate limit
+    bot.channel_manager.joins_per_period = max(1, bot.channel_manager.joins_per_period // state["shards"])
+    logger.info(f"Worker {shard} started with {len(bot.channels.channels)} channels")
+
+    await connect(bot)
+    # The supervisor stops its workers with SIGTERM, the edit history of the worker is saved on close
+    receiving = asyncio.ensure_future(client.run(bot))
+    handle_stop_signals(asyncio.get_running_loop(), receiving.cancel)
+    try:
+        await receiving
+    except asyncio.CancelledError:
+        logger.info(f"Worker {shard} stopped")
+    else:
+        # Without the supervisor there is no one to save changes, it restarts the worker
+        logger.error(f"Worker {shard} lost the connection to the supervisor")
+    finally:
+        await bot.close()
+
+
+def argument_parser(description: str) -> argparse.ArgumentParser:
+    """ The arguments the supervisor starts a worker with. """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--supervisor", required=True, help="host:port of the supervisor")
+    parser.add_argument("--shard", type=int, required=True)
+    parser.add_argument("--data-folder", type=Path, default=ROOT_FOLDER / "data", help="Of the history files")
+    parser.add_argument("--logs-folder", type=Path, default=ROOT_FOLDER / "logs", help="Of the log and audit files")
+    return parser
+
+
+if __name__ == "__main__":
+    arguments = argument_parser("One shard of the bot, started by sharding/supervisor.py").parse_args()
+    with (ROOT_FOLDER / "config" / "twitch_irc_token.json").open() as f:
+        token = json.load(f)["token"]
+    asyncio.run(run_worker(arguments.supervisor, arguments.shard, arguments.data_folder, arguments.logs_folder, token))
+    sys.exit(1)
@@ -0,0 +1,17 @@
+from pathlib import Path
+
+from models.bot_config import BotConfig
+from .base import Storage
+
+
+def create_storage(config: BotConfig, data_folder: Path) -> Storage:
+    """ Creates the storage backend that is selected in the config. """
+    if config.storage_backend == "json":
+        from .json_storage import JsonStorage
+
+        return JsonStorage(data_folder, config)
+    if config.storage_backend == "sqlite":
+        from .sqlite_storage import SqliteStorage
+
+        return SqliteStorage(data_folder / config.sqlite_file_name)
+    raise ValueError(f"Unknown storage backend '{config.storage_backend}', expected 'json' or 'sqlite'")
@@ -0,0 +1,54 @@
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict
+
+from models.channels import Channels
+from models.players import Players
+from models.users import Users
+from .file_watcher import Merge
+
+
+class Storage:
+    """
+    Where the bot keeps its channels, users and players between restarts.
+    'load_*' is called once at startup, 'save_*' after every change. Backends may delay or batch the writes,
+    'flush' and 'close' make sure everything is written.
+    """
+
+    def load_channels(self) -> Channels:
+        raise NotImplementedError
+
+    def load_users(self) -> Users:
+        raise NotImplementedError
+
+    def load_players(self) -> Players:
+        raise NotImplementedError
+
+    def save_channels(self, channels: Channels) -> None:
+        raise NotImplementedError
+
+    def save_users(self, users: Users) -> None:
+        raise NotImplementedError
+
+    def save_players(self, players: Players) -> None:
+        raise NotImplementedError
+
+    def batch(self) -> ContextManager:
+        """ Changes of players inside 'with storage.batch():' may be written together when it ends. """
+        return nullcontext()
+
+    def start_watching(self, on_reload: Callable[[str, Merge], None]) -> None:
+        """
+        Starts to merge changes that other programs make to the stored data into the loaded objects.
+        'on_reload' is called with "channels", "users" or "players" and the keys that were changed.
+        """
+        pass
+
+    def stats(self) -> Dict[str, float]:
+        """ Numbers about the writes, for the metrics. """
+        return {}
+
+    async def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,373 @@
+"""
+Binary snapshots of Channels, Users and Players, for BotConfig.snapshot_format "binary".
+Smaller and faster to read and write than the indented json files, see benchmarks/binary_snapshot.py.
+
+Layout, all integers little endian:
+    header: MAGIC, version (1 byte), kind (1 byte), compression (1 byte)
+    body, compressed as a whole with zlib or lzma unless compression is COMPRESSION_NONE:
+        sections: tag (1 byte), length of the payload (8 bytes), payload
+        end: SECTION_END
+Sections are read one after another, so a snapshot can be read from a stream (e.g. a pipe) and is decompressed
+while it is read. Readers skip sections with unknown tags, a new version is only needed for incompatible changes.
+
+Strings are stored in string tables: the amount, the length in bytes of each string and the utf-8 text of all of
+them. Player and author names are stored once in the "names" table and referenced by their position in it,
+the columns of the information entries are arrays with one value per entry.
+"""
+import io
+import lzma
+import struct
+import sys
+import zlib
+
+from array import array
+from itertools import accumulate
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from models.channels import Channels
+from models.information import Information
+from models.player import Player
+from models.players import Players
+from models.user import User
+from models.users import Users
+
+MAGIC = b"TLSN"
+VERSION = 1
+# Extension of the snapshot files in the data folder, e.g. data/players.bin
+SNAPSHOT_SUFFIX = ".bin"
+
+KIND_CHANNELS = 1
+KIND_USERS = 2
+KIND_PLAYERS = 3
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_LZMA = 2
+COMPRESSIONS: Dict[str, int] = {"none": COMPRESSION_NONE, "zlib": COMPRESSION_ZLIB, "lzma": COMPRESSION_LZMA}
+
+SECTION_END = 0
+# String table of player, alias and author names
+SECTION_NAMES = 1
+# Per player: position of its name and amount of information entries
+SECTION_PLAYERS = 2
+# String table of the texts of all information entries, in the order of the players
+SECTION_INFO_TEXTS = 3
+# Per information entry: created_by, created_timestamp, modified_by, modified_timestamp
+SECTION_INFO_COLUMNS = 4
+# Positions of alias names and their player names
+SECTION_ALIASES = 5
+# String table of the channel names
+SECTION_CHANNELS = 6
+# Positions of the user names and of their types
+SECTION_USERS = 7
+
+_HEADER = struct.Struct("<4sBBB")
+_SECTION = struct.Struct("<BQ")
+_COUNT = struct.Struct("<I")
+# Stands for None in the timestamp columns, no real timestamp is that small
+_NO_TIMESTAMP = -(2 ** 63)
+_CHUNK_SIZE = 1 << 16
+
+# Fixed sizes, the arrays are written and read as raw bytes
+assert array("I").itemsize == 4 and array("q").itemsize == 8
+_SWAP_BYTES = sys.byteorder == "big"
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def is_snapshot(data: bytes) -> bool:
+    """ If 'data', e.g. the first bytes of a file, is the start of a binary snapshot. """
+    return data[: len(MAGIC)] == MAGIC
+
+
+############ ENCODING
+def _array_bytes(values: array) -> bytes:
+    if _SWAP_BYTES:
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _encode_strings(strings: Sequence[str]) -> bytes:
+    encoded = [string.encode() for string in strings]
+    return b"".join([_COUNT.pack(len(encoded)), _array_bytes(array("I", map(len, encoded)))] + encoded)
+
+
+class _NameTable:
+    """ Each name once, in the order they were first used. """
+
+    def __init__(self):
+        self.positions: Dict[str, int] = {}
+
+    def position(self, name: str) -> int:
+        position = self.positions.get(name)
+        if position is None:
+            position = self.positions[name] = len(self.positions)
+        return position
+
+    def encode(self) -> bytes:
+        return _encode_strings(list(self.positions))
+
+
+def _encode_snapshot(kind: int, sections: List[Tuple[int, bytes]], compression: int) -> bytes:
+    body = b"".join(
+        [_SECTION.pack(tag, len(payload)) + payload for tag, payload in sections] + [_SECTION.pack(SECTION_END, 0)]
+    )
+    # The fastest levels, the higher ones take several times as long for 10 to 20 % smaller files
+    if compression == COMPRESSION_ZLIB:
+        body = zlib.compress(body, 1)
+    elif compression == COMPRESSION_LZMA:
+        body = lzma.compress(body, format=lzma.FORMAT_XZ, preset=0)
+    elif compression != COMPRESSION_NONE:
+        raise SnapshotError(f"Unknown compression {compression}")
+    return _HEADER.pack(MAGIC, VERSION, kind, compression) + body
+
+
+def encode_players_snapshot(players: Players, compression: int = COMPRESSION_ZLIB) -> bytes:
+    names = _NameTable()
+    position = names.position
+    player_names = array("I")
+    information_amounts = array("I")
+    all_information: List[Information] = []
+    for player_name, player in players.players.items():
+        player_names.append(position(player_name))
+        information_amounts.append(len(player.information))
+        all_information.extend(player.information)
+
+    # modified_by is stored as position + 1, 0 stands for None
+    created_by = array("I", [position(information.created_by) for information in all_information])
+    created_timestamps = array("q", [int(information.created_timestamp) for information in all_information])
+    modified_by = array(
+        "I",
+        [
+            0 if information.modified_by is None else position(information.modified_by) + 1
+            for information in all_information
+        ],
+    )
+    modified_timestamps = array(
+        "q",
+        [
+            _NO_TIMESTAMP if information.modified_timestamp is None else int(information.modified_timestamp)
+            for information in all_information
+        ],
+    )
+    aliases = array("I")
+    for alias_name, player_name in players.aliases.items():
+        aliases.append(position(alias_name))
+        aliases.append(position(player_name))
+
+    sections = [
+        (SECTION_NAMES, names.encode()),
+        (
+            SECTION_PLAYERS,
+            _COUNT.pack(len(player_names)) + _array_bytes(player_names) + _array_bytes(information_amounts),
+        ),
+        (SECTION_INFO_TEXTS, _encode_strings([information.info for information in all_information])),
+        (
+            SECTION_INFO_COLUMNS,
+            _COUNT.pack(len(all_information))
+            + b"".join(map(_array_bytes, [created_by, created_timestamps, modified_by, modified_timestamps])),
+        ),
+        (SECTION_ALIASES, _COUNT.pack(len(players.aliases)) + _array_bytes(aliases)),
+    ]
+    return _encode_snapshot(KIND_PLAYERS, sections, compression)
+
+
+def encode_users_snapshot(users: Users, compression: int = COMPRESSION_ZLIB) -> bytes:
+    names = _NameTable()
+    positions = array("I")
+    for user_name, user in users.users.items():
+        positions.append(names.position(user_name))
+        positions.append(names.position(user.type))
+    sections = [
+        (SECTION_NAMES, names.encode()),
+        (SECTION_USERS, _COUNT.pack(len(users.users)) + _array_bytes(positions)),
+    ]
+    return _encode_snapshot(KIND_USERS, sections, compression)
+
+
+def encode_channels_snapshot(channels: Channels, compression: int = COMPRESSION_ZLIB) -> bytes:
+    return _encode_snapshot(KIND_CHANNELS, [(SECTION_CHANNELS, _encode_strings(list(channels.channels)))], compression)
+
+
+############ DECODING
+class _ZlibReader(io.RawIOBase):
+    """ Decompresses a zlib stream while it is read. """
+
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+        self._decompressor = zlib.decompressobj()
+        self._buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        while not self._buffer:
+            if self._decompressor.eof:
+                return 0
+            # Input that didn't fit into the last chunk comes first
+            data = self._decompressor.unconsumed_tail or self._stream.read(_CHUNK_SIZE)
+            if not data:
+                raise SnapshotError("Snapshot ends in the middle of the compressed data")
+            self._buffer = self._decompressor.decompress(data, _CHUNK_SIZE)
+        amount = min(len(target), len(self._buffer))
+        target[:amount] = self._buffer[:amount]
+        self._buffer = self._buffer[amount:]
+        return amount
+
+
+def _read_exactly(stream: BinaryIO, size: int) -> bytes:
+    data = stream.read(size)
+    if len(data) != size:
+        raise SnapshotError(f"Snapshot ends after {len(data)} of {size} bytes")
+    return data
+
+
+def _sections(stream: BinaryIO, kind: int) -> Iterator[Tuple[int, memoryview]]:
+    """ The (tag, payload) of every section of the snapshot in 'stream'. """
+    magic, version, snapshot_kind, compression = _HEADER.unpack(_read_exactly(stream, _HEADER.size))
+    if magic != MAGIC:
+        raise SnapshotError("Not a snapshot")
+    if version > VERSION:
+        raise SnapshotError(f"Snapshot version {version} is newer than the supported version {VERSION}")
+    if snapshot_kind != kind:
+        raise SnapshotError(f"Expected a snapshot of kind {kind}, got {snapshot_kind}")
+    if compression == COMPRESSION_ZLIB:
+        stream = io.BufferedReader(_ZlibReader(stream), _CHUNK_SIZE)
+    elif compression == COMPRESSION_LZMA:
+        stream = lzma.LZMAFile(stream)
+    elif compression != COMPRESSION_NONE:
+        raise SnapshotError(f"Unknown compression {compression}")
+    while True:
+        tag, length = _SECTION.unpack(_read_exactly(stream, _SECTION.size))
+        if tag == SECTION_END:
+            return
+        yield tag, memoryview(_read_exactly(stream, length))
+
+
+def _read_array(typecode: str, payload: memoryview, offset: int, amount: int) -> Tuple[array, int]:
+    """ The array of 'amount' values at 'offset' and the offset after it. """
+    values = array(typecode)
+    end = offset + amount * values.itemsize
+    if end > len(payload):
+        raise SnapshotError("Section is shorter than its arrays")
+    values.frombytes(payload[offset:end])
+    if _SWAP_BYTES:
+        values.byteswap()
+    return values, end
+
+
+def _decode_strings(payload: memoryview) -> List[str]:
+    (amount,) = _COUNT.unpack_from(payload)
+    lengths, offset = _read_array("I", payload, _COUNT.size, amount)
+    data = bytes(payload[offset:])
+    ends = list(accumulate(lengths))
+    starts = [0] + ends[:-1]
+    text = data.decode()
+    if len(text) == len(data):
+        # Only ascii, the byte positions are the character positions as well
+        return [text[start:end] for start, end in zip(starts, ends)]
+    return [data[start:end].decode() for start, end in zip(starts, ends)]
+
+
+def _read_sections(
+    stream: BinaryIO, kind: int, decoders: Dict[int, Callable[[memoryview], object]]
+) -> Dict[int, object]:
+    """ The decoded payload of each known section, unknown sections are skipped. """
+    decoded: Dict[int, object] = {}
+    for tag, payload in _sections(stream, kind):
+        decoder = decoders.get(tag)
+        if decoder is not None:
+            decoded[tag] = decoder(payload)
+    return decoded
+
+
+def _decode_player_columns(payload: memoryview) -> Tuple[array, array]:
+    (amount,) = _COUNT.unpack_from(payload)
+    player_names, offset = _read_array("I", payload, _COUNT.size, amount)
+    information_amounts, _ = _read_array("I", payload, offset, amount)
+    return player_names, information_amounts
+
+
+def _decode_information_columns(payload: memoryview) -> Tuple[array, array, array, array]:
+    (amount,) = _COUNT.unpack_from(payload)
+    created_by, offset = _read_array("I", payload, _COUNT.size, amount)
+    created_timestamps, offset = _read_array("q", payload, offset, amount)
+    modified_by, offset = _read_array("I", payload, offset, amount)
+    modified_timestamps, _ = _read_array("q", payload, offset, amount)
+    return created_by, created_timestamps, modified_by, modified_timestamps
+
+
+def _decode_positions(payload: memoryview) -> array:
+    (amount,) = _COUNT.unpack_from(payload)
+    positions, _ = _read_array("I", payload, _COUNT.size, 2 * amount)
+    return positions
+
+
+def read_players_snapshot(stream: BinaryIO) -> Players:
+    sections = _read_sections(
+        stream,
+        KIND_PLAYERS,
+        {
+            SECTION_NAMES: _decode_strings,
+            SECTION_PLAYERS: _decode_player_columns,
+            SECTION_INFO_TEXTS: _decode_strings,
+            SECTION_INFO_COLUMNS: _decode_information_columns,
+            SECTION_ALIASES: _decode_positions,
+        },
+    )
+    names: List[str] = sections.get(SECTION_NAMES, [])
+    player_names, information_amounts = sections.get(SECTION_PLAYERS, ([], []))
+    texts: List[str] = sections.get(SECTION_INFO_TEXTS, [])
+    created_by, created_timestamps, modified_by, modified_timestamps = sections.get(
+        SECTION_INFO_COLUMNS, ([], [], [], [])
+    )
+    if len(texts) != len(created_by) or len(texts) != sum(information_amounts):
+        raise SnapshotError("Amounts of information entries don't match")
+
+    # With None at position 0, see encode_players_snapshot
+    modified_names: List[Optional[str]] = [None] + names
+    all_information = list(
+        map(
+            Information,
+            texts,
+            [names[position] for position in created_by],
+            created_timestamps,
+            [modified_names[position] for position in modified_by],
+            [None if timestamp == _NO_TIMESTAMP else timestamp for timestamp in modified_timestamps],
+        )
+    )
+    players: Dict[str, Player] = {}
+    start = 0
+    for name_position, end in zip(player_names, accumulate(information_amounts)):
+        players[names[name_position]] = Player(all_information[start:end])
+        start = end
+    aliases = sections.get(SECTION_ALIASES, [])
+    return Players(players, {names[aliases[i]]: names[aliases[i + 1]] for i in range(0, len(aliases), 2)})
+
+
+def read_users_snapshot(stream: BinaryIO) -> Users:
+    sections = _read_sections(stream, KIND_USERS, {SECTION_NAMES: _decode_strings, SECTION_USERS: _decode_positions})
+    names: List[str] = sections.get(SECTION_NAMES, [])
+    positions = sections.get(SECTION_USERS, [])
+    return Users({names[positions[i]]: User(names[positions[i + 1]]) for i in range(0, len(positions), 2)})
+
+
+def read_channels_snapshot(stream: BinaryIO) -> Channels:
+    sections = _read_sections(stream, KIND_CHANNELS, {SECTION_CHANNELS: _decode_strings})
+    return Channels(set(sections.get(SECTION_CHANNELS, [])))
+
+
+def decode_players_snapshot(data: bytes) -> Players:
+    return read_players_snapshot(io.BytesIO(data))
+
+
+def decode_users_snapshot(data: bytes) -> Users:
+    return read_users_snapshot(io.BytesIO(data))
+
+
+def decode_channels_snapshot(data: bytes) -> Channels:
+    return read_channels_snapshot(io.BytesIO(data))
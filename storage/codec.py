@@ -0,0 +1,188 @@
+"""
+Hand written json encoding and decoding of Channels, Users and Players.
+Produces exactly the same text as 'to_json' of dataclasses_json and decodes into the same objects as 'from_json',
+but doesn't build a schema and introspect the types of every single object.
+"""
+import json
+
+from functools import lru_cache
+from json.encoder import encode_basestring_ascii
+from typing import Any, Dict, List, Optional, Tuple
+
+from models.channels import Channels
+from models.information import Information
+from models.lazy_players import LazyPlayerMap
+from models.player import Player
+from models.players import Players
+from models.user import User
+from models.users import Users
+
+# Indent of the players.json file, which lazy loading relies on, see storage/lazy_loading.py
+LAZY_INDENT = 4
+
+
+############ INFORMATION
+def information_to_dict(information: Information) -> Dict[str, Any]:
+    # Same key order as the fields of the dataclass
+    return {
+        "info": information.info,
+        "created_by": information.created_by,
+        "created_timestamp": information.created_timestamp,
+        "modified_by": information.modified_by,
+        "modified_timestamp": information.modified_timestamp,
+    }
+
+
+def information_from_dict(information_dict: Dict[str, Any]) -> Information:
+    # dataclasses_json converts float timestamps to the annotated type 'int' as well
+    created_timestamp = information_dict["created_timestamp"]
+    if not isinstance(created_timestamp, int):
+        created_timestamp = int(created_timestamp)
+    modified_timestamp = information_dict.get("modified_timestamp")
+    if modified_timestamp is not None and not isinstance(modified_timestamp, int):
+        modified_timestamp = int(modified_timestamp)
+    return Information(
+        information_dict["info"],
+        information_dict["created_by"],
+        created_timestamp,
+        information_dict.get("modified_by"),
+        modified_timestamp,
+    )
+
+
+############ PLAYERS
+def players_to_dict(players: Players) -> Dict[str, Any]:
+    players_dict: Dict[str, Any] = {
+        "players": {
+            player_name: {"information": [information_to_dict(information) for information in player.information]}
+            for player_name, player in players.players.items()
+        }
+    }
+    # Like dataclasses_json, see Players.aliases
+    if players.aliases:
+        players_dict["aliases"] = dict(players.aliases)
+    return players_dict
+
+
+def players_from_dict(players_dict: Dict[str, Any]) -> Players:
+    return Players(player_entries_from_dict(players_dict), dict(players_dict.get("aliases", {})))
+
+
+def player_entries_from_dict(players_dict: Dict[str, Any]) -> Dict[str, Player]:
+    """ Only the players, without building the indexes of a Players object. """
+    return {
+        player_name: Player([information_from_dict(information) for information in player_dict["information"]])
+        for player_name, player_dict in players_dict["players"].items()
+    }
+
+
+def _encode_value(value: Any) -> str:
+    if value is None:
+        return "null"
+    if value.__class__ is str:
+        return encode_basestring_ascii(value)
+    if value.__class__ is int:
+        return int.__repr__(value)
+    return json.dumps(value)
+
+
+@lru_cache()
+def _players_templates(indent: int) -> Tuple[str, str, str, str, str, str]:
+    """ The text around the values of players and information, as json.dumps(..., indent=indent) would write it. """
+    levels: List[str] = ["\n" + " " * (indent * level) for level in range(6)]
+    information_template = (
+        "{"
+        + f'{levels[5]}"info": %s,{levels[5]}"created_by": %s,{levels[5]}"created_timestamp": %s,'
+        + f'{levels[5]}"modified_by": %s,{levels[5]}"modified_timestamp": %s{levels[4]}'
+        + "}"
+    )
+    information_separator = "," + levels[4]
+    player_template = "%s: {" + f'{levels[3]}"information": [{levels[4]}%s{levels[3]}]{levels[2]}' + "}"
+    empty_player_template = "%s: {" + f'{levels[3]}"information": []{levels[2]}' + "}"
+    player_separator = "," + levels[2]
+    players_template = "{" + f'{levels[1]}"players": ' + "{" + f"{levels[2]}%s{levels[1]}" + "}" + levels[0] + "}"
+    return (
+        information_template,
+        information_separator,
+        player_template,
+        empty_player_template,
+        player_separator,
+        players_template,
+    )
+
+
+def encode_player(player_name: str, player: Player, indent: int = 4) -> str:
+    """ The text of one player inside the "players" object of 'encode_players', e.g. '"serral": {...}'. """
+    information_template, information_separator, player_template, empty_player_template, _, _ = _players_templates(
+        indent
+    )
+    if not player.information:
+        return empty_player_template % encode_basestring_ascii(player_name)
+    encoded_information = information_separator.join(
+        [
+            information_template
+            % (
+                encode_basestring_ascii(information.info),
+                encode_basestring_ascii(information.created_by),
+                _encode_value(information.created_timestamp),
+                _encode_value(information.modified_by),
+                _encode_value(information.modified_timestamp),
+            )
+            for information in player.information
+        ]
+    )
+    return player_template % (encode_basestring_ascii(player_name), encoded_information)
+
+
+def encode_players(players: Players, indent: Optional[int] = 4) -> str:
+    if indent is None:
+        return json.dumps(players_to_dict(players))
+    *_, player_separator, players_template = _players_templates(indent)
+    if isinstance(players.players, LazyPlayerMap) and indent == LAZY_INDENT:
+        # Players that were never decoded are copied from the old snapshot as they are
+        encoded_players = [
+            player if player.__class__ is str else encode_player(player_name, player, indent)
+            for player_name, player in players.players.raw_items()
+        ]
+    else:
+        encoded_players = [
+            encode_player(player_name, player, indent) for player_name, player in players.players.items()
+        ]
+    if not encoded_players:
+        return json.dumps(players_to_dict(players), indent=indent)
+    text = players_template % player_separator.join(encoded_players)
+    if players.aliases:
+        # Few compared to the players, so json.dumps is fast enough. Inserted in front of the closing brace
+        closing = "\n}"
+        encoded_aliases = json.dumps(players.aliases, indent=indent).replace("\n", "\n" + " " * indent)
+        text = f'{text[: -len(closing)]},\n{" " * indent}"aliases": {encoded_aliases}{closing}'
+    return text
+
+
+def decode_player(text: str) -> Player:
+    """ The json object of one player, e.g. the value after '"serral": ' in the players.json file. """
+    return Player([information_from_dict(information) for information in json.loads(text)["information"]])
+
+
+def decode_players(text: str) -> Players:
+    return players_from_dict(json.loads(text))
+
+
+############ USERS
+def encode_users(users: Users, indent: Optional[int] = 4) -> str:
+    return json.dumps(
+        {"users": {user_name: {"type": user.type} for user_name, user in users.users.items()}}, indent=indent
+    )
+
+
+def decode_users(text: str) -> Users:
+    return Users({user_name: User(user_dict["type"]) for user_name, user_dict in json.loads(text)["users"].items()})
+
+
+############ CHANNELS
+def encode_channels(channels: Channels, indent: Optional[int] = 4) -> str:
+    return json.dumps({"channels": list(channels.channels)}, indent=indent)
+
+
+def decode_channels(text: str) -> Channels:
+    return Channels(set(json.loads(text)["channels"]))
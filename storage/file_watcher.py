@@ -0,0 +1,125 @@
+import asyncio
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from .write_behind import WriteBehindPersister, file_signature
+
+
+@dataclass()
+class ExternalChange:
+    """ A data file that was changed by another program, e.g. configure.py or a text editor. """
+
+    name: str
+    file_path: Path
+    # New content of the file
+    text: str
+    # Entries of the file before and after the change, see PersistTarget.entries
+    base: Dict[str, Any]
+    external: Dict[str, Any]
+    # Keys whose value is different in 'base' and 'external'
+    changed_keys: List[str]
+
+
+@dataclass()
+class Merge:
+    # Keys that were changed in the file and now have the same value in memory
+    applied: List[str] = field(default_factory=list)
+    # Keys that were changed in the file and in memory since the file was last read or written, memory wins
+    conflicts: List[str] = field(default_factory=list)
+
+
+def merge_change(
+    change: ExternalChange, memory: Dict[str, Any], set_entry: Callable[[str, Optional[Any]], None]
+) -> Merge:
+    """
+    Three way merge of the change into 'memory', the version the bot uses.
+    'set_entry(key, None)' removes the key. Keys that were only changed in memory are kept as they are.
+    """
+    merge = Merge()
+    for key in change.changed_keys:
+        base_value = change.base.get(key)
+        external_value = change.external.get(key)
+        memory_value = memory.get(key)
+        if memory_value == external_value:
+            continue
+        if memory_value == base_value:
+            set_entry(key, external_value)
+            merge.applied.append(key)
+        else:
+            merge.conflicts.append(key)
+    return merge
+
+
+class DataFileWatcher:
+    """
+    Checks every 'interval' seconds if the files of the persister were changed by another program.
+    Only the signature (inode, mtime, size) is compared, a changed file is read and decoded in the worker thread
+    of the persister, so it never sees a file the persister is writing at the same time.
+    """
+
+    def __init__(
+        self, persister: WriteBehindPersister, on_change: Callable[[ExternalChange], None], interval: float = 2.0
+    ):
+        self.persister = persister
+        self.on_change = on_change
+        self.interval = interval
+        self._task: Optional[asyncio.Future] = None
+        self.reload_count = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    async def check(self):
+        for change in await self.persister.run_in_writer(self._find_changes):
+            self.reload_count += 1
+            try:
+                self.on_change(change)
+            except Exception as e:
+                logger.exception(f"Error while reloading {change.file_path}: {e}")
+
+    def _find_changes(self) -> List[ExternalChange]:
+        """ Runs in the worker thread of the persister. """
+        changes: List[ExternalChange] = []
+        for name, (signature, text) in list(self.persister.on_disk.items()):
+            target = self.persister.targets[name]
+            new_signature = file_signature(target.file_path)
+            if new_signature == signature:
+                continue
+            if new_signature is None:
+                # Nothing to merge, the next write creates the file again
+                logger.warning(f"{target.file_path} was deleted")
+                self.persister.on_disk[name] = (new_signature, text)
+                continue
+            with target.file_path.open() as f:
+                new_text = f.read()
+            if new_text == text:
+                # Only touched
+                self.persister.on_disk[name] = (new_signature, text)
+                continue
+            try:
+                external = target.entries(new_text)
+            except Exception as e:
+                # E.g. saved in the middle of an edit, the next change is compared to the last valid version again
+                logger.error(f"Could not reload {target.file_path}: {e}")
+                self.persister.on_disk[name] = (new_signature, text)
+                continue
+            self.persister.on_disk[name] = (new_signature, new_text)
+            base = {} if text is None else target.entries(text)
+            changed_keys = sorted(key for key in base.keys() | external.keys() if base.get(key) != external.get(key))
+            changes.append(ExternalChange(name, target.file_path, new_text, base, external, changed_keys))
+        return changes
@@ -0,0 +1,216 @@
+import json
+import os
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple, TextIO
+
+from loguru import logger
+
+from models.information import Information
+from models.observer import PlayersObserver
+from models.player import Player
+from models.players import Players
+from .codec import information_from_dict, information_to_dict
+from .write_behind import WriteBehindPersister
+
+
+def add_operation(player_name: str, index: int, information: Information) -> dict:
+    return {"op": "add", "player": player_name, "index": index, "information": information_to_dict(information)}
+
+
+def edit_operation(player_name: str, index: int, information: Information) -> dict:
+    return {
+        "op": "edit",
+        "player": player_name,
+        "index": index,
+        "info": information.info,
+        "modified_by": information.modified_by,
+        "modified_timestamp": information.modified_timestamp,
+    }
+
+
+def delete_operation(player_name: str) -> dict:
+    return {"op": "delete", "player": player_name}
+
+
+def alias_operation(alias_name: str, player_name: Optional[str]) -> dict:
+    return {"op": "alias", "alias": alias_name, "player": player_name}
+
+
+def apply_operation(players: Players, operation: dict, notify: bool = False) -> None:
+    """
+    Applies one journal line to 'players', the observers of 'players' are only notified if 'notify' is set.
+    Replaying an operation that is already contained in the snapshot doesn't change the result:
+    'add' carries the index the information was added at and is skipped if that index already exists,
+    'edit' and 'alias' set absolute values and 'delete' resets the player, so everything after it is rebuilt from the journal.
+    """
+    op = operation["op"]
+    player_name: Optional[str] = operation["player"]
+    if op == "add":
+        player = players.players.setdefault(player_name, Player())
+        index: int = operation["index"]
+        if len(player.information) == index:
+            information = information_from_dict(operation["information"])
+            player.information.append(information)
+            if notify:
+                for observer in players.observers:
+                    observer.on_add(player_name, index, information)
+    elif op == "edit":
+        player = players.players.get(player_name)
+        index: int = operation["index"]
+        if player is None or index >= len(player.information):
+            return
+        information = player.information[index]
+        old_info = information.info
+        information.modify(operation["info"], operation["modified_by"], operation["modified_timestamp"])
+        if notify:
+            for observer in players.observers:
+                observer.on_edit(player_name, index, information, old_info)
+    elif op == "delete":
+        removed_player = players.players.pop(player_name, None)
+        if notify and removed_player is not None:
+            for observer in players.observers:
+                observer.on_delete(player_name, removed_player)
+    elif op == "alias":
+        players.set_alias(operation["alias"], player_name, notify=notify)
+    else:
+        logger.warning(f"Unknown journal operation: {operation}")
+
+
+class PlayersJournal(PlayersObserver):
+    """
+    Appends every change to the players as one json line, so a change costs O(1) bytes instead of rewriting players.json.
+    Once the journal is bigger than 'compact_size' bytes, a new players.json snapshot is written and the journal is started over.
+    """
+
+    def __init__(self, journal_file_path: Path, compact_size: int = 1_000_000):
+        self.journal_file_path = journal_file_path
+        # While compacting, the old journal is moved here until the new snapshot is written
+        self.compacting_file_path = journal_file_path.with_name(journal_file_path.name + ".compacting")
+        self.compact_size = compact_size
+        self._file: Optional[TextIO] = None
+        self._compacting = False
+        # Operations that are written when the current batch ends, None if there is no batch
+        self._batched: Optional[List[dict]] = None
+
+    ############ READING
+    def replay(self, players: Players) -> int:
+        """ Applies the journal (and the leftover of an interrupted compaction) to the loaded snapshot. Returns the amount of operations. """
+        operations_amount = 0
+        for file_path in [self.compacting_file_path, self.journal_file_path]:
+            if not file_path.exists():
+                continue
+            with file_path.open() as f:
+                for line in f:
+                    try:
+                        operation = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Last line might be incomplete if the bot crashed while writing it
+                        logger.warning(f"Skipping broken line in {file_path}: {line!r}")
+                        continue
+                    apply_operation(players, operation)
+                    operations_amount += 1
+        return operations_amount
+
+    ############ WRITING
+    @property
+    def size(self) -> int:
+        if self._file is not None:
+            return self._file.tell()
+        if self.journal_file_path.exists():
+            return self.journal_file_path.stat().st_size
+        return 0
+
+    @property
+    def should_compact(self) -> bool:
+        return not self._compacting and self.size > self.compact_size
+
+    def _append(self, operation: dict):
+        self._append_many([operation])
+
+    def _append_many(self, operations: Iterable[dict]):
+        """ Writes the operations with one flush. """
+        if self._batched is not None:
+            self._batched.extend(operations)
+            return
+        if self._file is None:
+            os.makedirs(self.journal_file_path.parent, exist_ok=True)
+            self._file = self.journal_file_path.open("a")
+        for operation in operations:
+            self._file.write(json.dumps(operation) + "\n")
+        self._file.flush()
+
+    def on_add(self, player_name: str, index: int, information: Information):
+        self._append(add_operation(player_name, index, information))
+
+    def on_edit(self, player_name: str, index: int, information: Information, old_info: str):
+        self._append(edit_operation(player_name, index, information))
+
+    def on_delete(self, player_name: str, player: Player):
+        self._append(delete_operation(player_name))
+
+    def on_alias(self, alias_name: str, player_name: Optional[str]):
+        self._append(alias_operation(alias_name, player_name))
+
+    def on_bulk_add(self, entries: List[Tuple[str, int, Information]]):
+        self._append_many(add_operation(player_name, index, information) for player_name, index, information in entries)
+
+    @contextmanager
+    def batch(self):
+        """ Operations inside are written with one flush when it ends. """
+        if self._batched is not None:
+            yield
+            return
+        self._batched = []
+        try:
+            yield
+        finally:
+            operations, self._batched = self._batched, None
+            if operations:
+                self._append_many(operations)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    ############ COMPACTING
+    def _rotate(self) -> bool:
+        """ Moves the current journal aside, new operations go to a fresh journal. """
+        self.close()
+        if not self.journal_file_path.exists():
+            return False
+        if self.compacting_file_path.exists():
+            # Leftover of a failed compaction, keep its operations in front of the current ones
+            with self.compacting_file_path.open("a") as compacting, self.journal_file_path.open() as journal:
+                compacting.write(journal.read())
+            os.remove(self.journal_file_path)
+        else:
+            os.replace(self.journal_file_path, self.compacting_file_path)
+        return True
+
+    async def compact(self, persister: WriteBehindPersister, target_name: str = "players"):
+        """ Writes a new snapshot through the persister and removes the journal that is contained in it. """
+        if self._compacting:
+            return
+        self._compacting = True
+        try:
+            if not self._rotate():
+                return
+            # The snapshot is taken right away, so it contains every operation of the rotated journal
+            persister.mark_dirty(target_name)
+            if await persister.flush():
+                os.remove(self.compacting_file_path)
+                logger.info(f"Compacted journal {self.journal_file_path}")
+        finally:
+            self._compacting = False
+
+    def compact_sync(self, persister: WriteBehindPersister, target_name: str = "players"):
+        """ Blocking variant of 'compact', used at startup. """
+        if not self._rotate():
+            return
+        # Without a running event loop, the snapshot is written immediately. A failed write stays pending
+        persister.mark_dirty(target_name)
+        if not persister.has_pending_writes:
+            os.remove(self.compacting_file_path)
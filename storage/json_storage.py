@@ -0,0 +1,307 @@
+import asyncio
+import json
+
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, ContextManager, Dict, Optional
+
+from loguru import logger
+
+from models.bot_config import BotConfig
+from models.channels import Channels
+from models.lazy_players import LazyPlayerMap
+from models.player import Player
+from models.players import Players
+from models.user import User
+from models.users import Users
+from .base import Storage
+from .binary_snapshot import (
+    COMPRESSIONS,
+    SNAPSHOT_SUFFIX,
+    encode_channels_snapshot,
+    encode_players_snapshot,
+    encode_users_snapshot,
+    read_channels_snapshot,
+    read_players_snapshot,
+    read_users_snapshot,
+)
+from .codec import (
+    decode_channels,
+    decode_players,
+    decode_users,
+    encode_channels,
+    encode_players,
+    encode_users,
+    player_entries_from_dict,
+)
+from .file_watcher import DataFileWatcher, ExternalChange, Merge, merge_change
+from .journal import PlayersJournal, add_operation, apply_operation, delete_operation
+from .lazy_loading import load_lazy_players
+from .write_behind import WriteBehindPersister, write_file_atomic
+
+
+class JsonStorage(Storage):
+    """
+    Keeps the data in data/channels.json, data/users.json and data/players.json, or in data/*.bin binary snapshots
+    if BotConfig.snapshot_format is "binary", see storage/binary_snapshot.py.
+    Files are written by a WriteBehindPersister, changes of players go to a PlayersJournal if it is enabled.
+    Changes of the json files by other programs are merged by a DataFileWatcher, see 'start_watching'.
+    """
+
+    def __init__(self, data_folder: Path, config: BotConfig):
+        if config.snapshot_format not in {"json", "binary"}:
+            raise ValueError(f"Unknown snapshot format '{config.snapshot_format}', expected 'json' or 'binary'")
+        if config.snapshot_compression not in COMPRESSIONS:
+            raise ValueError(
+                f"Unknown snapshot compression '{config.snapshot_compression}', expected {', '.join(COMPRESSIONS)}"
+            )
+        # None if the files are json
+        self.snapshot_compression: Optional[int] = None
+        if config.snapshot_format == "binary":
+            self.snapshot_compression = COMPRESSIONS[config.snapshot_compression]
+        suffix = ".json" if self.snapshot_compression is None else SNAPSHOT_SUFFIX
+        self.channels_file_path = data_folder / f"channels{suffix}"
+        self.users_file_path = data_folder / f"users{suffix}"
+        self.players_file_path = data_folder / f"players{suffix}"
+
+        # The objects that are written on the next flush
+        self.channels = Channels()
+        self.users = Users()
+        self.players = Players()
+
+        # Writes data files in a background thread, at most once every 'save_interval' seconds
+        self.persister = WriteBehindPersister(interval=config.save_interval)
+        if self.snapshot_compression is None:
+            self.persister.register(
+                "channels",
+                self.channels_file_path,
+                lambda: self.channels.shallow_copy(),
+                encode_channels,
+                lambda text: dict.fromkeys(decode_channels(text).channels, True),
+            )
+            self.persister.register(
+                "users",
+                self.users_file_path,
+                lambda: self.users.shallow_copy(),
+                encode_users,
+                lambda text: decode_users(text).users,
+            )
+            self.persister.register(
+                "players",
+                self.players_file_path,
+                self._snapshot_players,
+                encode_players,
+                lambda text: player_entries_from_dict(json.loads(text)),
+            )
+        else:
+            compression = self.snapshot_compression
+            self.persister.register(
+                "channels",
+                self.channels_file_path,
+                lambda: self.channels.shallow_copy(),
+                lambda channels: encode_channels_snapshot(channels, compression),
+            )
+            self.persister.register(
+                "users",
+                self.users_file_path,
+                lambda: self.users.shallow_copy(),
+                lambda users: encode_users_snapshot(users, compression),
+            )
+            self.persister.register(
+                "players",
+                self.players_file_path,
+                lambda: self.players.shallow_copy(),
+                lambda players: encode_players_snapshot(players, compression),
+            )
+
+        self.players_journal: Optional[PlayersJournal] = None
+        if config.players_journal:
+            self.players_journal = PlayersJournal(
+                self.players_file_path.with_name("players.journal.jsonl"), config.journal_compact_size
+            )
+
+        # Decode players on first use instead of at startup, see storage/lazy_loading.py. 0 loads all of them.
+        # Needs the json file
+        self.lazy_players_memory = 0
+        if config.lazy_players and self.snapshot_compression is None:
+            self.lazy_players_memory = config.lazy_players_memory
+
+        self.reload_interval = config.reload_interval
+        self.watcher: Optional[DataFileWatcher] = None
+        self.on_reload: Optional[Callable[[str, Merge], None]] = None
+
+    ############ FILE READING
+    def _read(self, name: str, file_path: Path) -> Optional[str]:
+        text: Optional[str] = None
+        if file_path.exists():
+            with file_path.open() as f:
+                text = f.read()
+        if self.reload_interval > 0:
+            # What the file looked like, to find out what another program changed
+            self.persister.remember(name, text)
+        return text
+
+    def _load(
+        self, name: str, file_path: Path, decode: Callable[[str], Any], read_snapshot: Callable[[BinaryIO], Any]
+    ) -> Optional[Any]:
+        """ The decoded file, None if it doesn't exist. """
+        if self.snapshot_compression is None:
+            text = self._read(name, file_path)
+            return None if text is None else decode(text)
+        # Binary snapshots are not remembered, changes by other programs are not reloaded
+        if file_path.exists():
+            with file_path.open("rb") as f:
+                return read_snapshot(f)
+        json_file_path = file_path.with_suffix(".json")
+        if json_file_path.exists():
+            # Switched to binary snapshots, the binary file is written with the next change
+            logger.info(f"{file_path} doesn't exist, loading {json_file_path}")
+            with json_file_path.open() as f:
+                return decode(f.read())
+        return None
+
+    def load_channels(self) -> Channels:
+        channels = self._load("channels", self.channels_file_path, decode_channels, read_channels_snapshot)
+        if channels is not None:
+            self.channels = channels
+        return self.channels
+
+    def load_users(self) -> Users:
+        users = self._load("users", self.users_file_path, decode_users, read_users_snapshot)
+        if users is not None:
+            self.users = users
+        return self.users
+
+    def load_players(self) -> Players:
+        lazy_players = None
+        if self.lazy_players_memory > 0:
+            # Not remembered for reloading: that would need the whole text, and other programs writing a file
+            # of this size while the bot runs is not worth it
+            lazy_players = load_lazy_players(self.players_file_path, self.lazy_players_memory)
+        if lazy_players is not None:
+            self.players = lazy_players
+        else:
+            players = self._load("players", self.players_file_path, decode_players, read_players_snapshot)
+            if players is not None:
+                self.players = players
+        if self.players_journal is not None:
+            replayed_amount = self.players_journal.replay(self.players)
+            if replayed_amount:
+                logger.info(f"Replayed {replayed_amount} journal operations")
+                self.players_journal.compact_sync(self.persister)
+            self.players.observers.append(self.players_journal)
+        return self.players
+
+    ############ FILE WRITING
+    # The files are not written immediately, see WriteBehindPersister
+    def _snapshot_players(self) -> Players:
+        if isinstance(self.players.players, LazyPlayerMap):
+            # Taken right before players.json is replaced, which can't be memory mapped at that point
+            self.players.players.release_file()
+        return self.players.shallow_copy()
+
+    def save_channels(self, channels: Channels):
+        self.channels = channels
+        self.persister.mark_dirty("channels")
+
+    def save_users(self, users: Users):
+        self.users = users
+        self.persister.mark_dirty("users")
+
+    def save_players(self, players: Players):
+        self.players = players
+        if self.players_journal is not None:
+            # The change is already in the journal
+            if self.players_journal.should_compact:
+                try:
+                    asyncio.get_running_loop()
+                except RuntimeError:
+                    # E.g. bulk_data.py, without event loop the snapshot is written right away
+                    self.players_journal.compact_sync(self.persister)
+                    return
+                asyncio.ensure_future(self.players_journal.compact(self.persister))
+            return
+        self.persister.mark_dirty("players")
+
+    def batch(self) -> ContextManager:
+        if self.players_journal is None:
+            return nullcontext()
+        return self.players_journal.batch()
+
+    ############ RELOADING
+    def start_watching(self, on_reload: Callable[[str, Merge], None]):
+        if self.reload_interval <= 0 or self.watcher is not None or self.snapshot_compression is not None:
+            return
+        self.on_reload = on_reload
+        self.watcher = DataFileWatcher(self.persister, self._merge_external_change, self.reload_interval)
+        self.watcher.start()
+
+    def _merge_external_change(self, change: ExternalChange):
+        # Changes made in chat that are not in the file yet
+        local_changes = self.persister.is_dirty(change.name)
+        if change.name == "channels":
+            merge = merge_change(change, dict.fromkeys(self.channels.channels, True), self._set_channel)
+        elif change.name == "users":
+            merge = merge_change(change, self.users.users, self._set_user)
+        else:
+            if self.players_journal is not None:
+                local_changes = local_changes or self.players_journal.size > 0
+            merge = merge_change(change, self.players.players, self._set_player)
+        if not merge.applied and not merge.conflicts:
+            return
+        logger.info(f"Reloaded {change.file_path}, {len(merge.applied)} entries changed")
+
+        if merge.conflicts:
+            conflict_file_path = change.file_path.with_name(change.file_path.name + ".conflict")
+            write_file_atomic(conflict_file_path, change.text)
+            logger.warning(
+                f"{change.file_path} and chat changed the same entries, kept the version of chat: "
+                f"{', '.join(merge.conflicts)}. The other version was saved to {conflict_file_path}"
+            )
+        if local_changes or merge.conflicts:
+            # Write the merged version, the file doesn't contain the changes from chat
+            if change.name == "players" and self.players_journal is not None:
+                asyncio.ensure_future(self.players_journal.compact(self.persister))
+            else:
+                self.persister.mark_dirty(change.name)
+        if self.on_reload is not None:
+            self.on_reload(change.name, merge)
+
+    def _set_channel(self, channel_name: str, value: Optional[bool]):
+        if value:
+            self.channels.channels.add(channel_name)
+        else:
+            self.channels.channels.discard(channel_name)
+
+    def _set_user(self, user_name: str, user: Optional[User]):
+        if user is None:
+            self.users.users.pop(user_name, None)
+        else:
+            self.users.users[user_name] = user
+
+    def _set_player(self, player_name: str, player: Optional[Player]):
+        # Through journal operations, so observers like the indexes and the journal itself see the change
+        apply_operation(self.players, delete_operation(player_name), notify=True)
+        if player is not None:
+            for index, information in enumerate(player.information):
+                apply_operation(self.players, add_operation(player_name, index, information), notify=True)
+
+    def stats(self) -> Dict[str, float]:
+        stats = self.persister.stats()
+        if self.players_journal is not None:
+            stats["journal_bytes"] = self.players_journal.size
+        if isinstance(self.players.players, LazyPlayerMap):
+            stats.update(self.players.players.stats())
+        if self.watcher is not None:
+            stats["reloads"] = self.watcher.reload_count
+        return stats
+
+    async def flush(self):
+        await self.persister.flush()
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+        self.persister.close()
+        if self.players_journal is not None:
+            self.players_journal.close()
@@ -0,0 +1,133 @@
+"""
+Opens data/players.json without decoding it, for BotConfig.lazy_players.
+The file is memory mapped and only the positions of the players in it are looked up, each player is decoded by
+LazyPlayerMap when it is used for the first time. The positions are saved to players.json.index next to the file,
+so the next start doesn't even have to scan the file as long as it wasn't written in between.
+This relies on the layout 'encode_players' writes with indent 4: one player per line starting with 8 spaces,
+files that look different (e.g. written by hand or by an old version) are loaded completely instead.
+"""
+import json
+import mmap
+
+from array import array
+from json.decoder import scanstring
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from models.lazy_players import LazyPlayerMap
+from models.players import Players
+from .codec import decode_player, encode_player
+from .write_behind import FileSignature, file_signature, write_file_atomic
+
+HEADER = b'{\n    "players": {'
+# In front of the name of every player
+PLAYER_START = b'\n        "'
+# After the last player
+PLAYERS_END = b"\n    }"
+INDEX_SUFFIX = ".index"
+
+# (player names, (start of name, start of value, end) of every player, start of what comes after the players)
+PlayerSpans = Tuple[List[str], array, int]
+
+
+def index_file_path(players_file_path: Path) -> Path:
+    return players_file_path.with_name(players_file_path.name + INDEX_SUFFIX)
+
+
+def scan_players(snapshot: bytes) -> Optional[PlayerSpans]:
+    """ Finds the players in the text of a players.json file, None if it doesn't have the expected layout. """
+    if snapshot[: len(HEADER)] != HEADER:
+        return None
+    names: List[str] = []
+    spans = array("q")
+    if snapshot[len(HEADER) : len(HEADER) + 1] == b"}":
+        # No players
+        return names, spans, len(HEADER) + 1
+    players_end = snapshot.find(PLAYERS_END, len(HEADER))
+    if players_end < 0:
+        return None
+    position = snapshot.find(PLAYER_START, len(HEADER), players_end)
+    while position >= 0:
+        name_start = position + len(PLAYER_START) - 1
+        line_end = snapshot.find(b"\n", name_start)
+        line = snapshot[name_start:line_end]
+        if not line.isascii():
+            return None
+        try:
+            name, name_end = scanstring(line.decode(), 1)
+        except ValueError:
+            return None
+        value_start = name_start + name_end + len(": ")
+        if snapshot[value_start - 2 : value_start + 1] != b": {":
+            return None
+        position = snapshot.find(PLAYER_START, line_end, players_end)
+        # Without the comma in front of the next player
+        end = players_end if position < 0 else position - 1
+        names.append(name)
+        spans.extend((name_start, value_start, end))
+    return names, spans, players_end + len(PLAYERS_END)
+
+
+def _read_index(file_path: Path, signature: FileSignature) -> Optional[PlayerSpans]:
+    try:
+        with file_path.open() as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get("signature") != list(signature):
+        # players.json was written after the index
+        return None
+    return index["names"], array("q", index["spans"]), index["players_end"]
+
+
+def _write_index(file_path: Path, signature: FileSignature, player_spans: PlayerSpans):
+    names, spans, players_end = player_spans
+    try:
+        write_file_atomic(
+            file_path,
+            json.dumps(
+                {"signature": list(signature), "names": names, "spans": spans.tolist(), "players_end": players_end}
+            ),
+        )
+    except OSError as e:
+        logger.warning(f"Could not write {file_path}: {e}")
+
+
+def load_lazy_players(players_file_path: Path, max_loaded: int) -> Optional[Players]:
+    """ Players of which none is decoded yet, None if the file doesn't exist or has to be loaded completely. """
+    signature = file_signature(players_file_path)
+    if signature is None or signature[2] == 0:
+        return None
+    with players_file_path.open("rb") as f:
+        # Stays valid after the file is closed. Before the bot replaces the file, it is copied to memory and unmapped
+        snapshot = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(snapshot, "madvise") and hasattr(mmap, "MADV_RANDOM"):
+        # Players are decoded in random order, reading ahead would mostly load pages of other players
+        snapshot.madvise(mmap.MADV_RANDOM)
+    player_spans = _read_index(index_file_path(players_file_path), signature)
+    scanned = player_spans is None
+    if scanned:
+        player_spans = scan_players(snapshot)
+        if hasattr(snapshot, "madvise") and hasattr(mmap, "MADV_DONTNEED"):
+            # The scanned pages are not needed until their players are used
+            snapshot.madvise(mmap.MADV_DONTNEED)
+    rest: Optional[Dict] = None
+    if player_spans is not None:
+        try:
+            # What follows the players, e.g. ',\n    "aliases": {...}\n}'
+            rest = json.loads("{" + snapshot[player_spans[2] :].decode().lstrip(","))
+        except ValueError:
+            pass
+    if rest is None:
+        logger.info(f"{players_file_path} doesn't have the layout lazy loading needs, loading it completely")
+        snapshot.close()
+        return None
+    if scanned:
+        _write_index(index_file_path(players_file_path), signature, player_spans)
+    names, spans, _ = player_spans
+    entries = dict(zip(names, range(len(names))))
+    return Players(
+        LazyPlayerMap(snapshot, spans, entries, decode_player, encode_player, max_loaded), rest.get("aliases", {})
+    )
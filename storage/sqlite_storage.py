@@ -0,0 +1,215 @@
+import os
+import sqlite3
+
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import ContextManager, List, Optional, Tuple
+
+from models.channels import Channels
+from models.information import Information
+from models.observer import PlayersObserver
+from models.player import Player
+from models.players import Players
+from models.user import User
+from models.users import Users
+from .base import Storage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channels (
+    name TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS users (
+    name TEXT PRIMARY KEY,
+    type TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS information (
+    player TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    info TEXT NOT NULL,
+    created_by TEXT NOT NULL,
+    created_timestamp INTEGER NOT NULL,
+    modified_by TEXT,
+    modified_timestamp INTEGER,
+    PRIMARY KEY (player, position)
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    alias TEXT PRIMARY KEY,
+    player TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS information_created_by ON information (created_by);
+CREATE INDEX IF NOT EXISTS information_modified_by ON information (modified_by);
+"""
+
+INFORMATION_COLUMNS = "info, created_by, created_timestamp, modified_by, modified_timestamp"
+
+
+def _information_to_row(player_name: str, position: int, information: Information) -> Tuple:
+    return (
+        player_name,
+        position,
+        information.info,
+        information.created_by,
+        int(information.created_timestamp),
+        information.modified_by,
+        None if information.modified_timestamp is None else int(information.modified_timestamp),
+    )
+
+
+def _information_from_row(row: Tuple) -> Information:
+    info, created_by, created_timestamp, modified_by, modified_timestamp = row
+    # Databases created by older versions have REAL timestamp columns, which return floats
+    if modified_timestamp is not None:
+        modified_timestamp = int(modified_timestamp)
+    return Information(info, created_by, int(created_timestamp), modified_by, modified_timestamp)
+
+
+class SqliteStorage(Storage, PlayersObserver):
+    """
+    Keeps the data in a local SQLite database in WAL mode.
+    Changes of players are written as they happen (one transaction per change) by observing the Players object,
+    users and channels are small and are replaced in one transaction on every save.
+    """
+
+    def __init__(self, database_file_path: Path):
+        self.database_file_path = database_file_path
+        os.makedirs(database_file_path.parent, exist_ok=True)
+        # Autocommit mode, transactions are started explicitly with 'with self.connection'
+        self.connection = sqlite3.connect(str(database_file_path), isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # Durable enough in WAL mode, a power loss can only lose the last transactions
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        # Inside 'batch', the changes don't start their own transactions
+        self._in_batch = False
+
+    def _transaction(self) -> ContextManager:
+        if self._in_batch:
+            # Part of the transaction of the batch
+            return nullcontext()
+        self.connection.execute("BEGIN")
+        return self.connection
+
+    @contextmanager
+    def batch(self):
+        """ All changes inside are written in one transaction. """
+        if self._in_batch:
+            yield
+            return
+        with self._transaction():
+            self._in_batch = True
+            try:
+                yield
+            finally:
+                self._in_batch = False
+
+    ############ READING
+    def load_channels(self) -> Channels:
+        return Channels({name for (name,) in self.connection.execute("SELECT name FROM channels")})
+
+    def load_users(self) -> Users:
+        return Users(
+            {name: User(user_type) for name, user_type in self.connection.execute("SELECT name, type FROM users")}
+        )
+
+    def load_players(self) -> Players:
+        players = Players(aliases=dict(self.connection.execute("SELECT alias, player FROM aliases")))
+        rows = self.connection.execute(
+            f"SELECT player, {INFORMATION_COLUMNS} FROM information ORDER BY player, position"
+        )
+        for player_name, *information_row in rows:
+            player = players.players.get(player_name)
+            if player is None:
+                player = players.players[player_name] = Player()
+            player.information.append(_information_from_row(information_row))
+        players.observers.append(self)
+        return players
+
+    def find_player(self, player_name: str) -> Optional[Player]:
+        """ Indexed lookup of a single player without loading the whole database. """
+        alias_row = self.connection.execute("SELECT player FROM aliases WHERE alias = ?", (player_name,)).fetchone()
+        if alias_row is not None:
+            player_name = alias_row[0]
+        rows = self.connection.execute(
+            f"SELECT {INFORMATION_COLUMNS} FROM information WHERE player = ? ORDER BY position", (player_name,)
+        ).fetchall()
+        if not rows:
+            return None
+        return Player([_information_from_row(row) for row in rows])
+
+    def find_information_by_author(self, author_name: str) -> List[Tuple[str, int, Information]]:
+        """ Returns (player name, index, information) of every entry that was created or last modified by 'author_name'. """
+        rows = self.connection.execute(
+            f"SELECT player, position, {INFORMATION_COLUMNS} FROM information WHERE created_by = ? "
+            f"UNION SELECT player, position, {INFORMATION_COLUMNS} FROM information WHERE modified_by = ? "
+            f"ORDER BY player, position",
+            (author_name, author_name),
+        )
+        return [(player_name, position, _information_from_row(row)) for player_name, position, *row in rows]
+
+    ############ WRITING
+    def save_channels(self, channels: Channels):
+        with self._transaction():
+            self.connection.execute("DELETE FROM channels")
+            self.connection.executemany(
+                "INSERT INTO channels (name) VALUES (?)", [(name,) for name in channels.channels]
+            )
+
+    def save_users(self, users: Users):
+        with self._transaction():
+            self.connection.execute("DELETE FROM users")
+            self.connection.executemany(
+                "INSERT INTO users (name, type) VALUES (?, ?)",
+                [(name, user.type) for name, user in users.users.items()],
+            )
+
+    def save_players(self, players: Players):
+        # Every change was already written by the on_* methods
+        pass
+
+    def import_players(self, players: Players):
+        """ Replaces all players in the database, used to migrate from the json files. """
+        with self._transaction():
+            self.connection.execute("DELETE FROM information")
+            self.connection.execute("DELETE FROM aliases")
+            self.connection.executemany("INSERT INTO aliases (alias, player) VALUES (?, ?)", players.aliases.items())
+            self.connection.executemany(
+                f"INSERT INTO information (player, position, {INFORMATION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    _information_to_row(player_name, position, information)
+                    for player_name, player in players.players.items()
+                    for position, information in enumerate(player.information)
+                ],
+            )
+
+    def on_add(self, player_name: str, index: int, information: Information):
+        self.on_bulk_add([(player_name, index, information)])
+
+    def on_bulk_add(self, entries: List[Tuple[str, int, Information]]):
+        with self._transaction():
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO information (player, position, {INFORMATION_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [_information_to_row(player_name, index, information) for player_name, index, information in entries],
+            )
+
+    def on_edit(self, player_name: str, index: int, information: Information, old_info: str):
+        with self._transaction():
+            self.connection.execute(
+                "UPDATE information SET info = ?, modified_by = ?, modified_timestamp = ? WHERE player = ? AND position = ?",
+                (information.info, information.modified_by, information.modified_timestamp, player_name, index),
+            )
+
+    def on_delete(self, player_name: str, player: Player):
+        with self._transaction():
+            self.connection.execute("DELETE FROM information WHERE player = ?", (player_name,))
+
+    def on_alias(self, alias_name: str, player_name: Optional[str]):
+        with self._transaction():
+            if player_name is None:
+                self.connection.execute("DELETE FROM aliases WHERE alias = ?", (alias_name,))
+            else:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO aliases (alias, player) VALUES (?, ?)", (alias_name, player_name)
+                )
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,218 @@
+import asyncio
+import os
+import threading
+import time
+
+from atomicwrites import atomic_write
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from loguru import logger
+
+# (inode, modification time in ns, size) of a file, None if it doesn't exist
+FileSignature = Optional[Tuple[int, int, int]]
+
+
+def file_signature(file_path: Path) -> FileSignature:
+    try:
+        stat = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def write_file_atomic(file_path: Path, content: Union[str, bytes]):
+    """ Writes to a temporary file next to 'file_path' and renames it, so a crash never leaves a truncated file. """
+    os.makedirs(file_path.parent, exist_ok=True)
+    with atomic_write(str(file_path), mode="wb" if isinstance(content, bytes) else "w", overwrite=True) as f:
+        f.write(content)
+
+
+@dataclass()
+class PersistTarget:
+    file_path: Path
+    # Runs on the event loop, returns a copy of the object which is safe to serialize in another thread
+    snapshot: Callable[[], Any]
+    # Runs in the worker thread, turns the snapshot into the file content, text or bytes
+    serialize: Callable[[Any], Union[str, bytes]]
+    # Runs in the worker thread, turns the file content back into a dict of [key: value], see DataFileWatcher
+    entries: Optional[Callable[[str], Dict[str, Any]]] = None
+
+
+class WriteBehindPersister:
+    """
+    Coalesces 'mark_dirty' calls into one write per target every 'interval' seconds.
+    Snapshots are taken on the event loop, serializing and writing happens in a single worker thread so writes stay in order.
+    """
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self.targets: Dict[str, PersistTarget] = {}
+        self._dirty: Set[str] = set()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Future] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persister")
+        self._closed = False
+        # Targets whose write failed in the worker thread, handed back to the event loop by '_retry_failed'.
+        # The worker thread never touches '_dirty', which the event loop swaps in '_take_snapshots'
+        self._failed: Set[str] = set()
+        self._failed_lock = threading.Lock()
+
+        # Content of the files when they were last read or written, for targets whose files are watched for changes
+        # by other programs: [target_name: (signature, text)]. Only used in the worker thread after 'remember'
+        self.on_disk: Dict[str, Tuple[FileSignature, Optional[str]]] = {}
+
+        # Statistics of the last write per target: [target_name: (duration in seconds, size in bytes)]
+        self.last_write: Dict[str, Tuple[float, int]] = {}
+        self.write_count = 0
+        self.write_seconds_total = 0.0
+        self.write_bytes_total = 0
+
+    def register(
+        self,
+        name: str,
+        file_path: Path,
+        snapshot: Callable[[], Any],
+        serialize: Callable[[Any], Union[str, bytes]],
+        entries: Optional[Callable[[str], Dict[str, Any]]] = None,
+    ) -> None:
+        self.targets[name] = PersistTarget(file_path, snapshot, serialize, entries)
+
+    def remember(self, name: str, text: Optional[str]) -> None:
+        """ Tracks the file of the target: 'text' was just read from it, a write will not overwrite changes made after that. """
+        self.on_disk[name] = (file_signature(self.targets[name].file_path), text)
+
+    @property
+    def has_pending_writes(self) -> bool:
+        return bool(self._dirty)
+
+    def is_dirty(self, name: str) -> bool:
+        return name in self._dirty
+
+    def mark_dirty(self, name: str) -> None:
+        """ Schedules a write of the target. Without a running event loop, the target is written immediately. """
+        assert name in self.targets, name
+        self._dirty.add(name)
+        if self._timer is not None or self._closed:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush_sync()
+            return
+        self._timer = loop.call_later(self.interval, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._flush_task = asyncio.ensure_future(self.flush())
+
+    def _retry_failed(self):
+        """ Runs on the event loop: marks the targets whose write failed as dirty again and re-arms the timer. """
+        with self._failed_lock:
+            failed, self._failed = self._failed, set()
+        for name in failed:
+            self.mark_dirty(name)
+
+    async def flush(self) -> bool:
+        """ Writes all dirty targets now and waits until they are on disk. Returns False if a write failed. """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        jobs = self._take_snapshots()
+        if not jobs:
+            return True
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._write_jobs_in_worker, jobs, loop)
+
+    def _write_jobs_in_worker(self, jobs: List[Tuple[str, Any]], loop: asyncio.AbstractEventLoop) -> bool:
+        failed = self._write_jobs(jobs)
+        if not failed:
+            return True
+        with self._failed_lock:
+            self._failed.update(failed)
+        # Retried after 'interval' seconds, even if nothing else is saved in the meantime
+        loop.call_soon_threadsafe(self._retry_failed)
+        return False
+
+    async def run_in_writer(self, function: Callable[[], Any]) -> Any:
+        """ Runs 'function' in the worker thread, so it doesn't overlap with a write. """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, function)
+
+    def flush_sync(self) -> bool:
+        """ Blocking variant of 'flush', used at shutdown and when no event loop is running. """
+        jobs = self._take_snapshots()
+        failed = self._write_jobs(jobs)
+        # Written on the calling thread, nothing else touches '_dirty' at the same time
+        self._dirty.update(failed)
+        return not failed
+
+    def close(self) -> None:
+        """ Final flush: waits for writes in flight and then writes everything that is still dirty. """
+        if self._closed:
+            return
+        self._closed = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._executor.shutdown(wait=True)
+        # Writes that failed in the worker thread, '_retry_failed' doesn't run anymore
+        with self._failed_lock:
+            self._dirty.update(self._failed)
+            self._failed = set()
+        self.flush_sync()
+
+    def stats(self) -> Dict[str, float]:
+        stats = {
+            "pending_writes": len(self._dirty),
+            "writes": self.write_count,
+            "write_seconds_total": self.write_seconds_total,
+            "write_bytes_total": self.write_bytes_total,
+        }
+        for name, (duration, size) in self.last_write.items():
+            stats[f"last_write_seconds_{name}"] = duration
+            stats[f"last_write_bytes_{name}"] = size
+        return stats
+
+    def _take_snapshots(self) -> List[Tuple[str, Any]]:
+        names, self._dirty = self._dirty, set()
+        return [(name, self.targets[name].snapshot()) for name in sorted(names)]
+
+    def _write_jobs(self, jobs: List[Tuple[str, Any]]) -> List[str]:
+        """ Returns the names of the targets that were not written. """
+        failed: List[str] = []
+        for name, snapshot in jobs:
+            target = self.targets[name]
+            signature = file_signature(target.file_path)
+            if name in self.on_disk and signature != self.on_disk[name][0]:
+                if not self._closed:
+                    # Changed by another program, it is merged by the DataFileWatcher which saves the target again
+                    logger.info(f"{target.file_path} was changed by another program, not overwriting it")
+                    failed.append(name)
+                    continue
+                if signature is not None:
+                    # Shutting down, there is no time to merge: keep the other version next to the file
+                    conflict_file_path = target.file_path.with_name(target.file_path.name + ".conflict")
+                    logger.warning(
+                        f"{target.file_path} was changed by another program, moved it to {conflict_file_path}"
+                    )
+                    os.replace(target.file_path, conflict_file_path)
+            t0 = time.perf_counter()
+            try:
+                text = target.serialize(snapshot)
+                write_file_atomic(target.file_path, text)
+            except Exception as e:
+                logger.error(f"Error while writing {target.file_path}: {e}")
+                # Tried again after 'interval' seconds
+                failed.append(name)
+                continue
+            duration = time.perf_counter() - t0
+            self.last_write[name] = (duration, len(text))
+            self.write_count += 1
+            self.write_seconds_total += duration
+            self.write_bytes_total += len(text)
+            if name in self.on_disk:
+                self.on_disk[name] = (file_signature(target.file_path), text)
+        return failed
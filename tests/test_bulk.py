@@ -0,0 +1,62 @@
+from pathlib import Path
+
+from models.bulk import import_file, parse_file
+from models.channels import Channels
+from models.information import Information
+from models.mutations import apply_mutation
+from models.player import Player
+from models.players import Players
+from models.users import Users
+from storage.codec import players_to_dict
+
+CSV_FILE = """player,info,author,timestamp
+serral,finnish zerg,,
+barcode,finnish zerg,,
+maru,,,
+maru,terran,lowko,2020-01-01
+"""
+
+
+def sample_players() -> Players:
+    return Players({"serral": Player([Information("plays for bc", "harstem", 1_600_000_000)])}, {"barcode": "serral"})
+
+
+def test_import_mutation_adds_parsed_rows(tmp_path: Path):
+    file_path = tmp_path / "season.csv"
+    file_path.write_text(CSV_FILE)
+    rows, report = parse_file(file_path, "burny")
+    assert (report.rows, report.invalid, report.errors) == (4, 1, ["line 4: info is empty"])
+    assert rows[-1] == {"player": "maru", "info": "terran", "author": "lowko", "timestamp": 1_577_836_800}
+
+    # The mutation only gets the parsed rows, the file is gone by then
+    file_path.unlink()
+    players = sample_players()
+    result = apply_mutation(
+        Channels(set()), Users({}), players, {"op": "import_information", "path": str(file_path), "rows": rows}
+    )
+    assert result == {"imported": 2, "duplicates": 1}
+    assert [information.info for information in players.get_information("serral")] == ["plays for bc", "finnish zerg"]
+    assert players.get_information("maru")[0].created_by == "lowko"
+
+
+def test_import_file_matches_parse_and_mutation(tmp_path: Path):
+    file_path = tmp_path / "season.csv"
+    file_path.write_text(CSV_FILE)
+    imported_players = sample_players()
+    report = import_file(imported_players, file_path, "burny")
+    assert (report.rows, report.imported, report.duplicates, report.invalid) == (4, 2, 1, 1)
+
+    rows, _ = parse_file(file_path, "burny")
+    mutated_players = sample_players()
+    apply_mutation(Channels(set()), Users({}), mutated_players, {"op": "import_information", "path": "", "rows": rows})
+    # The created timestamp of rows without timestamp is the current time
+    for players in (imported_players, mutated_players):
+        players.get_information("serral")[1].created_timestamp = 0
+    assert players_to_dict(imported_players) == players_to_dict(mutated_players)
+
+
+def test_unreadable_file_has_no_rows(tmp_path: Path):
+    rows, report = parse_file(tmp_path / "missing.csv", "burny")
+    assert rows == [] and report.error is not None
+    rows, report = parse_file(tmp_path / "season.txt", "burny")
+    assert rows == [] and report.error.startswith("Unknown file type")
@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+from typing import List, Set, Tuple
+
+import aiohttp
+
+from benchmarks.fake_irc import FakeIrcServer
+from chat.channel_manager import FAILED, JOINED, PENDING, ChannelManager
+
+
+class IrcClient:
+    """
+    Just enough of the twitchio connection for ChannelManager: sends JOIN and PART to the server and reports a join
+    as failed if the server didn't answer within 'timeout' seconds, like twitchio does after 11 seconds.
+    """
+
+    def __init__(self, timeout: float = 0.1):
+        self.timeout = timeout
+        self.manager: ChannelManager = None
+        self.joined: Set[str] = set()
+        # (time, channel names) of every JOIN
+        self.join_calls: List[Tuple[float, List[str]]] = []
+        self._session = None
+        self._socket = None
+        self._reader = None
+
+    async def connect(self, url: str):
+        self._session = aiohttp.ClientSession()
+        self._socket = await self._session.ws_connect(url)
+        await self._socket.send_str("NICK thelist_bot\r\n")
+        self._reader = asyncio.ensure_future(self._read())
+
+    async def close(self):
+        self._reader.cancel()
+        await self._socket.close()
+        await self._session.close()
+
+    async def join(self, channel_names: List[str]):
+        self.join_calls.append((time.monotonic(), channel_names))
+        await self._socket.send_str(f"JOIN {','.join('#' + channel_name for channel_name in channel_names)}\r\n")
+        for channel_name in channel_names:
+            asyncio.get_running_loop().call_later(self.timeout, self._check_joined, channel_name)
+
+    async def part(self, channel_names: List[str]):
+        await self._socket.send_str(f"PART {','.join('#' + channel_name for channel_name in channel_names)}\r\n")
+
+    def _check_joined(self, channel_name: str):
+        if channel_name not in self.joined:
+            self.manager.on_join_failed(channel_name)
+
+    async def _read(self):
+        async for message in self._socket:
+            for line in message.data.split("\r\n"):
+                if " JOIN #" in line:
+                    channel_name = line.rpartition("#")[2]
+                    self.joined.add(channel_name)
+                    self.manager.on_joined(channel_name)
+
+
+async def start(server: FakeIrcServer, client: IrcClient, **manager_arguments) -> ChannelManager:
+    await server.start()
+    await client.connect(server.url)
+    client.manager = ChannelManager(client.join, client.part, **manager_arguments)
+    return client.manager
+
+
+async def wait_until_joined(manager: ChannelManager, channels_amount: int, timeout: float = 10.0):
+    t0 = time.monotonic()
+    while list(manager.states.values()).count(JOINED) < channels_amount:
+        assert time.monotonic() - t0 < timeout, manager.stats()
+        await asyncio.sleep(0.01)
+
+
+async def stop(server: FakeIrcServer, client: IrcClient, manager: ChannelManager):
+    await manager.stop()
+    await client.close()
+    await server.stop()
+
+
+def test_joins_are_batched_within_rate_limit():
+    channel_names = [f"channel{i}" for i in range(12)]
+
+    async def main():
+        # The JOINs arrive a little after they were sent, the window of the server starts later
+        server = FakeIrcServer(joins_per_period=5, period=0.18)
+        client = IrcClient(timeout=1.0)
+        manager = await start(server, client, joins_per_period=5, period=0.2)
+        manager.on_connected(channel_names)
+        assert set(manager.states.values()) == {PENDING}
+        await wait_until_joined(manager, len(channel_names))
+        stats = manager.stats()
+        joins_dropped = server.joins_dropped
+        await stop(server, client, manager)
+        return client.join_calls, stats, joins_dropped
+
+    join_calls, stats, joins_dropped = asyncio.run(main())
+    assert [len(channel_names) for _, channel_names in join_calls] == [5, 5, 2]
+    # Every batch waits until the JOINs of the batch before are a full period old
+    first, second, third = (call_time for call_time, _ in join_calls)
+    assert second - first >= 0.2 and third - second >= 0.2
+    assert (stats["joined"], stats["join_attempts"], stats["join_failures"]) == (12, 12, 0)
+    assert joins_dropped == 0
+
+
+def test_failed_join_is_retried_with_backoff():
+    async def main():
+        # Every JOIN is ignored until the server works again
+        server = FakeIrcServer(join_failure_rate=1.0)
+        client = IrcClient(timeout=0.05)
+        manager = await start(server, client, retry_delay=0.1, max_retry_delay=0.4)
+        manager.on_connected(["serral"])
+        assert manager.states == {"serral": PENDING}
+        while len(client.join_calls) < 5:
+            await asyncio.sleep(0.01)
+        assert manager.states["serral"] in {PENDING, FAILED}
+        server.join_failure_rate = 0.0
+        await wait_until_joined(manager, 1)
+        stats = manager.stats()
+        await stop(server, client, manager)
+        return client.join_calls, stats
+
+    join_calls, stats = asyncio.run(main())
+    call_times = [call_time for call_time, _ in join_calls]
+    gaps = [later - earlier for earlier, later in zip(call_times, call_times[1:])]
+    # Timeout of the join, then 0.1, 0.2, 0.4 and 0.4 seconds: doubled every time up to the maximum
+    for gap, delay in zip(gaps, [0.1, 0.2, 0.4, 0.4, 0.4]):
+        assert gap >= 0.05 + delay
+    assert gaps[2] > gaps[0] + 0.2
+    assert stats["joined"] == 1 and stats["failed"] == 0
+    assert stats["join_failures"] == len(join_calls) - 1
@@ -0,0 +1,121 @@
+import asyncio
+
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from models.bot_config import BotConfig
+from models.user import User
+from models.users import Users
+from storage.codec import decode_users, encode_users
+from storage.file_watcher import ExternalChange, merge_change
+from storage.json_storage import JsonStorage
+from storage.write_behind import WriteBehindPersister, write_file_atomic
+
+
+def users_change(base: Dict[str, str], external: Dict[str, str]) -> ExternalChange:
+    changed_keys = sorted(key for key in base.keys() | external.keys() if base.get(key) != external.get(key))
+    return ExternalChange("users", Path("users.json"), "", base, external, changed_keys)
+
+
+def test_merge_applies_changes_that_memory_does_not_have():
+    memory = {"burny": "superadmin", "lowko": "admin", "harstem": "user"}
+    change = users_change(
+        {"burny": "superadmin", "lowko": "admin"}, {"burny": "superadmin", "lowko": "user", "maru": "admin"}
+    )
+
+    def set_entry(key: str, value: Optional[str]):
+        if value is None:
+            memory.pop(key)
+        else:
+            memory[key] = value
+
+    merge = merge_change(change, memory, set_entry)
+    assert (sorted(merge.applied), merge.conflicts) == (["lowko", "maru"], [])
+    # 'harstem' was only added in memory
+    assert memory == {"burny": "superadmin", "lowko": "user", "maru": "admin", "harstem": "user"}
+
+
+def test_merge_keeps_memory_on_conflict():
+    memory = {"lowko": "superadmin"}
+    change = users_change({"lowko": "admin"}, {"lowko": "user"})
+    merge = merge_change(change, memory, lambda key, value: memory.__setitem__(key, value))
+    assert (merge.applied, merge.conflicts) == ([], ["lowko"])
+    assert memory == {"lowko": "superadmin"}
+
+
+def write_users(file_path: Path, user_types: Dict[str, str]):
+    write_file_atomic(file_path, encode_users(Users({user_name: User(user_type) for user_name, user_type in user_types.items()})))
+
+
+def watched_storage(data_folder: Path) -> JsonStorage:
+    # Only written and checked when the test says so
+    storage = JsonStorage(data_folder, BotConfig(save_interval=600, players_journal=False, reload_interval=600))
+    storage.load_users()
+    return storage
+
+
+def test_external_edit_is_merged(tmp_path: Path):
+    write_users(tmp_path / "users.json", {"burny": "superadmin", "lowko": "admin"})
+    storage = watched_storage(tmp_path)
+    reloads: List[str] = []
+
+    async def main():
+        storage.start_watching(lambda target, merge: reloads.extend(merge.applied))
+        # Changed in chat, not saved yet
+        storage.users.add_user("harstem")
+        storage.save_users(storage.users)
+        write_users(tmp_path / "users.json", {"burny": "superadmin", "lowko": "user"})
+        await storage.watcher.check()
+        await storage.flush()
+
+    asyncio.run(main())
+    storage.close()
+    assert reloads == ["lowko"]
+    expected = {"burny": "superadmin", "lowko": "user", "harstem": "user"}
+    assert {name: user.type for name, user in storage.users.users.items()} == expected
+    # Both changes are in the file
+    users = decode_users((tmp_path / "users.json").read_text())
+    assert {name: user.type for name, user in users.users.items()} == expected
+    assert not (tmp_path / "users.json.conflict").exists()
+
+
+def test_conflicting_edit_is_saved_next_to_the_file(tmp_path: Path):
+    write_users(tmp_path / "users.json", {"burny": "superadmin", "lowko": "admin"})
+    storage = watched_storage(tmp_path)
+
+    async def main():
+        storage.start_watching(lambda target, merge: None)
+        storage.users.add_super_admin("lowko")
+        storage.save_users(storage.users)
+        write_users(tmp_path / "users.json", {"burny": "superadmin", "lowko": "user"})
+        await storage.watcher.check()
+        await storage.flush()
+
+    asyncio.run(main())
+    storage.close()
+    # Chat wins, the version of the other program is kept in the .conflict file
+    users = decode_users((tmp_path / "users.json").read_text())
+    assert users.users["lowko"].type == "superadmin"
+    conflict = decode_users((tmp_path / "users.json.conflict").read_text())
+    assert conflict.users["lowko"].type == "user"
+
+
+def test_persister_does_not_overwrite_changed_file(tmp_path: Path):
+    file_path = tmp_path / "channels.json"
+    file_path.write_text("old")
+
+    async def main():
+        persister = WriteBehindPersister(interval=600)
+        persister.register("channels", file_path, lambda: "from chat", str)
+        persister.remember("channels", "old")
+        write_file_atomic(file_path, "from another program")
+        persister.mark_dirty("channels")
+        # Left for the DataFileWatcher to merge
+        assert not await persister.flush()
+        assert file_path.read_text() == "from another program"
+        # Without time to merge, the other version is moved aside
+        persister.close()
+
+    asyncio.run(main())
+    assert file_path.read_text() == "from chat"
+    assert (tmp_path / "channels.json.conflict").read_text() == "from another program"
@@ -0,0 +1,102 @@
+from typing import List
+
+from chat.flood_control import REJECT_CHANNEL, REJECT_COOLDOWN, REJECT_SHED, REJECT_USER, FloodControl, SlidingWindow
+
+
+def flood_control(now: List[float], queue_depth: List[int], **arguments) -> FloodControl:
+    limits = dict(
+        user_limit=3,
+        channel_limit=5,
+        global_limit=0,
+        window=10.0,
+        cooldowns={},
+        exempt_roles=["superadmin"],
+        shed_queue_depth=10,
+    )
+    limits.update(arguments)
+    return FloodControl(
+        **limits, queue_depth=lambda: queue_depth[0], read_commands={"info", "search"}, clock=lambda: now[0]
+    )
+
+
+def test_user_limit_is_per_user_and_moves_on():
+    now = [0.0]
+    control = flood_control(now, [0])
+    assert [control.check("spammer", "burnysc2", "info", "user") for _ in range(4)] == [None, None, None, REJECT_USER]
+    # Other users in the same channel are not affected
+    assert control.check("lowko", "burnysc2", "info", "user") is None
+    # The rejected command was not counted, the first three fell out of the window
+    now[0] = 10.0
+    assert control.check("spammer", "burnysc2", "info", "user") is None
+    assert control.rejections[REJECT_USER] == 1
+
+
+def test_channel_limit_is_per_channel():
+    now = [0.0]
+    control = flood_control(now, [0])
+    results = [control.check(f"user{i}", "burnysc2", "info", "user") for i in range(6)]
+    assert results == [None] * 5 + [REJECT_CHANNEL]
+    assert control.check("user6", "esl_sc2", "info", "user") is None
+    # Exempt roles are neither rejected nor counted
+    assert control.check("burny", "burnysc2", "info", "superadmin") is None
+    assert control.channels.count("burnysc2") == 5
+
+
+def test_cooldown_per_user_and_command():
+    now = [0.0]
+    control = flood_control(now, [0], cooldowns={"search": 5.0})
+    assert control.check("lowko", "burnysc2", "search", "user") is None
+    assert control.check("lowko", "burnysc2", "search", "user") == REJECT_COOLDOWN
+    assert control.check("lowko", "burnysc2", "info", "user") is None
+    now[0] = 5.0
+    assert control.check("lowko", "burnysc2", "search", "user") is None
+
+
+def test_buckets_expire_one_at_a_time():
+    now = [0.0]
+    window = SlidingWindow(100, 10.0, buckets=10, clock=lambda: now[0])
+    window.add("serral")
+    now[0] = 4.5
+    for _ in range(3):
+        window.add("serral")
+    now[0] = 9.99
+    assert window.count("serral") == 4
+    # The bucket of second 0 left the window, the one of second 4 only leaves at second 14
+    now[0] = 10.0
+    assert window.count("serral") == 3
+    now[0] = 13.99
+    assert window.count("serral") == 3
+    now[0] = 14.0
+    assert window.count("serral") == 0
+    # After a long pause the ring is cleared completely
+    window.add("serral")
+    now[0] = 1000.0
+    assert window.count("serral") == 0
+
+
+def test_idle_and_least_recent_keys_are_dropped():
+    now = [0.0]
+    window = SlidingWindow(100, 10.0, max_keys=3, clock=lambda: now[0])
+    for user_name in ["a", "b", "c"]:
+        window.add(user_name)
+    window.add("a")
+    # Over 'max_keys': 'b' was active least recently
+    window.add("d")
+    assert len(window) == 3 and window.count("b") == 0 and window.count("a") == 2
+    # Keys without events in the window are dropped when the next event is added
+    now[0] = 20.0
+    window.add("e")
+    assert len(window) == 1
+
+
+def test_read_commands_are_shed_before_admin_commands():
+    queue_depth = [9]
+    control = flood_control([0.0], queue_depth, user_limit=0, channel_limit=0)
+    assert control.check("lowko", "burnysc2", "info", "user") is None
+    queue_depth[0] = 10
+    assert control.check("lowko", "burnysc2", "info", "user") == REJECT_SHED
+    assert control.check("lowko", "burnysc2", "add", "admin") is None
+    queue_depth[0] = 20
+    assert control.check("lowko", "burnysc2", "add", "admin") == REJECT_SHED
+    assert control.check("burny", "burnysc2", "info", "superadmin") is None
+    assert control.stats()["rejected_shed"] == 2
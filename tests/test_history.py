@@ -0,0 +1,94 @@
+import subprocess
+import sys
+import textwrap
+
+from pathlib import Path
+
+from models.history import EditHistory
+from models.information import Information
+from models.player import Player
+from models.players import Players
+
+ROOT_FOLDER = Path(__file__).parent.parent
+
+
+def players_with_history(history: EditHistory) -> Players:
+    players = Players(
+        {
+            "serral": Player([Information("finnish zerg", "burny", 1_600_000_000)]),
+            "barcode": Player([Information("ladder account", "burny", 1_600_000_000)]),
+        }
+    )
+    players.observers.append(history)
+    return players
+
+
+def texts(history: EditHistory, player_name: str, index: int, current_text: str):
+    return [text for text, _revision in history.revisions(player_name, index, current_text)]
+
+
+def test_edits_are_kept_if_the_process_ends_without_closing(tmp_path: Path):
+    script = textwrap.dedent(
+        """
+        import os
+        import sys
+        from pathlib import Path
+
+        from models.history import EditHistory
+        from tests.test_history import players_with_history
+
+        players = players_with_history(EditHistory(Path(sys.argv[1]), memory_entries=1000))
+        players.edit_information("burny", "serral 0 finnish zerg, world champion")
+        players.edit_information("burny", "serral 0 world champion")
+        # Like a crash or a kill, neither close nor atexit handlers run
+        os._exit(0)
+        """
+    )
+    subprocess.run(
+        [sys.executable, "-c", script, str(tmp_path / "history")], cwd=str(ROOT_FOLDER), check=True, timeout=30
+    )
+
+    history = EditHistory(tmp_path / "history")
+    assert texts(history, "serral", 0, "world champion") == ["finnish zerg, world champion", "finnish zerg"]
+    history.close()
+
+
+def test_history_of_a_text_that_changed_meanwhile_is_dropped(tmp_path: Path):
+    history = EditHistory(tmp_path / "history", memory_entries=1)
+    players = players_with_history(history)
+    players.edit_information("burny", "serral 0 finnish zerg, world champion")
+    history.close()
+
+    # E.g. edited with configure.py while the bot was not running, the deltas don't fit the new text anymore
+    history = EditHistory(tmp_path / "history", memory_entries=1)
+    assert texts(history, "serral", 0, "italian zerg") == []
+    players = players_with_history(history)
+    players.players["serral"].information[0].info = "italian zerg"
+    players.edit_information("burny", "serral 0 italian zerg, reynor")
+    assert texts(history, "serral", 0, "italian zerg, reynor") == ["italian zerg"]
+    history.close()
+
+
+def test_history_is_read_again_after_eviction(tmp_path: Path):
+    history = EditHistory(tmp_path / "history", memory_entries=1)
+    players = players_with_history(history)
+    players.edit_information("burny", "serral 0 finnish zerg, world champion")
+    players.edit_information("burny", "barcode 0 ladder account of serral")
+    assert history.evicted_amount == 1
+    assert texts(history, "serral", 0, "finnish zerg, world champion") == ["finnish zerg"]
+    assert texts(history, "barcode", 0, "ladder account of serral") == ["ladder account"]
+    history.close()
+
+
+def test_merged_player_keeps_its_history(tmp_path: Path):
+    history = EditHistory(tmp_path / "history")
+    players = players_with_history(history)
+    players.edit_information("burny", "barcode 0 ladder account of serral")
+    assert players.add_alias("barcode", "serral") == "serral"
+
+    assert texts(history, "serral", 1, "ladder account of serral") == ["ladder account"]
+    assert texts(history, "barcode", 0, "ladder account of serral") == []
+    history.close()
+    history = EditHistory(tmp_path / "history")
+    assert texts(history, "serral", 1, "ladder account of serral") == ["ladder account"]
+    history.close()
@@ -0,0 +1,107 @@
+import asyncio
+
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+import pytest
+
+from benchmarks.mutation_queue import SHARED_PLAYER, admin, check, create_backend, seed
+from chat.mutation_queue import MutationQueue
+from models.channels import Channels
+from models.mutations import apply_mutation
+from models.users import Users
+from storage.codec import players_to_dict
+
+ADMINS_AMOUNT = 20
+MUTATIONS_AMOUNT = 30
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_concurrent_mutations_are_not_lost(backend: str, tmp_path: Path):
+    seed(backend, tmp_path)
+    storage = create_backend(backend, tmp_path)
+    channels, users, players = Channels(), Users(), storage.load_players()
+    queue = MutationQueue(
+        lambda mutation: apply_mutation(channels, users, players, mutation),
+        # Only players change
+        lambda targets: storage.save_players(players),
+        storage.batch,
+    )
+
+    async def main():
+        # A mutation that is never applied would leave its admin waiting
+        admins = asyncio.gather(*(admin(queue.submit, i, MUTATIONS_AMOUNT) for i in range(ADMINS_AMOUNT)))
+        await asyncio.wait_for(admins, 10)
+        await queue.stop()
+        await storage.flush()
+
+    asyncio.run(main())
+    # Mutations of different admins were applied together
+    assert queue.largest_batch > 1
+    check(players, ADMINS_AMOUNT, MUTATIONS_AMOUNT)
+    expected = players_to_dict(players)
+    storage.close()
+
+    storage = create_backend(backend, tmp_path)
+    reloaded_players = storage.load_players()
+    storage.close()
+    check(reloaded_players, ADMINS_AMOUNT, MUTATIONS_AMOUNT)
+    assert len(reloaded_players.get_information(SHARED_PLAYER)) == ADMINS_AMOUNT * len(range(0, MUTATIONS_AMOUNT, 3))
+    assert players_to_dict(reloaded_players) == expected
+
+
+def test_error_goes_to_its_command_only():
+    applied = []
+
+    def apply(mutation: dict):
+        if mutation["op"] == "delete_information":
+            raise ValueError("broken")
+        applied.append(mutation["content"])
+        return True
+
+    queue = MutationQueue(apply, lambda targets: None, nullcontext)
+
+    async def main():
+        return await asyncio.gather(
+            queue.submit({"op": "add_information", "content": "a"}),
+            queue.submit({"op": "delete_information", "content": "b"}),
+            queue.submit({"op": "add_information", "content": "c"}),
+            return_exceptions=True,
+        )
+
+    first, second, third = asyncio.run(main())
+    assert (first, third) == (True, True)
+    assert isinstance(second, ValueError)
+    assert applied == ["a", "c"]
+
+
+def test_failed_batch_fails_its_commands_only():
+    batches = []
+
+    @contextmanager
+    def batch():
+        yield
+        batches.append(len(batches))
+        # Only the first batch can't be saved
+        if len(batches) == 1:
+            raise OSError("disk full")
+
+    queue = MutationQueue(lambda mutation: mutation["content"], lambda targets: None, batch)
+
+    async def main():
+        failed = await asyncio.wait_for(
+            asyncio.gather(
+                queue.submit({"op": "add_information", "content": "a"}),
+                queue.submit({"op": "add_information", "content": "b"}),
+                return_exceptions=True,
+            ),
+            10,
+        )
+        # The worker keeps running for the next commands
+        saved = await asyncio.wait_for(queue.submit({"op": "add_information", "content": "c"}), 10)
+        await queue.stop()
+        return failed, saved
+
+    failed, saved = asyncio.run(main())
+    assert all(isinstance(error, OSError) for error in failed)
+    assert saved == "c"
@@ -0,0 +1,22 @@
+from models.information import Information
+from models.player import Player
+from models.players import Players
+
+
+def sample_players() -> Players:
+    return Players({"serral": Player([Information("finnish zerg", "burny", 1_600_000_000)])}, {"barcode": "serral"})
+
+
+def test_deleting_an_alias_keeps_the_player():
+    players = sample_players()
+    assert players.delete_information("barcode") is None
+    assert [information.info for information in players.get_information("serral")] == ["finnish zerg"]
+    assert players.resolve("barcode") == "serral"
+
+
+def test_deleting_a_player_removes_its_aliases():
+    players = sample_players()
+    removed_player = players.delete_information("Serral")
+    assert [information.info for information in removed_player.information] == ["finnish zerg"]
+    assert players.get_information("serral") == []
+    assert players.aliases == {}
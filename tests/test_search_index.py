@@ -0,0 +1,100 @@
+import asyncio
+import math
+
+from pathlib import Path
+
+from benchmarks.synthetic import synthetic_players
+from models.information import Information
+from models.player import Player
+from models.players import Players
+from models.search_index import MAX_CANDIDATES, tokenize
+from storage.codec import encode_players
+from storage.lazy_loading import load_lazy_players
+from storage.write_behind import write_file_atomic
+
+
+def ranked_by_brute_force(players: Players, query: str, limit: int):
+    """ Scores every entry, like the search without any index. """
+    entries = [
+        ((player_name, index), tokenize(information.info))
+        for player_name, player in players.players.items()
+        for index, information in enumerate(player.information)
+    ]
+    tokens = set(tokenize(query))
+    weights = {
+        token: math.log(1 + len(entries) / sum(1 for _key, entry_tokens in entries if token in entry_tokens))
+        for token in tokens
+    }
+    matches = [
+        (-sum(entry_tokens.count(token) * weight for token, weight in weights.items()), key)
+        for key, entry_tokens in entries
+        if tokens <= set(entry_tokens)
+    ]
+    return len(matches), [key for _score, key in sorted(matches)[:limit]]
+
+
+def test_search_ranks_like_brute_force():
+    players = synthetic_players(300)
+    players.add_information("burny", "player7 zerg zerg zerg macro")
+    players.edit_information("burny", "player8 0 proxy proxy cannon")
+    for query in ["zerg", "zerg macro", "proxy cannon", "korean zerg macro", "mech toss sky early", "rush rush"]:
+        matches_amount, keys = ranked_by_brute_force(players, query, 5)
+        result = players.search_index.search(query, limit=5)
+        assert result.amount_is_exact
+        assert (result.matches_amount, result.keys) == (matches_amount, keys), query
+
+
+def test_search_finds_the_best_entry_among_many_matches():
+    players = Players({f"player{i}": Player([Information("zerg macro player", "burny", 0)]) for i in range(3000)})
+    # Added last, a search that ranks the first matches it finds would miss it
+    players.add_information("burny", "serral zerg zerg zerg macro macro")
+    players.add_information("burny", "reynor zerg zerg macro")
+
+    result = players.search_index.search("zerg macro", limit=3)
+    assert result.keys == [("serral", 0), ("reynor", 0), ("player0", 0)]
+    assert not result.amount_is_exact
+    assert MAX_CANDIDATES <= result.matches_amount <= 3002
+
+    result = players.search_index.search("zerg", limit=1)
+    assert result.keys == [("serral", 0)]
+    assert (result.matches_amount, result.amount_is_exact) == (3002, True)
+
+
+def test_search_follows_changes():
+    players = Players({"serral": Player([Information("finnish zerg", "burny", 0)])})
+    assert players.search_index.search("zerg").keys == [("serral", 0)]
+    players.edit_information("burny", "serral 0 finnish player")
+    assert players.search_index.search("zerg").keys == []
+    players.add_information("burny", "reynor italian zerg")
+    players.delete_information("serral")
+    assert players.search_index.search("finnish").keys == []
+    assert players.search_index.search("zerg").keys == [("reynor", 0)]
+
+
+def test_search_of_lazy_players_decodes_none(tmp_path: Path):
+    players = synthetic_players(300)
+    file_path = tmp_path / "players.json"
+    write_file_atomic(file_path, encode_players(players))
+    lazy_players = load_lazy_players(file_path, max_loaded=10)
+    for query in ["zerg", "korean zerg macro", "proxy cannon"]:
+        assert lazy_players.search_index.search(query) == players.search_index.search(query), query
+    assert lazy_players.players.stats()["player_decodes"] == 0
+
+
+def test_build_in_executor_applies_changes_made_meanwhile():
+    players = synthetic_players(300)
+    expected_players = synthetic_players(300)
+
+    async def main():
+        building = asyncio.ensure_future(players.search_index.build_in_executor())
+        # Reads the players, then the index is built in the executor while they change
+        await asyncio.sleep(0)
+        for changed_players in (players, expected_players):
+            changed_players.add_information("burny", "serral finnish zerg zerg")
+            changed_players.edit_information("burny", "player3 0 proxy proxy cannon")
+            changed_players.delete_information("player4")
+        await building
+
+    asyncio.run(main())
+    for query in ["zerg", "proxy cannon", "finnish", "korean zerg macro"]:
+        assert players.search_index.search(query) == expected_players.search_index.search(query), query
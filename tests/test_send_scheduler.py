@@ -0,0 +1,115 @@
+import asyncio
+
+from typing import List, Tuple
+
+import pytest
+
+from twitchio.abcs import Messageable, limiter
+from twitchio.cooldowns import RateBucket
+from twitchio.errors import IRCCooldownError
+
+from chat.send_scheduler import SendScheduler, SlidingWindowLimiter
+
+# twitchio's window is 30 seconds, both are shortened so the test doesn't take minutes
+PERIOD = 0.3
+MARGIN = 0.05
+
+
+class TwitchioChannel(Messageable):
+    """ Only the rate limit check of twitchio's Channel.send, without a connection. """
+
+    def __init__(self, is_moderator: bool = False):
+        self.is_moderator = is_moderator
+
+    def _fetch_channel(self):
+        raise NotImplementedError
+
+    def _fetch_websocket(self):
+        raise NotImplementedError
+
+    def _fetch_message(self):
+        raise NotImplementedError
+
+    def _bot_is_mod(self):
+        return self.is_moderator
+
+
+@pytest.fixture()
+def short_twitchio_window(monkeypatch):
+    monkeypatch.setattr(RateBucket, "IRC", PERIOD)
+    monkeypatch.setattr(limiter, "buckets", {})
+
+
+def send_through_twitchio(channel_names: List[str], messages_amount: int, **scheduler_arguments) -> List[Tuple]:
+    """ Queues the messages round robin in the channels, returns (channel name, text, error) of every send. """
+    channel = TwitchioChannel()
+    sent: List[Tuple] = []
+
+    async def sender(channel_name: str, text: str):
+        try:
+            channel.check_bucket(channel=channel_name)
+        except IRCCooldownError as e:
+            sent.append((channel_name, text, e))
+            raise
+        sent.append((channel_name, text, None))
+
+    async def main():
+        scheduler = SendScheduler(sender, period=PERIOD + MARGIN, **scheduler_arguments)
+        futures = [
+            scheduler.enqueue(channel_names[i % len(channel_names)], f"reply {i}") for i in range(messages_amount)
+        ]
+        results = await asyncio.gather(*futures)
+        await scheduler.stop()
+        assert all(results)
+
+    asyncio.run(main())
+    return sent
+
+
+def test_twitchio_never_refuses_a_message(short_twitchio_window):
+    sent = send_through_twitchio(["burnysc2"], 60, messages_per_period=20)
+    assert [error for _channel_name, _text, error in sent if error is not None] == []
+    assert len(sent) == 60
+
+
+def test_channel_limit_with_a_higher_account_limit(short_twitchio_window):
+    # Verified accounts may send a lot more in total, but not in a single channel
+    sent = send_through_twitchio(["burnysc2", "esl_sc2"], 80, messages_per_period=7500, channel_messages_per_period=20)
+    assert [error for _channel_name, _text, error in sent if error is not None] == []
+    assert len(sent) == 80
+
+
+def test_sliding_window_never_exceeds_the_limit():
+    now = [0.0]
+    window = SlidingWindowLimiter(19, 30.0, lambda: now[0])
+    taken: List[float] = []
+    while now[0] < 300:
+        if window.try_take() == 0:
+            taken.append(now[0])
+        now[0] += 0.25
+    for index, taken_at in enumerate(taken):
+        assert sum(1 for other in taken[index:] if other < taken_at + 30.0) <= 19
+    # Doesn't wait longer than needed either
+    assert len(taken) == 19 * 10
+
+
+def test_busy_channel_at_its_limit_doesnt_block_other_channels():
+    sent: List[str] = []
+
+    async def sender(channel_name: str, text: str):
+        sent.append(channel_name)
+
+    async def main():
+        # Two messages per channel every 0.2 seconds, a lot more in total
+        scheduler = SendScheduler(sender, messages_per_period=100, period=0.2, channel_messages_per_period=3)
+        busy = [scheduler.enqueue("busy_channel", f"reply {i}") for i in range(5)]
+        await asyncio.sleep(0.01)
+        assert sent == ["busy_channel", "busy_channel"]
+        # Sent right away, although the busy channel has to wait
+        quiet = scheduler.enqueue("quiet_channel", "reply")
+        assert await asyncio.wait_for(quiet, 0.1)
+        await asyncio.gather(*busy)
+        await scheduler.stop()
+
+    asyncio.run(main())
+    assert sent == ["busy_channel", "busy_channel", "quiet_channel", "busy_channel", "busy_channel", "busy_channel"]
@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from models.bot_config import BotConfig
+from sharding.hash_ring import HashRing
+from sharding.ipc import LINE_LIMIT, send_message
+from sharding.supervisor import Supervisor
+from sharding.worker import MutationError, ShardClient
+from storage.codec import decode_players
+
+CHANNEL_NAMES = [f"channel{i}" for i in range(1000)]
+
+
+def assignment(ring: HashRing):
+    return {channel_name: ring.shard_for(channel_name) for channel_name in CHANNEL_NAMES}
+
+
+def test_hash_ring_spreads_channels_and_is_stable():
+    first = assignment(HashRing(range(4)))
+    # The same in every process, unlike hash()
+    assert first == assignment(HashRing(range(4)))
+    channels_per_shard = [list(first.values()).count(shard) for shard in range(4)]
+    assert min(channels_per_shard) > len(CHANNEL_NAMES) / 4 / 2
+
+
+def test_hash_ring_only_moves_channels_of_changed_shard():
+    ring = HashRing(range(4))
+    before = assignment(ring)
+    ring.add_shard(4)
+    added = assignment(ring)
+    moved = [channel_name for channel_name in CHANNEL_NAMES if before[channel_name] != added[channel_name]]
+    assert moved and all(added[channel_name] == 4 for channel_name in moved)
+
+    ring.remove_shard(1)
+    removed = assignment(ring)
+    moved = [channel_name for channel_name in CHANNEL_NAMES if added[channel_name] != removed[channel_name]]
+    assert moved and all(added[channel_name] == 1 for channel_name in moved)
+    assert 1 not in removed.values()
+
+    with pytest.raises(ValueError):
+        HashRing().shard_for("channel0")
+
+
+def test_mutation_round_trip(tmp_path: Path):
+    config = BotConfig(save_interval=600, players_journal=False, reload_interval=0)
+    supervisor = Supervisor(2, tmp_path, config, logs_folder=tmp_path / "logs")
+
+    async def main():
+        # Only the connection to the workers, without starting worker processes
+        server = await asyncio.start_server(supervisor._handle_worker, "127.0.0.1", 0, limit=LINE_LIMIT)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=LINE_LIMIT)
+        send_message(writer, {"type": "hello", "shard": 0})
+        await writer.drain()
+        state = json.loads(await reader.readline())
+        assert state["shards"] == 2
+
+        client = ShardClient(reader, writer, timeout=10)
+        bot = SimpleNamespace(players=decode_players(state["players"]))
+        receiving = asyncio.ensure_future(client.run(bot))
+        result = await client.mutate({"op": "add_information", "author": "burny", "content": "serral finnish zerg"})
+        # The change arrives before the result
+        assert result == 1
+        assert bot.players.get_information("serral")[0].info == "finnish zerg"
+
+        # Without author, the supervisor fails to apply it
+        with pytest.raises(MutationError):
+            await client.mutate({"op": "add_information", "content": "maru terran"})
+        # The connection is still usable
+        assert await client.mutate({"op": "add_information", "author": "burny", "content": "maru terran"}) == 1
+
+        writer.close()
+        await receiving
+        server.close()
+        await server.wait_closed()
+        await supervisor.storage.flush()
+
+    asyncio.run(main())
+    supervisor.storage.close()
+    assert supervisor.players.get_information("maru")[0].info == "terran"
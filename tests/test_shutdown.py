@@ -0,0 +1,81 @@
+import json
+import signal
+import subprocess
+import sys
+import textwrap
+
+from pathlib import Path
+
+import pytest
+
+ROOT_FOLDER = Path(__file__).parent.parent
+
+# Like bot.py, without a connection to twitch. Every change waits for its delayed write when the signal arrives
+BOT_SCRIPT = textwrap.dedent(
+    """
+    import sys
+    from pathlib import Path
+
+    from bot import TwitchChatBot
+    from models.bot_config import BotConfig
+    from storage.json_storage import JsonStorage
+
+    data_folder = Path(sys.argv[1])
+    config = BotConfig(save_interval=600, players_journal=False, reload_interval=0)
+    bot = TwitchChatBot(
+        "token", "...", "thelist_bot", "!", JsonStorage(data_folder, config), data_folder / "history"
+    )
+
+    async def connect():
+        await bot.mutate({"op": "add_users", "user_type": "admin", "names": ["harstem"]})
+        await bot.mutate({"op": "add_information", "author": "burny", "content": "serral finnish zerg"})
+        await bot.mutate({"op": "edit_information", "author": "burny", "content": "serral 0 world champion"})
+        print("ready", flush=True)
+
+    async def close():
+        pass
+
+    # Instead of the websocket connection to twitch
+    bot._connection._connect = connect
+    bot._connection._close = close
+    bot.install_signal_handlers()
+    bot.run()
+    bot.storage.close()
+    """
+)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="No SIGTERM handlers on Windows")
+def test_sigterm_saves_pending_changes(tmp_path: Path):
+    script_path = tmp_path / "run_bot.py"
+    script_path.write_text(BOT_SCRIPT)
+    data_folder = tmp_path / "data"
+    process = subprocess.Popen(
+        [sys.executable, str(script_path), str(data_folder)],
+        cwd=str(tmp_path),
+        env={"PYTHONPATH": str(ROOT_FOLDER)},
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert process.stdout.readline().strip() == "ready"
+        assert not (data_folder / "players.json").exists()
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=30) == 0
+    finally:
+        process.kill()
+
+    with (data_folder / "users.json").open() as f:
+        assert json.load(f)["users"]["harstem"] == {"type": "admin"}
+    with (data_folder / "players.json").open() as f:
+        assert [information["info"] for information in json.load(f)["players"]["serral"]["information"]] == [
+            "world champion"
+        ]
+
+    # The previous text is in the history file
+    sys.path.insert(0, str(ROOT_FOLDER))
+    from models.history import EditHistory
+
+    history = EditHistory(data_folder / "history")
+    assert [text for text, _revision in history.revisions("serral", 0, "world champion")] == ["finnish zerg"]
+    history.close()
@@ -0,0 +1,283 @@
+import os
+
+from pathlib import Path
+from typing import Any, Dict, Set
+
+import pytest
+
+from models.bot_config import BotConfig
+from models.channels import Channels
+from models.information import Information
+from models.lazy_players import LazyPlayerMap
+from models.player import Player
+from models.players import Players
+from models.user import User
+from models.users import Users
+from storage import write_behind
+from storage.base import Storage
+from storage.codec import players_to_dict
+from storage.json_storage import JsonStorage
+from storage.sqlite_storage import SqliteStorage
+
+BACKENDS = ["json", "json-binary", "json-without-journal", "sqlite"]
+
+
+def create_backend(backend: str, data_folder: Path) -> Storage:
+    if backend == "sqlite":
+        return SqliteStorage(data_folder / "thelist.sqlite3")
+    config = BotConfig(reload_interval=0)
+    if backend == "json-binary":
+        config.snapshot_format = "binary"
+    elif backend == "json-without-journal":
+        config.players_journal = False
+    return JsonStorage(data_folder, config)
+
+
+def seed(storage: Storage, players: Players):
+    if isinstance(storage, SqliteStorage):
+        storage.import_players(players)
+    else:
+        storage.players = players
+        storage.persister.mark_dirty("players")
+
+
+def stored_players(players: Players) -> Dict[str, Any]:
+    """ Players without information are not stored in the database, the json files keep them. """
+    players_dict = players_to_dict(players)
+    players_dict["players"] = {
+        player_name: player_dict
+        for player_name, player_dict in sorted(players_dict["players"].items())
+        if player_dict["information"]
+    }
+    return players_dict
+
+
+def sample_players() -> Players:
+    return Players(
+        {
+            "serral": Player(
+                [
+                    Information("finnish zerg", "burny", 1_600_000_000),
+                    Information("plays for bc", "harstem", 1_600_000_100, "burny", 1_650_000_000),
+                ]
+            ),
+            "maru": Player([Information("terran", "lowko", 1_600_000_200)]),
+        },
+        {"barcode": "serral"},
+    )
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request) -> str:
+    return request.param
+
+
+def reload(backend: str, data_folder: Path) -> Players:
+    storage = create_backend(backend, data_folder)
+    players = storage.load_players()
+    storage.close()
+    return players
+
+
+def test_channels_and_users_round_trip(backend: str, tmp_path: Path):
+    storage = create_backend(backend, tmp_path)
+    storage.save_channels(Channels({"burnysc2", "esl_sc2"}))
+    storage.save_users(Users({"burny": User("superadmin"), "harstem": User("admin"), "chatter": User("user")}))
+    storage.close()
+
+    storage = create_backend(backend, tmp_path)
+    assert storage.load_channels() == Channels({"burnysc2", "esl_sc2"})
+    assert storage.load_users() == Users(
+        {"burny": User("superadmin"), "harstem": User("admin"), "chatter": User("user")}
+    )
+    storage.close()
+
+
+def test_players_round_trip_with_int_timestamps(backend: str, tmp_path: Path):
+    players = sample_players()
+    # Float timestamps as written by older versions
+    players.players["maru"].information[0].created_timestamp = 1_600_000_200.5
+    players.players["maru"].information[0].modified_by = "pig"
+    players.players["maru"].information[0].modified_timestamp = 1_650_000_000.75
+    storage = create_backend(backend, tmp_path)
+    seed(storage, players)
+    storage.close()
+
+    reloaded_players = reload(backend, tmp_path)
+    expected_players = sample_players()
+    expected_players.players["maru"].information[0].modify("terran", "pig", 1_650_000_000)
+    assert stored_players(reloaded_players) == stored_players(expected_players)
+    maru = reloaded_players.get_information("maru")[0]
+    assert (maru.created_timestamp, maru.modified_timestamp) == (1_600_000_200, 1_650_000_000)
+    for player in reloaded_players.players.values():
+        for information in player.information:
+            assert type(information.created_timestamp) is int
+            assert information.modified_timestamp is None or type(information.modified_timestamp) is int
+    assert reloaded_players.aliases == {"barcode": "serral"}
+
+
+def test_mutations_are_persisted(backend: str, tmp_path: Path):
+    storage = create_backend(backend, tmp_path)
+    seed(storage, sample_players())
+    storage.close()
+
+    storage = create_backend(backend, tmp_path)
+    players = storage.load_players()
+    with storage.batch():
+        assert players.add_information("burny", "barcode won a premier") == 3
+        assert players.add_information("burny", "clem youngest terran")
+        assert players.edit_information("pig", "serral 0 finnish zerg, world champion")
+        assert players.delete_information("maru") is not None
+        assert players.add_alias("clemmie", "clem") == "clem"
+    storage.save_players(players)
+    expected = stored_players(players)
+    storage.close()
+
+    reloaded_players = reload(backend, tmp_path)
+    assert stored_players(reloaded_players) == expected
+    edited = reloaded_players.get_information("serral")[0]
+    assert edited.modified_by == "pig"
+    assert type(edited.modified_timestamp) is int
+    assert reloaded_players.resolve("clemmie") == "clem"
+
+
+def test_backends_store_the_same_data(tmp_path: Path):
+    results = []
+    for backend in BACKENDS:
+        data_folder = tmp_path / backend
+        storage = create_backend(backend, data_folder)
+        seed(storage, sample_players())
+        storage.close()
+
+        storage = create_backend(backend, data_folder)
+        players = storage.load_players()
+        players.add_information("burny", "serral third entry")
+        players.get_player("serral").information[1].modify("edited", "wardi", 1_700_000_000)
+        for observer in players.observers:
+            observer.on_edit("serral", 1, players.get_player("serral").information[1], "plays for bc")
+        players.delete_alias("barcode")
+        storage.save_players(players)
+        storage.close()
+
+        reloaded_players = reload(backend, data_folder)
+        # The created timestamp of the new entry is the current time and differs between the backends
+        reloaded_players.get_player("serral").information[2].created_timestamp = 0
+        results.append(stored_players(reloaded_players))
+    assert all(result == results[0] for result in results), results
+
+
+############ JOURNAL
+def journal_storage(data_folder: Path, compact_size: int = 1_000_000) -> JsonStorage:
+    return JsonStorage(data_folder, BotConfig(reload_interval=0, journal_compact_size=compact_size))
+
+
+def test_journal_is_replayed_after_restart(tmp_path: Path):
+    storage = journal_storage(tmp_path)
+    seed(storage, sample_players())
+    storage.close()
+
+    storage = journal_storage(tmp_path)
+    players = storage.load_players()
+    players.add_information("burny", "clem youngest terran")
+    players.edit_information("pig", "serral 0 finnish zerg, world champion")
+    storage.save_players(players)
+    expected = stored_players(players)
+    # Only the journal has the changes, like after a crash before the next snapshot
+    storage.close()
+    assert "clem" not in (tmp_path / "players.json").read_text()
+    assert len((tmp_path / "players.journal.jsonl").read_text().splitlines()) == 2
+
+    assert stored_players(reload("json", tmp_path)) == expected
+    # The replayed journal went into a new snapshot
+    assert "clem" in (tmp_path / "players.json").read_text()
+    assert not (tmp_path / "players.journal.jsonl").exists()
+
+
+def test_truncated_last_journal_line_is_skipped(tmp_path: Path):
+    storage = journal_storage(tmp_path)
+    seed(storage, sample_players())
+    storage.close()
+
+    storage = journal_storage(tmp_path)
+    players = storage.load_players()
+    players.add_information("burny", "clem youngest terran")
+    expected = stored_players(players)
+    storage.close()
+    # The bot crashed while writing the next line
+    with (tmp_path / "players.journal.jsonl").open("a") as f:
+        f.write('{"op": "add", "player": "maru", "ind')
+
+    assert stored_players(reload("json", tmp_path)) == expected
+
+
+def test_compaction_writes_snapshot_and_truncates_journal(tmp_path: Path):
+    storage = journal_storage(tmp_path, compact_size=300)
+    seed(storage, sample_players())
+    storage.close()
+
+    storage = journal_storage(tmp_path, compact_size=300)
+    players = storage.load_players()
+    journal = storage.players_journal
+    sizes = []
+    for i in range(10):
+        players.add_information("burny", f"clem entry {i}")
+        sizes.append(journal.size)
+        # Without event loop, the snapshot is written right away once the journal is too big
+        storage.save_players(players)
+    expected = stored_players(players)
+    # The journal started over at least once
+    assert any(later < earlier for earlier, later in zip(sizes, sizes[1:]))
+    assert journal.size <= 300
+    assert not journal.compacting_file_path.exists()
+    storage.close()
+
+    # Every entry is either in the snapshot or in the journal that was started after it
+    journal_file_path = tmp_path / "players.journal.jsonl"
+    journal_lines = journal_file_path.read_text().splitlines() if journal_file_path.exists() else []
+    snapshot_players = reload("json-without-journal", tmp_path)
+    assert 0 < len(snapshot_players.get_information("clem")) and len(journal_lines) < 10
+    assert len(snapshot_players.get_information("clem")) + len(journal_lines) == 10
+    assert stored_players(reload("json", tmp_path)) == expected
+
+
+############ LAZY LOADING
+def mapped_file_paths() -> Set[str]:
+    with open("/proc/self/maps") as f:
+        return {line.split(maxsplit=5)[-1].strip() for line in f if line.count(" ") >= 5}
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/maps"), reason="Needs /proc to see which files are mapped")
+def test_lazy_players_file_is_unmapped_before_it_is_replaced(tmp_path: Path, monkeypatch):
+    players = Players({f"player{i}": Player([Information(f"info {i}", "burny", 1_600_000_000)]) for i in range(50)})
+    storage = create_backend("json-without-journal", tmp_path)
+    seed(storage, players)
+    storage.close()
+
+    def write_file_atomic(file_path: Path, content):
+        # Like Windows, which refuses to replace a file that is memory mapped
+        if str(file_path) in mapped_file_paths():
+            raise PermissionError(f"{file_path} is memory mapped")
+        original_write_file_atomic(file_path, content)
+
+    original_write_file_atomic = write_behind.write_file_atomic
+    monkeypatch.setattr(write_behind, "write_file_atomic", write_file_atomic)
+    config = BotConfig(reload_interval=0, lazy_players=True, lazy_players_memory=5, journal_compact_size=200)
+    storage = JsonStorage(tmp_path, config)
+    players = storage.load_players()
+    assert str(tmp_path / "players.json") in mapped_file_paths()
+    for i in range(10):
+        players.edit_information("lowko", f"player{i} 0 edited {i}")
+        storage.save_players(players)
+    # Compacted into a new players.json, which only works if it was not mapped anymore
+    assert storage.players_journal.size <= 200
+    assert str(tmp_path / "players.json") not in mapped_file_paths()
+    # Players that were never decoded are still there
+    assert players.get_information("player42")[0].info == "info 42"
+    expected = stored_players(players)
+    storage.close()
+
+    storage = JsonStorage(tmp_path, config)
+    reloaded_players = storage.load_players()
+    assert isinstance(reloaded_players.players, LazyPlayerMap)
+    assert stored_players(reloaded_players) == expected
+    storage.close()
@@ -0,0 +1,19 @@
+from models.users import ROLE_PERMISSIONS, Users, role_allows
+
+
+def test_roles_have_the_permissions_of_lower_roles():
+    assert ROLE_PERMISSIONS["user"] < ROLE_PERMISSIONS["admin"] < ROLE_PERMISSIONS["superadmin"]
+    assert role_allows("user", "get_information") and not role_allows("user", "add_information")
+    assert role_allows("admin", "add_user") and not role_allows("admin", "add_admin")
+    assert role_allows("superadmin", "add_channel")
+    # Users that are not known may do nothing
+    assert not role_allows(None, "get_information")
+
+
+def test_users_check_the_role_table():
+    users = Users()
+    users.add_admin("lowko")
+    users.add_user("harstem")
+    assert users.allowed_to_add_information("lowko") and not users.allowed_to_add_information("harstem")
+    assert users.allowed_to_get_information("harstem") and not users.allowed_to_get_information("unknown")
+    assert not users.allowed_to_delete_channel("lowko")
@@ -0,0 +1,56 @@
+import asyncio
+
+from pathlib import Path
+
+from storage.write_behind import WriteBehindPersister
+
+
+def test_failed_write_is_retried_without_another_save(tmp_path: Path):
+    file_path = tmp_path / "channels.json"
+    # The first write fails, e.g. because the disk is full
+    attempts = []
+
+    def serialize(text: str) -> str:
+        attempts.append(text)
+        if len(attempts) == 1:
+            raise OSError("No space left on device")
+        return text
+
+    async def main():
+        persister = WriteBehindPersister(interval=0.01)
+        persister.register("channels", file_path, lambda: "burnysc2", serialize)
+        persister.mark_dirty("channels")
+        assert not await persister.flush()
+        assert not file_path.exists()
+        # Nothing marks the target dirty again, the persister retries on its own
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if file_path.exists():
+                break
+        assert file_path.exists()
+        persister.close()
+
+    asyncio.run(main())
+    assert file_path.read_text() == "burnysc2"
+    assert len(attempts) == 2
+
+
+def test_failed_write_is_written_on_close(tmp_path: Path):
+    file_path = tmp_path / "channels.json"
+    attempts = []
+
+    def serialize(text: str) -> str:
+        attempts.append(text)
+        if len(attempts) == 1:
+            raise OSError("No space left on device")
+        return text
+
+    async def main():
+        persister = WriteBehindPersister(interval=60)
+        persister.register("channels", file_path, lambda: "burnysc2", serialize)
+        persister.mark_dirty("channels")
+        assert not await persister.flush()
+        persister.close()
+
+    asyncio.run(main())
+    assert file_path.read_text() == "burnysc2"